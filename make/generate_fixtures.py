@@ -0,0 +1,392 @@
+"""
+Generates a synthetic Star Citizen game folder for benchmarking and investigating StarFab performance without real
+game files.
+
+    python make/generate_fixtures.py OUTPUT_DIR --files 1000000 --depth 8 --records 500000
+
+The output folder contains:
+
+    Data.p4k              A zip64 archive laid out like a real Data.p4k: a random directory tree of assets,
+                          `.socpak` sub-archives, `Data/Libs/GameAudio/*.xml` ATL configs, localization ini files
+                          and `Data/Game.dcb`
+    build_manifest.id     The build manifest `StarCitizen` reads the version from
+
+`Data/Game.dcb` is a DataCore binary `scdatatools.forge.DataCoreBinary` reads: a `TagDatabase` record with a random
+tree of `Tag` records, and records of a handful of types (sharing a base structure) spread across a folder tree below
+`libs/foundry/records/`. Their properties cover strings, locale strings, enums, numbers, a nested structure, a
+reference to another record and an array of tags.
+
+Open the folder in StarFab to exercise the P4K tree, sub-archive expansion, P4K search, audio and localization models,
+the DataCore and tag database models and the content search.
+"""
+import argparse
+import io
+import json
+import random
+import struct
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+from scdatatools.forge import dftypes
+from scdatatools.forge.dftypes.enums import ConversionTypes, DataTypes
+
+ASSET_EXTENSIONS = [".dds", ".dds.1", ".dds.2", ".cgf", ".cga", ".mtl", ".xml", ".chrparams", ".wem", ".bnk", ".entxml"]
+RECORD_TYPES = [
+    "EntityClassDefinition", "AmmoParams", "SCItemManufacturer", "LootGenerationParams", "MissionBrokerEntry",
+    "ResourceType", "AudioTrigger", "StarMapObject", "Faction", "WeaponParams",
+]
+ITEM_SIZES = ["Small", "Medium", "Large", "Capital"]
+WORDS = [
+    "alpha", "bravo", "ship", "hull", "mount", "turret", "cargo", "door", "panel", "seat", "light", "engine", "shield",
+    "weapon", "ammo", "station", "outpost", "planet", "moon", "armor", "helmet", "rifle", "pistol", "crate", "prop",
+]
+
+
+def _word(rng):
+    return f"{rng.choice(WORDS)}_{rng.randrange(1000):03}"
+
+
+def _dos_date_time(rng):
+    return (rng.randrange(2017, 2024), rng.randrange(1, 13), rng.randrange(1, 29),
+            rng.randrange(24), rng.randrange(60), rng.randrange(0, 60, 2))
+
+
+class _Writer:
+    def __init__(self, p4k: zipfile.ZipFile, rng, payload_size):
+        self.p4k = p4k
+        self.rng = rng
+        self.payload_size = payload_size
+        self.count = 0
+        self._last_report = time.time()
+
+    def write(self, filename, data=None):
+        info = zipfile.ZipInfo(filename, date_time=_dos_date_time(self.rng))
+        info.compress_type = zipfile.ZIP_STORED
+        if data is None:
+            data = self.rng.randbytes(self.rng.randrange(self.payload_size + 1))
+        self.p4k.writestr(info, data)
+        self.count += 1
+        if time.time() - self._last_report > 5:
+            print(f"  {self.count} entries written", file=sys.stderr)
+            self._last_report = time.time()
+
+
+def _asset_tree(rng, files, depth, breadth):
+    """Yields `files` random paths below `Data/` spread across folders at most `depth` levels deep"""
+    folders = [["Data"]]
+    while len(folders) < max(1, files // 50):
+        parent = rng.choice(folders)
+        if len(parent) >= depth:
+            continue
+        for _ in range(rng.randrange(1, breadth + 1)):
+            folders.append(parent + [_word(rng).title()])
+    for i in range(files):
+        folder = rng.choice(folders)
+        yield "/".join(folder + [f"{_word(rng)}_{i}{rng.choice(ASSET_EXTENSIONS)}"])
+
+
+def _socpak(rng, entries, payload_size):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as socpak:
+        for i in range(entries):
+            info = zipfile.ZipInfo(f"{_word(rng)}_{i}.xml", date_time=_dos_date_time(rng))
+            socpak.writestr(info, rng.randbytes(rng.randrange(payload_size + 1)))
+    return buf.getvalue()
+
+
+def _atl_config(rng, name, triggers, external_sources):
+    trigger_xml = "\n".join(
+        f'    <ATLTrigger atl_name="Play_{name}_{i}">\n'
+        f'      <WwiseEvent wwise_name="Play_{name}_{i}"/>\n'
+        f'    </ATLTrigger>'
+        for i in range(triggers)
+    )
+    source_xml = "\n".join(
+        f'    <ATLExternalSource atl_name="{name}_vo_{i}">\n'
+        f'      <WwiseExternalSource wwise_name="{name}_vo_{i}" wwise_id="{rng.getrandbits(31)}"/>\n'
+        f'    </ATLExternalSource>'
+        for i in range(external_sources)
+    )
+    return (
+        f'<ATLConfig atl_name="{name}">\n'
+        f'  <AudioTriggers>\n{trigger_xml}\n  </AudioTriggers>\n'
+        f'  <AudioExternalSources>\n{source_xml}\n  </AudioExternalSources>\n'
+        f'  <AudioPreloads>\n'
+        f'    <ATLPreloadRequest atl_name="{name}">\n'
+        f'      <ATLConfigGroup atl_name="Default">\n'
+        f'        <WwiseFile wwise_name="{name}.bnk"/>\n'
+        f'      </ATLConfigGroup>\n'
+        f'    </ATLPreloadRequest>\n'
+        f'  </AudioPreloads>\n'
+        f'</ATLConfig>\n'
+    ).encode("utf-8")
+
+
+RECORDS_ROOT_PATH = "libs/foundry/records/"
+DCB_VERSION = 5
+# `Record.instance_index` is 16 bits, record types with more records than this are split up
+MAX_RECORDS_PER_TYPE = 0xFFFF
+
+
+class _DataCoreWriter:
+    """Lays out a Game.dcb the way `DataCoreBinary` reads it: the header, the definition tables, the records, the
+    value arrays, the text and then the data of every structure instance, grouped by structure"""
+
+    def __init__(self):
+        self.text = bytearray()
+        self._text_offsets = {}
+        self.structures = []
+        self.properties = []
+        self.enums = []
+        self.enum_options = []
+        self.records = []
+        self.references = []
+        self.instances = {}  # structure index -> packed data of its instances
+
+    def string(self, value) -> int:
+        if (offset := self._text_offsets.get(value)) is None:
+            offset = self._text_offsets[value] = len(self.text)
+            self.text += value.encode("utf-8") + b"\x00"
+        return offset
+
+    def structure(self, name, properties, parent=None) -> int:
+        """Add a structure definition, `properties` are `(name, data_type, conversion_type, structure_index)`"""
+        self.structures.append(dftypes.StructureDefinition(
+            name_offset=self.string(name),
+            parent_index=dftypes.DCB_NO_PARENT if parent is None else parent,
+            property_count=len(properties),
+            first_property_index=len(self.properties),
+        ))
+        for prop_name, data_type, conversion_type, structure_index in properties:
+            self.properties.append(dftypes.PropertyDefinition(
+                name_offset=self.string(prop_name),
+                structure_index=structure_index,
+                data_type=data_type,
+                conversion_type=conversion_type,
+            ))
+        return len(self.structures) - 1
+
+    def enum(self, name, options) -> int:
+        self.enums.append(dftypes.EnumDefinition(
+            name_offset=self.string(name), value_count=len(options), first_value_index=len(self.enum_options)
+        ))
+        self.enum_options.extend(dftypes.StringReference(string_offset=self.string(_)) for _ in options)
+        return len(self.enums) - 1
+
+    def reference_array(self, guids) -> bytes:
+        """Add references to the records `guids`, returning the packed array pointer to them"""
+        first = len(self.references)
+        for guid in guids:
+            self.references.append(dftypes.Reference(instance_index=0, value=dftypes.GUID.from_buffer_copy(guid)))
+        return struct.pack("<II", len(guids), first)
+
+    def instance(self, structure_index, data: bytes) -> int:
+        instances = self.instances.setdefault(structure_index, [])
+        instances.append(data)
+        return len(instances) - 1
+
+    def record(self, type_name, name, filename, structure_index, instance_index, guid):
+        self.records.append(dftypes.Record(
+            name_offset=self.string(f"{type_name}.{name}"),
+            filename_offset=self.string(filename),
+            structure_index=structure_index,
+            id=dftypes.GUID.from_buffer_copy(guid),
+            instance_index=instance_index,
+        ))
+
+    def to_bytes(self) -> bytes:
+        mappings = [
+            dftypes.DataMappingDefinition32(structure_count=len(self.instances[_]), structure_index=_)
+            for _ in sorted(self.instances)
+        ]
+        header = dftypes.DataCoreHeader(
+            version=DCB_VERSION,
+            structure_definition_count=len(self.structures),
+            property_definition_count=len(self.properties),
+            enum_definition_count=len(self.enums),
+            data_mapping_definition_count=len(mappings),
+            record_definition_count=len(self.records),
+            reference_count=len(self.references),
+            enum_option_name_count=len(self.enum_options),
+            text_length=len(self.text),
+        )
+        buf = bytearray(header)
+        for table in (self.structures, self.properties, self.enums, mappings, self.records, self.references,
+                      self.enum_options):
+            buf += b"".join(bytes(_) for _ in table)
+        buf += self.text
+        for structure_index in sorted(self.instances):
+            buf += b"".join(self.instances[structure_index])
+        return bytes(buf)
+
+
+def _guid(rng):
+    return rng.randbytes(16)
+
+
+def _tag_tree(rng, tags, depth, breadth):
+    """A random tree of `tags` tags at most `depth` levels deep, as `[(guid, name, [child index])]` and the indices of
+    the top level tags"""
+    nodes = []
+    roots = []
+    levels = []
+    while len(nodes) < tags:
+        parent = rng.randrange(-1, len(nodes)) if nodes else -1
+        if parent >= 0 and (levels[parent] >= depth or len(nodes[parent][2]) >= breadth):
+            continue
+        siblings = roots if parent < 0 else nodes[parent][2]
+        nodes.append((_guid(rng), f"{_word(rng).title()}{len(siblings)}", []))
+        levels.append(1 if parent < 0 else levels[parent] + 1)
+        siblings.append(len(nodes) - 1)
+    return nodes, roots
+
+
+def _game_dcb(rng, records, tags, depth, breadth):
+    dcb = _DataCoreWriter()
+    reference_array = (DataTypes.Reference, ConversionTypes.SimpleArray, 0)
+    tag_database_type = dcb.structure("TagDatabase", [("tags", *reference_array)])
+    tag_type = dcb.structure("Tag", [
+        ("tagName", DataTypes.StringRef, ConversionTypes.Attribute, 0),
+        ("legacyGUID", DataTypes.GUID, ConversionTypes.Attribute, 0),
+        ("children", *reference_array),
+    ])
+    item_size = dcb.enum("EItemSize", ITEM_SIZES)
+    physics_type = dcb.structure("SPhysicsParams", [
+        ("density", DataTypes.Double, ConversionTypes.Attribute, 0),
+        ("material", DataTypes.StringRef, ConversionTypes.Attribute, 0),
+    ])
+    base_type = dcb.structure("SyntheticRecordBase", [
+        ("displayName", DataTypes.StringRef, ConversionTypes.Attribute, 0),
+        ("description", DataTypes.Locale, ConversionTypes.Attribute, 0),
+        ("size", DataTypes.EnumChoice, ConversionTypes.Attribute, item_size),
+        ("mass", DataTypes.Float, ConversionTypes.Attribute, 0),
+        ("health", DataTypes.Int32, ConversionTypes.Attribute, 0),
+        ("enabled", DataTypes.Boolean, ConversionTypes.Attribute, 0),
+        ("physics", DataTypes.Class, ConversionTypes.Attribute, physics_type),
+        ("manufacturer", DataTypes.Reference, ConversionTypes.Attribute, 0),
+        ("tags", *reference_array),
+    ])
+    type_names = [
+        RECORD_TYPES[_ % len(RECORD_TYPES)] + (f"_{_ // len(RECORD_TYPES)}" if _ >= len(RECORD_TYPES) else "")
+        for _ in range(max(len(RECORD_TYPES), -(-records // MAX_RECORDS_PER_TYPE)))
+    ]
+    record_types = [(_, dcb.structure(_, [], parent=base_type)) for _ in type_names]
+
+    # tags are found by the name of the records the `tags` arrays reference (see `filters.record_tag_guids`), so tag
+    # records are named after their guid
+    tag_nodes, tag_roots = _tag_tree(rng, tags, depth, breadth)
+    tag_filename = f"{RECORDS_ROOT_PATH}tagdatabase/tagdatabase.tagdatabase.xml"
+    dcb.record("TagDatabase", "TagDatabase", tag_filename, tag_database_type,
+               dcb.instance(tag_database_type, dcb.reference_array([tag_nodes[_][0] for _ in tag_roots])), _guid(rng))
+    for guid, name, children in tag_nodes:
+        data = struct.pack("<I16s", dcb.string(name), _guid(rng)) + dcb.reference_array(
+            [tag_nodes[_][0] for _ in children]
+        )
+        dcb.record("Tag", str(dftypes.GUID.from_buffer_copy(guid)), tag_filename, tag_type,
+                   dcb.instance(tag_type, data), guid)
+
+    folders = [[]]
+    while len(folders) < max(1, records // 50):
+        parent = rng.choice(folders)
+        if len(parent) < depth:
+            folders.extend(parent + [_word(rng)] for _ in range(rng.randrange(1, breadth + 1)))
+    # records reference one of a few manufacturers, which reference nothing, like real records referencing shared ones
+    manufacturers = []
+    no_reference = bytes(16)
+    for i in range(records):
+        type_name, structure_index = record_types[i % len(record_types)]
+        name = f"{_word(rng)}_{i}"
+        guid = _guid(rng)
+        record_tags = rng.sample(tag_nodes, min(len(tag_nodes), rng.randrange(4)))
+        data = struct.pack(
+            "<IIIfi?dII16s",
+            dcb.string(name.replace("_", " ").title()),
+            dcb.string(f"@{name}_desc"),
+            dcb.string(rng.choice(ITEM_SIZES)),
+            rng.uniform(0, 10000),
+            rng.randrange(100000),
+            rng.random() < 0.9,
+            rng.uniform(0.1, 20),
+            dcb.string(rng.choice(WORDS)),
+            0,
+            rng.choice(manufacturers) if manufacturers and rng.random() < 0.5 else no_reference,
+        ) + dcb.reference_array([_[0] for _ in record_tags])
+        filename = f"{RECORDS_ROOT_PATH}{'/'.join(rng.choice(folders) + [name])}.xml"
+        dcb.record(type_name, name, filename, structure_index, dcb.instance(structure_index, data), guid)
+        if len(manufacturers) < 100:
+            manufacturers.append(guid)
+    return dcb.to_bytes()
+
+
+def generate(output_dir, files=10000, depth=6, breadth=4, socpaks=20, socpak_entries=50, audio_files=10, triggers=50,
+             languages=("english", "german"), localization_keys=500, records=5000, tags=500, payload_size=256, seed=0):
+    """Generate a synthetic game folder in `output_dir`, see the module docstring"""
+    rng = random.Random(seed)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.time()
+    (output_dir / "build_manifest.id").write_text(json.dumps({
+        "Data": {
+            "Branch": "sc-alpha-synthetic",
+            "BuildDateStamp": time.strftime("%b %d %Y"),
+            "BuildTimeStamp": time.strftime("%H:%M:%S"),
+            "RequestedP4ChangeNum": str(seed),
+            "Version": "0.0.0.0",
+        }
+    }, indent=2))
+
+    with zipfile.ZipFile(output_dir / "Data.p4k", "w", allowZip64=True) as p4k:
+        writer = _Writer(p4k, rng, payload_size)
+        for filename in _asset_tree(rng, files, depth, breadth):
+            writer.write(filename)
+
+        for i in range(socpaks):
+            writer.write(f"Data/ObjectContainers/synthetic/{_word(rng)}_{i}.socpak",
+                         _socpak(rng, socpak_entries, payload_size))
+
+        for i in range(audio_files):
+            name = f"synthetic_{_word(rng)}_{i}"
+            writer.write(f"Data/Libs/GameAudio/{name}.xml",
+                         _atl_config(rng, name, triggers, max(1, triggers // 10)))
+
+        keys = [f"{_word(rng)}_{i}" for i in range(localization_keys)]
+        for language in languages:
+            writer.write(f"Data/Localization/{language}/global.ini",
+                         "\n".join(f"{key}={language} {key}" for key in keys).encode("utf-8"))
+
+        writer.write("Data/Game.dcb", _game_dcb(rng, records, tags, depth, breadth))
+
+    print(f"Generated {writer.count} p4k entries in {output_dir} ({time.time() - start:0.1f}s)", file=sys.stderr)
+    return output_dir
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--files", type=int, default=10000, help="Number of asset files in the p4k")
+    parser.add_argument("--depth", type=int, default=6, help="Maximum directory depth of the asset tree")
+    parser.add_argument("--breadth", type=int, default=4, help="Maximum sub-folders created at once per folder")
+    parser.add_argument("--socpaks", type=int, default=20, help="Number of .socpak sub-archives")
+    parser.add_argument("--socpak-entries", type=int, default=50, help="Number of files in each .socpak")
+    parser.add_argument("--audio-files", type=int, default=10, help="Number of GameAudio ATL config files")
+    parser.add_argument("--triggers", type=int, default=50, help="Number of triggers per ATL config")
+    parser.add_argument("--localization-keys", type=int, default=500, help="Number of keys in each global.ini")
+    parser.add_argument("--records", type=int, default=5000, help="Number of DataCore records in Game.dcb")
+    parser.add_argument("--tags", type=int, default=500, help="Number of tags in Game.dcb's tag database")
+    parser.add_argument("--payload-size", type=int, default=256, help="Maximum size of each file's random contents")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(
+        args.output_dir, files=args.files, depth=args.depth, breadth=args.breadth, socpaks=args.socpaks,
+        socpak_entries=args.socpak_entries, audio_files=args.audio_files, triggers=args.triggers,
+        localization_keys=args.localization_keys, records=args.records, tags=args.tags, payload_size=args.payload_size,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    run()
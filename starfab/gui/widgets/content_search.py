@@ -0,0 +1,143 @@
+import re
+
+from starfab.gui import qtc, qtw
+from starfab.gui.widgets.dock_widgets.common import StarFabStaticWidget
+from starfab.log import getLogger
+from starfab.models.p4k_grep import (
+    MAX_REPORTED_FAILURES,
+    P4KContentGrep,
+    compile_grep_pattern,
+    grep_candidates,
+    grep_subarchives,
+)
+
+logger = getLogger(__name__)
+CONTENT_SEARCH_COLUMNS = ["Path", "Line", "Text"]
+
+
+class P4KContentSearchView(StarFabStaticWidget):
+    """Searches inside the files of the Data.p4k with a `P4KContentGrep`, listing the matching lines grouped by file
+    as they're found. Double-clicking a result opens the file. The files that could not be searched are counted in the
+    status and listed in its tooltip."""
+
+    def __init__(self, file_filter="", *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.p4k_model = self.starfab.sc_manager.p4k_model
+        self._grep = None
+        self._file_items = {}
+        self._hit_count = 0
+
+        self.search_text = qtw.QLineEdit()
+        self.search_text.setPlaceholderText(self.tr("Search for..."))
+        self.search_text.returnPressed.connect(self._handle_search)
+        self.file_filter = qtw.QLineEdit(file_filter)
+        self.file_filter.setPlaceholderText(self.tr("Files to search, e.g. *.mtl; Data/Libs/*.xml"))
+        self.file_filter.returnPressed.connect(self._handle_search)
+        self.use_regex = qtw.QCheckBox(self.tr("Regex"))
+        self.case_sensitive = qtw.QCheckBox(self.tr("Match Case"))
+        self.convert_cryxml = qtw.QCheckBox(self.tr("Convert CryXmlB"))
+        self.convert_cryxml.setChecked(True)
+        self.search_btn = qtw.QPushButton(self.tr("Search"))
+        self.search_btn.clicked.connect(self._handle_search)
+        self.status = qtw.QLabel()
+
+        options = qtw.QHBoxLayout()
+        options.addWidget(self.file_filter, 1)
+        options.addWidget(self.use_regex)
+        options.addWidget(self.case_sensitive)
+        options.addWidget(self.convert_cryxml)
+
+        search = qtw.QHBoxLayout()
+        search.addWidget(self.search_text, 1)
+        search.addWidget(self.search_btn)
+
+        self.results = qtw.QTreeWidget()
+        self.results.setHeaderLabels(CONTENT_SEARCH_COLUMNS)
+        self.results.setUniformRowHeights(True)
+        self.results.itemDoubleClicked.connect(self._handle_result_doubleclicked)
+        header = self.results.header()
+        header.setSectionResizeMode(qtw.QHeaderView.ResizeToContents)
+        header.setStretchLastSection(True)
+
+        layout = qtw.QVBoxLayout()
+        layout.addLayout(search)
+        layout.addLayout(options)
+        layout.addWidget(self.results)
+        layout.addWidget(self.status)
+        self.setLayout(layout)
+
+    def _handle_search(self):
+        if self._grep is not None:
+            self.cancel()
+            return
+
+        if not (text := self.search_text.text()) or self.p4k_model.p4k_index is None:
+            return
+        try:
+            pattern = compile_grep_pattern(
+                text, regex=self.use_regex.isChecked(), case_sensitive=self.case_sensitive.isChecked()
+            )
+        except re.error as e:
+            self.status.setText(f"Invalid pattern: {e}")
+            return
+
+        p4k_index = self.p4k_model.p4k_index
+        file_filter = self.file_filter.text()
+        filenames = [p4k_index.filenames[_] for _ in grep_candidates(p4k_index, file_filter)]
+        # the contents of the sub-archives that haven't been listed yet are searched too
+        subarchives = grep_subarchives(self.p4k_model.pending_subarchives(), file_filter)
+        self.results.clear()
+        self._file_items = {}
+        self._hit_count = 0
+        self.status.setText(f"Searching {len(filenames)} files...")
+        self.status.setToolTip("")
+        self.search_btn.setText(self.tr("Cancel"))
+
+        self._grep = P4KContentGrep(
+            self.starfab.sc_manager, filenames, pattern, convert_cryxml=self.convert_cryxml.isChecked(),
+            subarchives=subarchives, file_filter=file_filter,
+        )
+        self._grep.signals.subarchive_expanded.connect(self.p4k_model.insert_subarchive)
+        self._grep.signals.batch.connect(self._handle_hits)
+        self._grep.signals.finished.connect(self._handle_finished)
+        qtc.QThreadPool.globalInstance().start(self._grep)
+
+    def cancel(self):
+        if self._grep is not None:
+            self._grep.signals.cancel.emit()
+            self.search_btn.setEnabled(False)
+
+    @qtc.Slot(object)
+    def _handle_hits(self, hits):
+        self.results.setUpdatesEnabled(False)
+        for hit in hits:
+            if (file_item := self._file_items.get(hit.path)) is None:
+                file_item = self._file_items[hit.path] = qtw.QTreeWidgetItem(self.results, [hit.path, "", ""])
+            hit_item = qtw.QTreeWidgetItem(file_item, ["", str(hit.line_number), hit.line])
+            hit_item.setData(0, qtc.Qt.UserRole, hit.path)
+        self.results.setUpdatesEnabled(True)
+        self._hit_count += len(hits)
+        self.status.setText(f"{self._hit_count} hits in {len(self._file_items)} files")
+
+    @qtc.Slot(dict)
+    def _handle_finished(self, result):
+        self._grep = None
+        self.search_btn.setText(self.tr("Search"))
+        self.search_btn.setEnabled(True)
+        msg = f"{self._hit_count} hits in {len(self._file_items)} files"
+        if failed_count := result.get("failed_count", 0):
+            msg = f"{msg}, {failed_count} files could not be searched"
+            failed = [f"{filename}: {error}" for filename, error in result.get("failed", [])]
+            if failed_count > MAX_REPORTED_FAILURES:
+                failed.append(f"and {failed_count - MAX_REPORTED_FAILURES} more")
+            self.status.setToolTip("\n".join(failed))
+        self.status.setText(f"{msg} (cancelled)" if result.get("cancelled") else msg)
+
+    def _handle_result_doubleclicked(self, result_item, column):
+        path = result_item.data(0, qtc.Qt.UserRole) or result_item.text(0)
+        if (item := self.p4k_model.itemForPath(path)) is not None:
+            self._handle_item_action(item, self.p4k_model, None)
+
+    def deleteLater(self):
+        self.cancel()
+        super().deleteLater()
@@ -0,0 +1,166 @@
+from pathlib import Path
+
+from starfab.gui import qtc, qtw
+from starfab.gui.widgets.dcbrecord import DCBRecordItemView
+from starfab.gui.widgets.dock_widgets.common import StarFabStaticWidget
+from starfab.log import getLogger
+from starfab.models.datacore_diff import DataCoreDiffRunner
+
+logger = getLogger(__name__)
+DATACORE_DIFF_COLUMNS = ["Path", "Status", "Type", "Old", "New"]
+# property changes shown for a single record, the JSON export has all of them
+MAX_CHANGES_SHOWN = 500
+
+
+class DataCoreDiffView(StarFabStaticWidget):
+    """Compares two `Game.dcb` files with a `DataCoreDiffRunner`, listing the added, removed and changed records and
+    the properties that changed in each. Leaving the new side empty compares against the opened DataCore. The
+    result can be exported as JSON."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._runner = None
+        self._diff = None
+
+        self.old_dcb = qtw.QLineEdit()
+        self.old_dcb.setPlaceholderText(self.tr("Old Game.dcb"))
+        old_browse = qtw.QPushButton(self.tr("Browse..."))
+        old_browse.clicked.connect(lambda: self._browse(self.old_dcb))
+        self.new_dcb = qtw.QLineEdit()
+        self.new_dcb.setPlaceholderText(self.tr("New Game.dcb (the opened DataCore if empty)"))
+        new_browse = qtw.QPushButton(self.tr("Browse..."))
+        new_browse.clicked.connect(lambda: self._browse(self.new_dcb))
+        self.compare_btn = qtw.QPushButton(self.tr("Compare"))
+        self.compare_btn.clicked.connect(self._handle_compare)
+        self.export_btn = qtw.QPushButton(self.tr("Export JSON..."))
+        self.export_btn.setEnabled(False)
+        self.export_btn.clicked.connect(self._handle_export)
+        self.status = qtw.QLabel()
+
+        sources = qtw.QGridLayout()
+        sources.addWidget(self.old_dcb, 0, 0)
+        sources.addWidget(old_browse, 0, 1)
+        sources.addWidget(self.new_dcb, 1, 0)
+        sources.addWidget(new_browse, 1, 1)
+        sources.addWidget(self.compare_btn, 0, 2)
+        sources.addWidget(self.export_btn, 1, 2)
+
+        self.results = qtw.QTreeWidget()
+        self.results.setHeaderLabels(DATACORE_DIFF_COLUMNS)
+        self.results.setUniformRowHeights(True)
+        self.results.itemDoubleClicked.connect(self._handle_result_doubleclicked)
+        header = self.results.header()
+        header.setSectionResizeMode(qtw.QHeaderView.Interactive)
+        header.setStretchLastSection(True)
+
+        layout = qtw.QVBoxLayout()
+        layout.addLayout(sources)
+        layout.addWidget(self.results)
+        layout.addWidget(self.status)
+        self.setLayout(layout)
+
+    def _browse(self, line_edit):
+        filename, _ = qtw.QFileDialog.getOpenFileName(
+            self, self.tr("Select Game.dcb"), line_edit.text(), "DataCore (*.dcb);;All Files (*)"
+        )
+        if filename:
+            line_edit.setText(filename)
+
+    def _handle_compare(self):
+        if self._runner is not None:
+            self.cancel()
+            return
+
+        if not (old := self.old_dcb.text().strip()):
+            self.status.setText("Select the Game.dcb to compare against")
+            return
+        if new := self.new_dcb.text().strip():
+            new = Path(new)
+        elif (new := self.starfab.sc_manager.datacore_model.archive) is None or not hasattr(new, "records"):
+            self.status.setText("Select the new Game.dcb, or open a Star Citizen installation")
+            return
+
+        self.results.clear()
+        self._diff = None
+        self.export_btn.setEnabled(False)
+        self.status.setText("Comparing...")
+        self.compare_btn.setText(self.tr("Cancel"))
+
+        self._runner = DataCoreDiffRunner(Path(old), new)
+        self._runner.signals.finished.connect(self._handle_finished)
+        qtc.QThreadPool.globalInstance().start(self._runner)
+
+    def cancel(self):
+        if self._runner is not None:
+            self._runner.signals.cancel.emit()
+            self.compare_btn.setEnabled(False)
+
+    @qtc.Slot(dict)
+    def _handle_finished(self, result):
+        self._runner = None
+        self.compare_btn.setText(self.tr("Compare"))
+        self.compare_btn.setEnabled(True)
+        if (diff := result.get("diff")) is None:
+            self.status.setText("Cancelled" if result.get("cancelled") else f"Failed: {result.get('error')}")
+            return
+
+        self._diff = diff
+        self.export_btn.setEnabled(True)
+        self.results.setUpdatesEnabled(False)
+        for record in diff.records:
+            record_item = qtw.QTreeWidgetItem(
+                self.results, [record.path, record.status, record.type, "", ""]
+            )
+            record_item.setData(0, qtc.Qt.UserRole, record.guid)
+            record_item.setToolTip(0, record.guid)
+            for change in record.changes[:MAX_CHANGES_SHOWN]:
+                qtw.QTreeWidgetItem(
+                    record_item, [change.path, change.status, "", _short(change.old), _short(change.new)]
+                )
+            if len(record.changes) > MAX_CHANGES_SHOWN:
+                qtw.QTreeWidgetItem(
+                    record_item, [f"{len(record.changes) - MAX_CHANGES_SHOWN} more changes...", "", "", "", ""]
+                )
+        self.results.setUpdatesEnabled(True)
+        self.results.resizeColumnToContents(1)
+        self.results.resizeColumnToContents(2)
+        counts = diff.counts()
+        status = f"{counts['added']} added, {counts['removed']} removed, {counts['changed']} changed records"
+        if counts["error"]:
+            status += f", {counts['error']} could not be compared"
+        self.status.setText(status)
+
+    def _handle_export(self):
+        if self._diff is None:
+            return
+        filename, _ = qtw.QFileDialog.getSaveFileName(
+            self, self.tr("Export DataCore Diff"), "datacore_diff.json", "JSON (*.json)"
+        )
+        if not filename:
+            return
+        try:
+            self._diff.save_json(filename)
+        except OSError as e:
+            logger.exception(f"Failed to export DataCore diff to {filename}", exc_info=e)
+            self.status.setText(f"Failed to export: {e}")
+
+    def _handle_result_doubleclicked(self, result_item, column):
+        # open records that exist in the opened DataCore
+        if (guid := result_item.data(0, qtc.Qt.UserRole)) is None:
+            return
+        item = self.starfab.sc_manager.datacore_model.itemForGUID(guid)
+        if item is not None and item.record is not None:
+            self.starfab.add_tab_widget(
+                item.path, DCBRecordItemView(item, self.starfab), item.name, tooltip=item.path.as_posix()
+            )
+
+    def deleteLater(self):
+        self.cancel()
+        super().deleteLater()
+
+
+def _short(value, length=200):
+    if value is None:
+        return ""
+    value = str(value)
+    return value if len(value) <= length else f"{value[:length]}..."
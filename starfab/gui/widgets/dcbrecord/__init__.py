@@ -1,6 +1,6 @@
 import json
 import logging
-from functools import partial
+from functools import cached_property, partial
 
 from qtpy import uic
 
@@ -113,14 +113,19 @@ class DCBLazyCollapsableObjWidget(CollapsableWidget):
 
     def copy_as_json(self):
         try:
-            rec = {self.obj_name: get_starfab().sc.datacore.record_to_dict(self.obj)}
+            starfab = get_starfab()
+            if isinstance(self.obj, dftypes.Record):
+                # the record's dict comes from the record cache instead of walking the record again
+                obj_dict = json.loads(
+                    starfab.sc_manager.datacore_model.record_cache.render(starfab.sc.datacore, self.obj, "dict")
+                )
+            else:
+                obj_dict = starfab.sc.datacore.record_to_dict(self.obj)
+            text = json.dumps({self.obj_name: obj_dict}, indent=2, default=str, sort_keys=True)
 
             cb = qtw.QApplication.clipboard()
             cb.clear(mode=cb.Clipboard)
-            cb.setText(
-                json.dumps(rec, indent=2, default=str, sort_keys=True),
-                mode=cb.Clipboard,
-            )
+            cb.setText(text, mode=cb.Clipboard)
         except Exception as e:
             get_starfab().statusBar.showMessage(f"Failed to copy object: {e}")
 
@@ -131,19 +136,50 @@ class DCBLazyCollapsableObjWidget(CollapsableWidget):
             self._loaded = True
         super().expand()
 
-    def filter(self, text, ignore_case=True):
+    @cached_property
+    def _search_text(self):
+        # serialized once, the filter is re-evaluated on every change of the filter text
+        starfab = get_starfab()
+        if isinstance(self.obj, dftypes.Record):
+            return starfab.sc_manager.datacore_model.record_cache.render(
+                starfab.sc.datacore, self.obj, "json", depth=1
+            ).decode("utf-8")
+        return starfab.sc.datacore.dump_record_json(self.obj, depth=1)
+
+    @cached_property
+    def _search_text_lower(self):
+        return self._search_text.lower()
+
+    def _obj_contains(self, text, ignore_case, matching_guids):
+        if (
+            matching_guids is not None
+            and isinstance(self.obj, dftypes.Record)
+            and self.obj.id.value not in matching_guids
+        ):
+            # the text index has the same contents as `_search_text`, no need to serialize the record
+            return False
+        if ignore_case:
+            return text.lower() in self._search_text_lower
+        return text in self._search_text
+
+    def filter(self, text, ignore_case=True, matching_guids=None):
+        """`matching_guids` are the records that can contain `text` (`DataCoreTextIndex.guids_matching`). Record
+        widgets search the same contents the index was built from, so records that aren't in it are hidden without
+        being serialized. Structures fall back to searching their own serialization."""
         if not text:
             _ = True
-        elif ignore_case:
+        else:
             _ = (
-                super().filter(text, ignore_case)
-                or text.lower()
-                in get_starfab().sc.datacore.dump_record_json(self.obj, depth=1).lower()
+                any(
+                    so.filter(text, ignore_case, matching_guids)
+                    if isinstance(so, DCBLazyCollapsableObjWidget)
+                    else so.filter(text)
+                    for so in self.subObjects()
+                )
+                or (text.lower() in self.expand_button.text().lower() if ignore_case
+                    else text in self.expand_button.text())
+                or self._obj_contains(text, ignore_case, matching_guids)
             )
-        else:
-            _ = super().filter(
-                text, ignore_case
-            ) or text in get_starfab().sc.datacore.dump_record_json(self.obj, depth=1)
         self.setVisible(_)
         return _
 
@@ -197,9 +233,11 @@ class DCBObjWidget(qtw.QWidget):
                 subs.append(cw)
         return subs
 
-    def filter(self, text, ignore_case=True):
+    def filter(self, text, ignore_case=True, matching_guids=None):
         for so in self.subObjects():
-            if hasattr(so, "filter"):
+            if isinstance(so, DCBLazyCollapsableObjWidget):
+                so.filter(text, ignore_case, matching_guids)
+            elif hasattr(so, "filter"):
                 so.filter(text, ignore_case)
 
 
@@ -267,7 +305,11 @@ class DCBRecordItemView(qtw.QWidget):
         self.record_filter.editingFinished.connect(self._on_filter_changed)
 
     def _on_filter_changed(self):
-        self.record_widget.filter(self.record_filter.text())
+        text = self.record_filter.text()
+        text_index = self.starfab.sc_manager.datacore_model.text_index
+        # only answers for record widgets, nested structures search deeper than the index does
+        matching_guids = text_index.guids_matching(text) if text and text_index is not None else None
+        self.record_widget.filter(text, matching_guids=matching_guids)
 
     def _on_view(self, mode):
         content_item = ContentItem(
@@ -83,7 +83,8 @@ class StarFabDockWidget(qtw.QDockWidget):
         elif item.path.suffix.lower() in SUPPORTED_CHUNK_FILE_FORMATS:
             widget = ChunkedObjView(item)
         elif item.path.suffix.lower() in SUPPORTED_IMG_FORMATS:
-            widget = QImageViewer.fromFile(item.contents())
+            with item.open() as f:
+                widget = QImageViewer.fromFile(f)
 
         if widget is not None:
             self.starfab.add_tab_widget(item.path, widget, item.path.name)
@@ -127,7 +128,8 @@ class StarFabStaticWidget(qtw.QWidget):
         elif item.path.suffix.lower() in SUPPORTED_CHUNK_FILE_FORMATS:
             widget = ChunkedObjView(item)
         elif item.path.suffix.lower() in SUPPORTED_IMG_FORMATS:
-            widget = QImageViewer.fromFile(item.contents())
+            with item.open() as f:
+                widget = QImageViewer.fromFile(f)
         elif item.path.suffix.lower() in SUPPORTED_OBJECT_CONTAINER_FILE_FORMATS:
             widget = ObjectContainerView(item)
 
@@ -249,6 +251,9 @@ class StarFabSearchableTreeDockWidget(StarFabDockWidget):
         def _add_indexes(indexes):
             for i in indexes:
                 if self.proxy_model.hasChildren(i):
+                    if self.proxy_model.canFetchMore(i):
+                        # lazily listed children (e.g. unexpanded sub-archives) are needed to act on the selection
+                        self.proxy_model.fetchMore(i)
                     children = [
                         self.proxy_model.index(_, 0, i)
                         for _ in range(0, self.proxy_model.rowCount(i))
@@ -331,6 +336,30 @@ class StarFabSearchableTreeWidget(StarFabStaticWidget):
             self.proxy_model = PathArchiveTreeSortFilterProxyModel(parent=self)
         self.sc_tree.setModel(self.proxy_model)
 
+    def _watch_tree_model(self, model):
+        """Show `model` in the tree once it's loaded, or as soon as a streamed load starts populating it. The view is
+        set up by `_setup_tree_model`."""
+        self.sc_tree_model = model
+        self._showing_populating_model = False
+        model.populating.connect(self._handle_tree_model_populating)
+        model.loaded.connect(self._handle_tree_model_loaded)
+
+    def _setup_tree_model(self):
+        self.proxy_model.setSourceModel(self.sc_tree_model)
+        self.sc_tree.setModel(self.proxy_model)
+
+    @qtc.Slot()
+    def _handle_tree_model_populating(self):
+        self._showing_populating_model = True
+        self._setup_tree_model()
+
+    @qtc.Slot()
+    def _handle_tree_model_loaded(self):
+        if self._showing_populating_model:
+            self._showing_populating_model = False
+            return  # the view was already setup when the model started populating
+        self._setup_tree_model()
+
     def _filters_changed(self):
         fl = self.filter_widgets.layout()
         self.proxy_model.setAdditionFilters(
@@ -396,6 +425,9 @@ class StarFabSearchableTreeWidget(StarFabStaticWidget):
         def _add_indexes(indexes):
             for i in indexes:
                 if self.proxy_model.hasChildren(i):
+                    if self.proxy_model.canFetchMore(i):
+                        # lazily listed children (e.g. unexpanded sub-archives) are needed to act on the selection
+                        self.proxy_model.fetchMore(i)
                     children = [
                         self.proxy_model.index(_, 0, i)
                         for _ in range(0, self.proxy_model.rowCount(i))
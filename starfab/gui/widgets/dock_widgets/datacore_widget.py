@@ -1,15 +1,15 @@
 import operator
 import os
-import shutil
-import time
 import typing
 from functools import partial
 from pathlib import Path
 
-from scdatatools.forge.dftypes import StructureInstance
+import qtawesome as qta
+
 from starfab import get_starfab
 from starfab.gui import qtc, qtw, qtg
 from starfab.gui.widgets.common import TagBar
+from starfab.gui.widgets.datacore_diff import DataCoreDiffView
 from starfab.gui.widgets.dcbrecord import DCBRecordItemView
 from starfab.gui.widgets.dock_widgets.common import (
     StarFabSearchableTreeWidget,
@@ -17,31 +17,13 @@ from starfab.gui.widgets.dock_widgets.common import (
 )
 from starfab.log import getLogger
 from starfab.models.datacore import DCBSortFilterProxyModel, DCBItem
+from starfab.models.datacore_extract import DCBExtractRunner
+from starfab.models.filters import HasTags, TypeEquals
 from starfab.utils import show_file_in_filemanager, reload_starfab_modules
 
 logger = getLogger(__name__)
 
 
-def _filter_tags(item, method, tags, tdb):
-    if item.record is None:
-        return False
-    tags_to_check = set()
-    item_tags = item.record.properties.get("tags", [])
-    if isinstance(item_tags, StructureInstance):
-        tags_to_check.update(
-            str(tag)
-            for _ in item_tags.properties.values()
-            if (tag := tdb.tags_by_guid.get(str(_)) is not None)
-        )
-    else:
-        tags_to_check.update(
-            str(tag)
-            for _ in item_tags
-            if (tag := tdb.tags_by_guid.get(_.name)) is not None
-        )
-    return method(tag in tags for tag in tags_to_check)
-
-
 class DCBFilterWidget(StarFabSearchableTreeFilterWidget):
     filter_types = {
         "has_any_tag": "Has Any Tag",
@@ -109,25 +91,17 @@ class DCBFilterWidget(StarFabSearchableTreeFilterWidget):
         if not self.tagbar.tags or starfab.sc is None:
             return None
         elif filter_type == "has_any_tag":
-            return op, partial(
-                _filter_tags,
-                method=any,
-                tags=self.tagbar.tags,
-                tdb=starfab.sc.tag_database,
+            return op, HasTags(
+                self.tagbar.tags, starfab.sc.tag_database, match=any,
+                tag_index=starfab.sc_manager.tag_database_model.tag_index
             )
         elif filter_type == "has_all_tags":
-            return op, partial(
-                _filter_tags,
-                method=all,
-                tags=self.tagbar.tags,
-                tdb=starfab.sc.tag_database,
+            return op, HasTags(
+                self.tagbar.tags, starfab.sc.tag_database, match=all,
+                tag_index=starfab.sc_manager.tag_database_model.tag_index
             )
         elif filter_type == "type":
-            return (
-                op,
-                lambda i, ts=self.tagbar.tags: i.record is not None
-                and i.record.type in ts,
-            )
+            return op, TypeEquals(self.tagbar.tags)
 
     def _handle_filter_updated(self):
         self.filter_changed.emit()
@@ -148,10 +122,7 @@ class DCBTreeWidget(StarFabSearchableTreeWidget):
     def __init__(self, *args, **kwargs):
         super().__init__(proxy_model=DCBSortFilterProxyModel, *args, **kwargs)
 
-        self.sc_tree_model = self.starfab.sc_manager.datacore_model
-        self.starfab.sc_manager.datacore_model.loaded.connect(
-            self._handle_datacore_loaded
-        )
+        self._watch_tree_model(self.starfab.sc_manager.datacore_model)
 
         self.proxy_model.setFilterKeyColumn(3)
 
@@ -164,6 +135,16 @@ class DCBTreeWidget(StarFabSearchableTreeWidget):
         extract_all.triggered.connect(
             partial(self.ctx_manager.handle_action, "extract_all")
         )
+        self._extract_runner = None
+        self.cancel_extract = qtw.QAction("Cancel Extraction", self)
+        self.cancel_extract.setEnabled(False)
+        self.cancel_extract.triggered.connect(
+            partial(self.ctx_manager.handle_action, "cancel_extract")
+        )
+        self.ctx_manager.default_menu.addAction(self.cancel_extract)
+        self.ctx_manager.menus[""].addAction(self.cancel_extract)
+        compare = self.ctx_manager.menus[""].addAction("Compare Game.dcb...")
+        compare.triggered.connect(partial(self.ctx_manager.handle_action, "compare"))
         copy_path = self.ctx_manager.menus[""].addAction("Copy Path")
         copy_path.triggered.connect(
             partial(self.ctx_manager.handle_action, "copy_path")
@@ -175,13 +156,27 @@ class DCBTreeWidget(StarFabSearchableTreeWidget):
 
         self.sc_add_filter.show()
 
+        self.sc_search_records = qtw.QToolButton()
+        self.sc_search_records.setIcon(qta.icon("mdi6.text-box-search-outline"))
+        self.sc_search_records.setCheckable(True)
+        self.sc_search_records.setToolTip(self.tr("Search inside records"))
+        self.sc_search_records.toggled.connect(self._handle_search_records_toggled)
+        self.horizontalLayout.insertWidget(
+            self.horizontalLayout.indexOf(self.sc_search), self.sc_search_records
+        )
+
     def _create_filter(self):
         return DCBFilterWidget(self)
 
-    @qtc.Slot()
-    def _handle_datacore_loaded(self):
-        self.proxy_model.setSourceModel(self.sc_tree_model)
-        self.sc_tree.setModel(self.proxy_model)
+    @qtc.Slot(bool)
+    def _handle_search_records_toggled(self, checked):
+        if checked and self.sc_tree_model.text_index is None:
+            # results are shown once the index is ready, see `DCBSortFilterProxyModel._handle_text_index_ready`
+            self.sc_tree_model.build_text_index()
+        self.proxy_model.setSearchRecords(checked)
+
+    def _setup_tree_model(self):
+        super()._setup_tree_model()
         self.proxy_model.sort(0, qtc.Qt.SortOrder.AscendingOrder)
 
         header = self.sc_tree.header()
@@ -200,38 +195,38 @@ class DCBTreeWidget(StarFabSearchableTreeWidget):
             # TODO: error dialog
 
     def extract_items(self, items):
-        items = [i for i in items if i.guid]
-        edir = Path(qtw.QFileDialog.getExistingDirectory(self.starfab, "Extract to..."))
-        if edir:
-            total = len(items)
-            self.starfab.task_started.emit(
-                "extract_dcb", f"Extracting to {edir.name}", 0, total
+        self.extract_records([(i.guid, i.path) for i in items if i.guid])
+
+    def extract_records(self, records):
+        """Extract `records`, a list of `(guid, path)` or a callable returning them, see `DCBExtractRunner`"""
+        if self._extract_runner is not None:
+            qtw.QMessageBox.information(
+                self, "Extract", "Records are already being extracted, cancel the current extraction first."
             )
-            t = time.time()
-            for i, item in enumerate(items):
-                if (time.time() - t) > 0.5:
-                    self.starfab.update_status_progress.emit(
-                        "extract_dcb", i, 0, total, f"Extracting records to {edir.name}"
-                    )
-                    t = time.time()
-                try:
-                    outfile = edir / item.path
-                    outfile.parent.mkdir(parents=True, exist_ok=True)
-                    if outfile.is_file():
-                        outfile = (
-                            outfile.parent
-                            / f"{outfile.stem}.{item.guid}{outfile.suffix}"
-                        )
-                    with outfile.open("wb") as o:
-                        shutil.copyfileobj(item.contents(), o)
-                    qtg.QGuiApplication.processEvents()
-                except Exception as e:
-                    logger.exception(
-                        f"Exception extracting record {item.path}", exc_info=e
-                    )
-
-            self.starfab.task_finished.emit("extract_dcb", True, "")
-            show_file_in_filemanager(Path(edir))
+            return
+        if not records or not (edir := qtw.QFileDialog.getExistingDirectory(self.starfab, "Extract to...")):
+            return
+        self._extract_runner = DCBExtractRunner(
+            self.sc_tree_model.archive,
+            self.sc_tree_model.record_cache,
+            records,
+            Path(edir),
+            fmt=self.starfab.settings.snapshot.value("cryxmlbConversionFormat", "xml"),
+        )
+        self._extract_runner.signals.finished.connect(self._handle_extract_finished)
+        self.cancel_extract.setEnabled(True)
+        qtc.QThreadPool.globalInstance().start(self._extract_runner)
+
+    @qtc.Slot(dict)
+    def _handle_extract_finished(self, result):
+        self._extract_runner = None
+        self.cancel_extract.setEnabled(False)
+        if not result.get("cancelled"):
+            show_file_in_filemanager(result["outdir"])
+
+    def _cancel_extract(self):
+        if self._extract_runner is not None:
+            self._extract_runner.signals.cancel.emit()
 
     @qtc.Slot(str)
     def _on_ctx_triggered(self, action):
@@ -242,7 +237,12 @@ class DCBTreeWidget(StarFabSearchableTreeWidget):
                 return
             self.extract_items(selected_items)
         elif action == "extract_all":
-            self.extract_items(self.sc_tree_model._guid_cache.values())
+            # listed by the runner, rather than creating every item of a lazy tree here
+            self.extract_records(self.sc_tree_model.record_paths)
+        elif action == "compare":
+            self.starfab.add_tab_widget("datacore_diff", DataCoreDiffView(), "DataCore Diff")
+        elif action == "cancel_extract":
+            self._cancel_extract()
         elif action == "copy_path":
             qtg.QGuiApplication.clipboard().setText(selected_items[0].path.as_posix())
         else:
@@ -38,6 +38,16 @@ class FileSystemWrapper:
             c = f"Failed to read {self.name}: {e}".encode("utf-8")
         return io.BytesIO(c)
 
+    def open(self):
+        return self.path.open("rb")
+
+    def content_view(self):
+        try:
+            c = self.path.read_bytes()
+        except Exception as e:
+            c = f"Failed to read {self.name}: {e}".encode("utf-8")
+        return memoryview(c)
+
 
 class FileViewDock(StarFabSearchableTreeDockWidget):
     def __init__(self, *args, **kwargs):
@@ -10,13 +10,18 @@ from starfab.gui import qtc, qtw, qtg
 from starfab.models.common import AudioConverter
 from starfab.gui.utils import ScrollMessageBox
 from starfab.gui.dialogs.export_dialog import P4KExportDialog
+from starfab.gui.widgets.content_search import P4KContentSearchView
 from starfab.gui.widgets.dock_widgets.common import StarFabSearchableTreeWidget
+from starfab.gui.widgets.editor import SUPPORTED_EDITOR_FORMATS
+from starfab.gui.widgets.image_viewer import SUPPORTED_IMG_FORMATS
 from starfab.models.p4k import P4KSortFilterProxyModelArchive
 from starfab.utils import show_file_in_filemanager
 from starfab.log import getLogger
 
 logger = getLogger(__name__)
 P4KWIDGET_COLUMNS = ["Name", "Size", "Kind", "Date Modified"]
+# files that are read when opened, these are prefetched when they're selected
+PREFETCH_FORMATS = set(SUPPORTED_EDITOR_FORMATS) | SUPPORTED_IMG_FORMATS
 
 
 class P4KView(StarFabSearchableTreeWidget):
@@ -24,8 +29,7 @@ class P4KView(StarFabSearchableTreeWidget):
         super().__init__(proxy_model=P4KSortFilterProxyModelArchive, *args, **kwargs)
         self.setWindowTitle(self.tr("Data.p4k"))
 
-        self.sc_tree_model = self.starfab.sc_manager.p4k_model
-        self.starfab.sc_manager.p4k_model.loaded.connect(self._handle_p4k_loaded)
+        self._watch_tree_model(self.starfab.sc_manager.p4k_model)
 
         self.ctx_manager.default_menu.addSeparator()
         save_file = self.ctx_manager.menus[""].addAction("Save To...")
@@ -36,6 +40,10 @@ class P4KView(StarFabSearchableTreeWidget):
         copy_path.triggered.connect(
             partial(self.ctx_manager.handle_action, "copy_path")
         )
+        search_contents = self.ctx_manager.menus[""].addAction("Search Contents...")
+        search_contents.triggered.connect(
+            partial(self.ctx_manager.handle_action, "search_contents")
+        )
 
         wem_menu = self.ctx_manager.menus[".wem"] = qtw.QMenu()
         convert_wem = wem_menu.addAction("Convert wem")
@@ -46,9 +54,28 @@ class P4KView(StarFabSearchableTreeWidget):
         self.proxy_model.setRecursiveFilteringEnabled(True)
         self.proxy_model.setFilterCaseSensitivity(qtc.Qt.CaseInsensitive)
         self.proxy_model.setSortCaseSensitivity(qtc.Qt.CaseInsensitive)
+        self.sc_tree.selectionModel().currentChanged.connect(self._handle_current_changed)
+
+    @qtc.Slot(qtc.QModelIndex, qtc.QModelIndex)
+    def _handle_current_changed(self, current, previous):
+        item = self.proxy_model.mapToSource(current).internalPointer() if current.isValid() else None
+        if item is not None and item.suffix.lower() in PREFETCH_FORMATS:
+            self.sc_tree_model.prefetch(item)
+        else:
+            self.sc_tree_model.cancel_prefetch()
 
     @qtc.Slot(str)
     def _on_ctx_triggered(self, action):
+        if action == "search_contents":
+            folder = self.proxy_model.mapToSource(self._ctx_item).internalPointer() if self._ctx_item else None
+            file_filter = f"{folder._path}/*" if folder is not None and folder.parent is not None else ""
+            self.starfab.add_tab_widget(
+                f"p4k_content_search:{file_filter}",
+                P4KContentSearchView(file_filter=file_filter),
+                f"Search {file_filter or 'Data.p4k'}",
+            )
+            return
+
         selected_items = super()._on_ctx_triggered(action)
 
         # Item Actions
@@ -108,11 +135,25 @@ class P4KView(StarFabSearchableTreeWidget):
                     })
                     if ".dds" in item.name:
                         basename = f'{item.name.split(".dds")[0]}.dds'
-                        items = [
-                            _
-                            for _ in item.parent.children
-                            if _.path.name.startswith(basename)
-                        ]
+                        if (p4k_index := self.sc_tree_model.p4k_index) is not None:
+                            # the split mips share the header's path as a prefix, look them up instead of
+                            # scanning every file in the folder
+                            prefix = (
+                                f"{item._path.rsplit('/', maxsplit=1)[0]}/{basename}"
+                                if "/" in item._path
+                                else basename
+                            )
+                            items = [
+                                _
+                                for i in p4k_index.ids_with_prefix(prefix)
+                                if (_ := self.sc_tree_model.itemForPath(p4k_index.filenames[i])) is not None
+                            ]
+                        else:
+                            items = [
+                                _
+                                for _ in item.parent.children
+                                if _.path.name.startswith(basename)
+                            ]
                         self._handle_item_action(
                             {i.path.as_posix(): i for i in items}, self.sc_tree_model, index
                         )
@@ -127,9 +168,8 @@ class P4KView(StarFabSearchableTreeWidget):
                 logger.exception(e)
                 ScrollMessageBox.critical(self, "Error opening file", f"{e}")
 
-    def _handle_p4k_loaded(self):
-        self.proxy_model.setSourceModel(self.sc_tree_model)
-        self.sc_tree.setModel(self.proxy_model)
+    def _setup_tree_model(self):
+        super()._setup_tree_model()
         self.proxy_model.sort(0, qtc.Qt.SortOrder.AscendingOrder)
 
         header = self.sc_tree.header()
@@ -247,10 +247,10 @@ class Editor(QWebEngineView):
         settings.settings_updated.connect(self._update_settings)
 
     def _update_settings(self):
-        self.ace.set_theme.emit(THEMES.get(settings.value('editor/theme'), DEFAULT_THEME))
-        self.ace.set_key_bindings.emit(settings.value('editor/key_bindings'))
-        self.ace.set_str_option.emit('wrap', WRAP_MODES.get(settings.value('editor/word_wrap').lower(), 'off'))
-        self.ace.set_bool_option.emit('showLineNumbers', parse_bool(settings.value('editor/line_numbers')))
+        self.ace.set_theme.emit(THEMES.get(settings.snapshot.value('editor/theme'), DEFAULT_THEME))
+        self.ace.set_key_bindings.emit(settings.snapshot.value('editor/key_bindings'))
+        self.ace.set_str_option.emit('wrap', WRAP_MODES.get(settings.snapshot.value('editor/word_wrap').lower(), 'off'))
+        self.ace.set_bool_option.emit('showLineNumbers', settings.snapshot.value('editor/line_numbers'))
 
     def contextMenuEvent(self, event):
         filter_actions = ["Back", "Forward", "Reload", "Save page", "View page source"]
@@ -289,8 +289,8 @@ class Editor(QWebEngineView):
     def _on_ace_ready(self):
         try:
             self._update_settings()
-            self.ace.set_value.emit(
-                self.editor_item.contents().read().decode("utf-8").replace("\x00", "")
-            )
+            with self.editor_item.content_view() as contents:
+                text = str(contents, "utf-8")
+            self.ace.set_value.emit(text.replace("\x00", ""))
         except Exception as e:
             self.ace.set_value.emit(f"Failed to open {self.editor_item.name}: {e}")
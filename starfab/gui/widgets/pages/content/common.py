@@ -57,9 +57,24 @@ class ContentSelector(StarFabSearchableTreeWidget):
 
 
 class P4KContentSelector(ContentSelector):
+    # suffixes of the files `_handle_item_action` previews, only these are read ahead when they're hovered
+    preview_formats = set()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.starfab.sc_manager.p4k_model.loaded.connect(self._handle_p4k_loaded)
+        # read the entry under the mouse ahead of it being opened
+        self.sc_tree.setMouseTracking(True)
+        self.sc_tree.entered.connect(self._handle_entered)
+        self.sc_tree.viewportEntered.connect(self.starfab.sc_manager.p4k_model.cancel_prefetch)
+
+    @qtc.Slot(qtc.QModelIndex)
+    def _handle_entered(self, index):
+        item = self.proxy_model.mapToSource(index).internalPointer()
+        if item is not None and item.suffix.lower() in self.preview_formats:
+            self.starfab.sc_manager.p4k_model.prefetch(item)
+        else:
+            self.starfab.sc_manager.p4k_model.cancel_prefetch()
 
     @qtc.Slot()
     def _handle_p4k_loaded(self):
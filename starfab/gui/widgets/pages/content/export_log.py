@@ -215,7 +215,7 @@ class BlueprintExportLog(qtw.QDialog):
         self.output_tabs.setCurrentWidget(overview_tab)
 
         open_dir = parse_bool(
-            self.export_options.get('auto_open_folder', self.starfab.settings.value('extract/auto_open_folder'))
+            self.export_options.get('auto_open_folder', self.starfab.settings.snapshot.value('extract/auto_open_folder'))
         )
         if open_dir:
             show_file_in_filemanager(Path(self.outdir))
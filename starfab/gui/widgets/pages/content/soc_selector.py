@@ -2,6 +2,7 @@ import operator
 
 from scdatatools.sc.blueprints.generators.object_containers import blueprint_from_socpak
 from starfab.gui import qtc
+from starfab.models.filters import SuffixEquals
 from starfab.models.p4k import P4KSortFilterProxyModelArchive
 from .common import P4KContentSelector, AlternateRootModel
 from .export_log import ExtractionItem
@@ -10,7 +11,7 @@ from .export_log import ExtractionItem
 class SOCExporterSortFilter(P4KSortFilterProxyModelArchive):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._filters = [(operator.and_, lambda i: i.path.suffix.lower() == ".socpak")]
+        self._filters = [(operator.and_, SuffixEquals(".socpak"))]
 
 
 class SOCSelector(P4KContentSelector):
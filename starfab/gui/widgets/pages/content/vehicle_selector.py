@@ -22,6 +22,7 @@ class VehiclesLoader(DCBLoader):
     def items_to_load(self):
         # trigger datacore to load here
         self.model.archive = self.model.archive.datacore
+        self._sibling_names = {}
 
         items = []
         for r in self.model.archive.records:
@@ -51,7 +52,7 @@ class VehiclesLoader(DCBLoader):
 
         return items
 
-    def load_item(self, item):
+    def entries_for_item(self, item):
         category, item = item
         if category == VEHICLES_CATEGORY:
             path = item.filename.replace(VEHICLES_ROOT, "")
@@ -60,15 +61,9 @@ class VehiclesLoader(DCBLoader):
 
         parent_path, name = path.rsplit("/", maxsplit=1) if "/" in path else ("", path)
         parent_path = f"{category} / {parent_path}" if parent_path else category
-        parent = self.model.parentForPath(parent_path)
         # name = name.replace(".xml", "")
-        name = item.name
-        if name in parent.children_by_name:
-            name = f"{name}.{item.id.value}"
-        new_item = self._item_cls(
-            f"{parent_path}/{name}", model=self.model, record=item, parent=parent
-        )
-        self.model._guid_cache[new_item.guid] = new_item
+        name = self._unique_name(parent_path, item.name, item.id.value)
+        yield parent_path, f"{parent_path}/{name}", {"record": item}
 
 
 class VehicleSelector(DCBContentSelector):
@@ -33,6 +33,8 @@ class AudioTreeSortFilterProxyModel(PathArchiveTreeSortFilterProxyModel):
                 item = parent.children[source_row]
             except IndexError:
                 return False
+            if self._search_result is not None:
+                return self._search_result.accepts(item)
             if not self._filter and not self.checkAdditionFilters(item):
                 return False
             elif self.checkAdditionFilters(item):
@@ -69,24 +71,28 @@ class AudioTreeLoader(PathArchiveTreeModelLoader):
             if (time.time() - t) > 0.5:
                 self.starfab.update_status_progress.emit("init_gameaudio", i, 0, 0, "")
                 t = time.time()
-            wwise.load_game_audio_file(self.starfab.sc.p4k.open(p4kfile))
+            with self.starfab.sc_manager.p4k_reader() as p4k, p4k.open(p4kfile) as f:
+                wwise.load_game_audio_file(f)
 
         self.starfab.task_finished.emit("init_gameaudio", True, "")
         return wwise.preloads
 
-    def load_item(self, item):
+    def entries_for_item(self, item):
         base_path = "GameAudio" + "/" + item
         preload = self.model.archive.wwise.preloads[item]
         atl_names = list(preload["triggers"].keys()) + list(
             preload["external_sources"].keys()
         )
         for atl_name in atl_names:
-            self._item_cls(
-                base_path + "/" + atl_name,
-                model=self.model,
-                atl_name=atl_name,
-                parent=self.model.parentForPath(base_path),
-            )
+            yield base_path, base_path + "/" + atl_name, {"atl_name": atl_name}
+
+    def search_terms(self, parent_path, path, kwargs):
+        # matches `AudioTreeSortFilterProxyModel`, triggers are found by name or by the exact id of one of their wems
+        wems = self.model.archive.wwise.wems_for_atl_name(kwargs["atl_name"]).keys()
+        return kwargs["atl_name"], wems
+
+    def folder_search_text(self, folder_path):
+        return folder_path.rsplit("/", maxsplit=1)[-1]
 
 
 class AudioTreeItem(PathArchiveTreeItem, ContentItem):
@@ -148,15 +154,11 @@ class AudioTreeModel(ThreadLoadedPathArchiveTreeModel):
             loader_task_status_msg="Processing Audio",
         )
 
-        self._sc_manager.p4k_model.loaded.connect(self._on_p4k_loaded)
+        # loading is started by `StarCitizenManager` once the p4k's file list is available
         self._sc_manager.p4k_model.unloading.connect(
             self._on_p4k_unloading,  # qtc.Qt.BlockingQueuedConnection
         )
 
-    @qtc.Slot()
-    def _on_p4k_loaded(self):
-        self.load(self._sc_manager.sc)
-
     @qtc.Slot()
     def _on_p4k_unloading(self):
         self.unload()
@@ -2,8 +2,11 @@ import io
 import logging
 import operator
 import os
+import threading
 import time
 import typing
+from array import array
+from contextlib import contextmanager
 from datetime import timedelta
 from functools import cached_property
 from pathlib import Path
@@ -14,6 +17,17 @@ from starfab import get_starfab
 from starfab.gui import qtc, qtg
 from starfab.gui.utils import icon_provider, icon_for_path
 from starfab.log import getLogger
+from starfab.models.compact import (
+    CompactTreeStore,
+    CompactFolderCache,
+    compact_item_class,
+    NO_NODE,
+    ROOT_NODE,
+)
+from starfab.models.lazy import LazyTreeSource, resolve_folder_path
+from starfab.models.filters import is_compiled
+from starfab.models.search import SearchIndex
+from starfab.models.tree_builder import PathTreeBuilder
 from starfab.settings import settings
 from starfab.utils import show_file_in_filemanager
 
@@ -78,15 +92,17 @@ class ExportRunner(qtc.QRunnable):
                 qtg.QGuiApplication.processEvents()
 
         try:
-            self.starfab.sc_manager.sc.p4k.extractall(
-                members=self.p4k_files,
-                path=self.outdir,
-                monitor=_monitor,
-                save_to=self.save_to,
-                overwrite=self.export_options.get("overwrite", False),
-                converters=self.export_options.get("converters", []),
-                converter_options=self.export_options,
-            )
+            # exports can take a long time, they get a handle of their own instead of holding one of the pool's
+            with self.starfab.sc_manager.p4k_reader(dedicated=True) as p4k:
+                p4k.extractall(
+                    members=self.p4k_files,
+                    path=self.outdir,
+                    monitor=_monitor,
+                    save_to=self.save_to,
+                    overwrite=self.export_options.get("overwrite", False),
+                    converters=self.export_options.get("converters", []),
+                    converter_options=self.export_options,
+                )
         except Exception as e:
             logger.exception(f"Export failed", exc_info=e)
             self.signals.finished.emit({"error": str(e)})
@@ -94,7 +110,7 @@ class ExportRunner(qtc.QRunnable):
         else:
             self.signals.finished.emit({"error": ""})
             open_dir = parse_bool(
-                self.export_options.get('auto_open_folder', self.starfab.settings.value('extract/auto_open_folder'))
+                self.export_options.get('auto_open_folder', self.starfab.settings.snapshot.value('extract/auto_open_folder'))
             )
             if open_dir:
                 show_file_in_filemanager(Path(self.outdir).absolute())
@@ -104,6 +120,7 @@ class ExportRunner(qtc.QRunnable):
 class BackgroundRunnerSignals(qtc.QObject):
     cancel = qtc.Signal()
     finished = qtc.Signal(dict)
+    batch = qtc.Signal(object)
 
 
 class PathArchiveTreeSortFilterProxyModel(qtc.QSortFilterProxyModel):
@@ -112,18 +129,52 @@ class PathArchiveTreeSortFilterProxyModel(qtc.QSortFilterProxyModel):
         self._filter = ""
         self._filters = []
         self._dynamic_filters = []
+        self._search_result = None
+        self._sort_ranks = {}  # parent item -> (child count, column, ranks), see `_ranks_for`
+        self._folders_first = settings.snapshot.value("tree_view_folders_first")
         self.setRecursiveFilteringEnabled(True)
+        # connected to a slot so Qt drops the connection when the proxy is destroyed and doesn't keep it alive
+        settings.settings_updated.connect(self._handle_settings_updated)
 
     @property
     def additional_filters(self):
         return self._filters + self._dynamic_filters
 
+    def _update_search(self):
+        """Answer the filter text and additional filters from the source model's `SearchIndex` when possible. The
+        result already includes the folders leading to every match, so recursive filtering is only needed when falling
+        back to testing each row."""
+        index = getattr(self.sourceModel(), "search_index", None)
+        if (
+            (self._filter or self.additional_filters)
+            and index is not None
+            and is_compiled(self.additional_filters)
+            and self.filterCaseSensitivity() == qtc.Qt.CaseInsensitive
+        ):
+            self._search_result = index.select(self._filter, self.additional_filters)
+        else:
+            self._search_result = None
+        self.setRecursiveFilteringEnabled(self._search_result is None)
+
+    def setSourceModel(self, model):
+        if (current := self.sourceModel()) is not None:
+            current.modelAboutToBeReset.disconnect(self._clear_sort_ranks)
+            current.layoutChanged.disconnect(self._clear_sort_ranks)
+        self._clear_sort_ranks()
+        super().setSourceModel(model)
+        if model is not None:
+            model.modelAboutToBeReset.connect(self._clear_sort_ranks)
+            model.layoutChanged.connect(self._clear_sort_ranks)
+        self._update_search()
+
     def setFilterText(self, text):
         self._filter = text
+        self._update_search()
         self.invalidateFilter()
 
     def setAdditionFilters(self, filters):
         self._dynamic_filters = filters
+        self._update_search()
         self.invalidateFilter()
 
     def checkAdditionFilters(self, item):
@@ -135,15 +186,63 @@ class PathArchiveTreeSortFilterProxyModel(qtc.QSortFilterProxyModel):
                 accepted = op(accepted, adfilt(item))
         return accepted
 
+    def _clear_sort_ranks(self):
+        self._sort_ranks = {}
+
+    @qtc.Slot()
+    def _handle_settings_updated(self):
+        folders_first = settings.snapshot.value("tree_view_folders_first")
+        if folders_first != self._folders_first:
+            self._folders_first = folders_first
+            self.invalidate()
+
+    def invalidate(self):
+        self._clear_sort_ranks()
+        super().invalidate()
+
+    def sort(self, column, order=qtc.Qt.AscendingOrder):
+        self._folders_first = settings.snapshot.value("tree_view_folders_first")
+        self._clear_sort_ranks()
+        super().sort(column, order)
+
+    def sortKey(self, item, column):
+        """The key `item` is sorted by for `column`, folders are grouped first when `tree_view_folders_first` is
+        set"""
+        if item is None:
+            return (True, "") if self._folders_first else ""
+        if (sort_key := getattr(item, "sort_key", None)) is not None:
+            key = sort_key(column)
+        else:
+            value = item.data(column, qtc.Qt.DisplayRole)
+            key = str(value).casefold() if value is not None else ""
+        if self._folders_first:
+            return not item.has_children(), key
+        return key
+
+    def _ranks_for(self, source_index) -> array:
+        """The rank of every child of `source_index`'s parent in the current sort order.
+
+        The children of a node are sorted once with precomputed keys when Qt first compares them (i.e. when the node
+        is expanded), after which `lessThan` is a lookup. The ranks are recomputed if the node gained children."""
+        model = self.sourceModel()
+        parent_index = source_index.parent()
+        parent = parent_index.internalPointer() if parent_index.isValid() else model.root_item
+        column = source_index.column()
+        count = parent.childCount()
+        cached = self._sort_ranks.get(parent)
+        if cached is not None and cached[0] == count and cached[1] == column:
+            return cached[2]
+
+        keys = [self.sortKey(parent.child(row), column) for row in range(count)]
+        ranks = array("l", [0]) * count
+        for rank, row in enumerate(sorted(range(count), key=keys.__getitem__)):
+            ranks[row] = rank
+        self._sort_ranks[parent] = (count, column, ranks)
+        return ranks
+
     def lessThan(self, source_left, source_right):
-        if settings.value('tree_view_folders_first'):
-            left_has_children = bool(source_left.internalPointer().has_children())
-            right_has_children = bool(source_right.internalPointer().has_children())
-            if left_has_children and not right_has_children:
-                return True
-            elif right_has_children and not left_has_children:
-                return False
-        return super().lessThan(source_left, source_right)
+        ranks = self._ranks_for(source_left)
+        return ranks[source_left.row()] < ranks[source_right.row()]
 
     def filterAcceptsRow(self, source_row, source_parent: qtc.QModelIndex) -> bool:
         if not self._filter and not self.additional_filters:
@@ -156,6 +255,8 @@ class PathArchiveTreeSortFilterProxyModel(qtc.QSortFilterProxyModel):
                 item = parent.children[source_row]
             except IndexError:
                 return False
+            if self._search_result is not None:
+                return self._search_result.accepts(item)
             if not self._filter and not self.checkAdditionFilters(item):
                 return False
             elif self.checkAdditionFilters(item):
@@ -167,7 +268,8 @@ class PathArchiveTreeSortFilterProxyModel(qtc.QSortFilterProxyModel):
 
 
 class PathArchiveTreeItem:
-    _cached_properties_ = ["info", "icon", "suffix", "path"]
+    _cached_properties_ = ["info", "icon", "suffix", "path", "sort_name"]
+    _row = 0  # position of the item within `parent.children`, maintained by the parent
 
     def __init__(self, path, model, parent=None):
         self._path = path
@@ -178,7 +280,7 @@ class PathArchiveTreeItem:
         self.children_by_name = {}
 
         if parent is not None:
-            parent.appendChild(self)
+            model._attach(parent, self)
 
     def __repr__(self):
         return f"<PathArchiveTreeItem {self.path} children:{len(self.children)}>"
@@ -211,11 +313,23 @@ class PathArchiveTreeItem:
     def icon(self):
         return icon_for_path(self.name) or icon_provider.icon(icon_provider.Folder)
 
+    @cached_property
+    def sort_name(self):
+        return self.name.casefold()
+
+    def sort_key(self, column):
+        """The key used by `PathArchiveTreeSortFilterProxyModel` to sort by `column`"""
+        if column == 0:
+            return self.sort_name
+        value = self.data(column, qtc.Qt.DisplayRole)
+        return str(value).casefold() if value is not None else ""
+
     def has_children(self):
-        return bool(self.children)
+        return bool(self.children) or self.model.has_pending_children(self)
 
     def appendChild(self, child):
         child.parent = self
+        child._row = len(self.children)
         self.children.append(child)
         self.children_by_name[child.name] = child
 
@@ -223,12 +337,25 @@ class PathArchiveTreeItem:
         for child in children:
             self.appendChild(child)
 
+    def removeChild(self, child):
+        del self.children[child._row]
+        if self.children_by_name.get(child.name) is child:
+            del self.children_by_name[child.name]
+        for row in range(child._row, len(self.children)):
+            self.children[row]._row = row
+        child.parent = None
+
+    def sortChildren(self, key=None, reverse=False):
+        self.children.sort(key=key, reverse=reverse)
+        for row, child in enumerate(self.children):
+            child._row = row
+
     def child(self, row):
         return self.children[row]
 
     def row(self):
         if self.parent is not None:
-            return self.parent.children.index(self)
+            return self._row
         return 0
 
     def index(self):
@@ -254,13 +381,22 @@ class PathArchiveTreeItem:
 
 
 class PathArchiveTreeModel(qtc.QAbstractItemModel):
+    _staged = None  # (parent, child) pairs waiting to be inserted by the GUI thread, see `_attach`
+    _staging_thread = None  # the thread whose new items are staged, see `begin_staging`
+
     def __init__(self, archive, columns=None, item_cls=None, parent=None):
         super().__init__(parent=parent)
         self.archive = archive
         self.columns = columns or ["Name", "Type"]
         self._item_cls = item_cls or PathArchiveTreeItem
         self.root_item = None
+        self._store = None
+        self._compact_items = {}
+        self._lazy = None
+        self._lazy_pending = {}
+        self.search_index = None
         self._parent_cache = {".": self.root_item}
+        self._staged_lock = threading.Lock()
         self._setup_root()
 
     def _setup_root(self):
@@ -268,9 +404,184 @@ class PathArchiveTreeModel(qtc.QAbstractItemModel):
 
     def clear(self):
         self.archive = None
+        self._store = None
+        self._compact_items = {}
+        self._lazy = None
+        self._lazy_pending = {}
+        self.take_staged(finish=True)
+        self.search_index = None
         self._setup_root()
         self._parent_cache = {".": self.root_item}
 
+    def begin_staging(self):
+        """Stage the items created by the calling thread instead of appending them to their parents, until
+        `take_staged(finish=True)`. The staged items are added with `insertChildren`."""
+        with self._staged_lock:
+            self._staged = []
+            self._staging_thread = threading.get_ident()
+
+    def take_staged(self, finish=False) -> list:
+        """Returns the `(parent, child)` pairs staged so far, and stops staging if `finish`"""
+        with self._staged_lock:
+            staged = self._staged or []
+            if finish:
+                self._staged = self._staging_thread = None
+            else:
+                self._staged = []
+        return staged
+
+    def _streaming_elsewhere(self) -> bool:
+        # another thread is populating the model, items it creates aren't in the tree until they're inserted
+        return self._staging_thread is not None and self._staging_thread != threading.get_ident()
+
+    def _attach(self, parent, child):
+        if self._staging_thread == threading.get_ident():
+            with self._staged_lock:
+                if self._staged is not None:
+                    # Only the parent is set right away. `children` and `children_by_name` belong to the GUI thread,
+                    # the child is appended to them in `insertChildren`, so lookups never see an item without a row
+                    child.parent = parent
+                    self._staged.append((parent, child))
+                    return
+        parent.appendChild(child)
+
+    def insertChildren(self, staged, folders=None):
+        """Append the staged `(parent, child)` pairs to their parents, signalling the insertions to any views. Parents
+        are always staged before their children, so handling them in the order they first appear keeps every parent
+        in the tree before rows are inserted below it. `folders` (`{lower-cased path: folder}`) are the staged folders
+        to publish in `_parent_cache` once they're in the tree."""
+        children_by_parent = {}
+        for parent, child in staged:
+            children_by_parent.setdefault(parent, []).append(child)
+
+        for parent, children in children_by_parent.items():
+            index = qtc.QModelIndex() if parent == self.root_item else self.createIndex(parent.row(), 0, parent)
+            first = len(parent.children)
+            self.beginInsertRows(index, first, first + len(children) - 1)
+            parent.appendChildren(children)
+            self.endInsertRows()
+        if folders:
+            self._parent_cache.update(folders)
+
+    def removeItem(self, item):
+        """Remove `item` and everything below it from the tree, signalling the removal to any views"""
+        parent = item.parent
+        index = qtc.QModelIndex() if parent == self.root_item else self.createIndex(parent.row(), 0, parent)
+        row = item.row()
+        self.beginRemoveRows(index, row, row)
+        parent.removeChild(item)
+        self.endRemoveRows()
+        lower_path = item._path.lower()
+        for path in [_ for _ in self._parent_cache if _ == lower_path or _.startswith(f"{lower_path}/")]:
+            del self._parent_cache[path]
+
+    @property
+    def is_compact(self):
+        return self._store is not None
+
+    def build_compact(self, entries):
+        """Replace the contents of the model with a `CompactTreeStore` built from `entries`, see
+        `PathArchiveTreeModelLoader.entries_for_item`"""
+        self.set_compact_store(CompactTreeStore.build(entries))
+
+    def set_compact_store(self, store: CompactTreeStore):
+        """Replace the contents of the model with `store`, resetting any views. Must be called from the GUI thread,
+        loaders build the store on their own thread and hand it over when they finish."""
+        self.beginResetModel()
+        try:
+            self._compact_items = {}
+            self._store = store
+            self.root_item = self._compact_item(ROOT_NODE)
+            self._parent_cache = CompactFolderCache(self)
+        finally:
+            self.endResetModel()
+        logger.debug(f"Built {store} for {self.__class__.__name__}")
+
+    def _compact_item(self, node):
+        """Returns the (cached) flyweight item for `node` in the model's `CompactTreeStore`"""
+        if (item := self._compact_items.get(node)) is None:
+            cls = compact_item_class(self._item_cls)
+            item = cls.__new__(cls)
+            item._node = node
+            item.__init__("", model=self, **self._store.payload(node))
+            self._compact_items[node] = item
+        return item
+
+    @property
+    def is_lazy(self):
+        return self._lazy is not None
+
+    def build_lazy(self, entries):
+        """Replace the contents of the model with a `LazyTreeSource` built from `entries`, see
+        `PathArchiveTreeModelLoader.entries_for_item`. Items are only created once Qt calls `fetchMore` for their
+        parent (or they are looked up with `itemForPath`)."""
+        self.set_lazy_source(LazyTreeSource(entries))
+
+    def set_lazy_source(self, source: LazyTreeSource):
+        """Replace the contents of the model with the lazily created items of `source`, resetting any views. Must be
+        called from the GUI thread, see `set_compact_store`."""
+        self.beginResetModel()
+        try:
+            self._lazy = source
+            self._setup_root()
+            self._parent_cache = {".": self.root_item, "": self.root_item}
+            self._lazy_pending = {self.root_item: ("", 0, len(source))}
+        finally:
+            self.endResetModel()
+        logger.debug(f"Built {source} for {self.__class__.__name__}")
+
+    def has_pending_children(self, item):
+        return item in self._lazy_pending
+
+    def fetch_children(self, item):
+        """Create the children of `item` from the model's `LazyTreeSource`"""
+        if (pending := self._lazy_pending.pop(item, None)) is None:
+            return
+        lower_folder_path, lo, hi = pending
+        children = list(self._lazy.children(lower_folder_path, lo, hi))
+        if not children:
+            return
+
+        parent_index = qtc.QModelIndex() if item == self.root_item else self.createIndex(item.row(), 0, item)
+        first = item.childCount()
+        self.beginInsertRows(parent_index, first, first + len(children) - 1)
+        for is_folder, path, data in children:
+            if is_folder:
+                lower_path = path.lower()
+                folder = self._item_cls(path, model=self, parent=item)
+                self._parent_cache[lower_path] = folder
+                self._lazy_pending[folder] = (lower_path, *data)
+            else:
+                _, path, kwargs = data
+                self._item_cls(path, model=self, parent=item, **kwargs)
+        self.endInsertRows()
+
+    def _fetch_path(self, path):
+        """Make sure the folders leading to (and including) the folder for `path` have been fetched"""
+        item = self.root_item
+        self.fetch_children(item)
+        folder_path = resolve_folder_path(path)
+        parts = folder_path.split("/") if folder_path else []
+        for i in range(len(parts)):
+            if "." in parts[i]:
+                continue  # not a folder, see `parentForPath`
+            if (item := self._parent_cache.get("/".join(parts[: i + 1]).lower())) is None:
+                return
+            self.fetch_children(item)
+
+    def canFetchMore(self, parent: qtc.QModelIndex) -> bool:
+        item = parent.internalPointer() if parent.isValid() else self.root_item
+        return self.has_pending_children(item)
+
+    def fetchMore(self, parent: qtc.QModelIndex):
+        self.fetch_children(parent.internalPointer() if parent.isValid() else self.root_item)
+
+    def hasChildren(self, parent: qtc.QModelIndex = qtc.QModelIndex()) -> bool:
+        if parent.column() > 0:
+            return False
+        item = parent.internalPointer() if parent.isValid() else self.root_item
+        return item is not None and item.has_children()
+
     def index(self, row, column, parent=None):
         if not self.hasIndex(row, column, parent):
             return qtc.QModelIndex()
@@ -324,12 +635,20 @@ class PathArchiveTreeModel(qtc.QAbstractItemModel):
     def parentForPath(self, path):
         if not path:
             return self.root_item
+        if self._store is not None:
+            node = self._store.folder_node(path)
+            return self._compact_item(node) if node != NO_NODE else None
+        if self._lazy is not None:
+            self._fetch_path(path)
         parent_path, name = path.rsplit("/", maxsplit=1) if "/" in path else ("", path)
         if "." in name:
             return self.parentForPath(parent_path)
         lower_path = path.lower()
         if lower_path not in self._parent_cache:
-            parent = self.parentForPath(parent_path)
+            if self._streaming_elsewhere():
+                return None  # the folder may still be on its way to the GUI thread, don't create a duplicate
+            if (parent := self.parentForPath(parent_path)) is None:
+                return None
             self._parent_cache[lower_path] = self._item_cls(
                 path, model=self, parent=parent
             )
@@ -337,12 +656,14 @@ class PathArchiveTreeModel(qtc.QAbstractItemModel):
 
     def indexForPath(self, path):
         if (item := self.itemForPath(path)) is not None:
-            return self.createIndex(item.parent.children.index(item), 0, item)
+            return self.createIndex(item.row(), 0, item)
         return qtc.QModelIndex()
 
     def itemForPath(self, path):
         if isinstance(path, Path):
             path = path.as_posix()
+        if self._lazy is not None:
+            self._fetch_path(path)
         if "/" in path:
             parent_path, name = (
                 path.rsplit("/", maxsplit=1) if "/" in path else ("", path)
@@ -356,7 +677,14 @@ class PathArchiveTreeModel(qtc.QAbstractItemModel):
             parent.appendChildren(rows)
 
 
+def path_filter_columns(path) -> dict:
+    """The `SearchIndex` columns every entry has, derived from its path"""
+    return {"suffix": os.path.splitext(path.rsplit("/", maxsplit=1)[-1])[1].lower()}
+
+
 class PathArchiveTreeModelLoader(qtc.QRunnable):
+    stream_batch_size = 10000
+
     def __init__(
         self,
         model,
@@ -375,6 +703,8 @@ class PathArchiveTreeModelLoader(qtc.QRunnable):
         self._item_cls = item_cls or PathArchiveTreeItem
         self._should_cancel = False
         self._load_limit = load_limit  # This is for dev/debugging purposes
+        self._tree_builder = None
+        self.streaming = False  # items are staged and inserted by the GUI thread in batches, see `_emit_staged`
         self.task_name = task_name or self.__class__.__name__
         self.task_status_message = task_status_msg
         self.signals.cancel.connect(
@@ -388,10 +718,53 @@ class PathArchiveTreeModelLoader(qtc.QRunnable):
     def items_to_load(self):
         return []
 
+    def entries_for_item(self, item):
+        """Yields a `(parent_path, path, kwargs)` tuple for every tree item that should be created for `item`. The
+        item is created with `self._item_cls(path, model=model, parent=model.parentForPath(parent_path), **kwargs)`
+        """
+        yield item, item, {}
+
+    def load_entry(self, parent_path, path, kwargs):
+        if self._tree_builder is not None:
+            parent = self._tree_builder.parent_for(parent_path)
+        else:
+            parent = self.model.parentForPath(parent_path)
+        return self._item_cls(path, model=self.model, parent=parent, **kwargs)
+
     def load_item(self, item):
-        self._item_cls(item, model=self.model, parent=self.model.parentForPath(item))
+        for parent_path, path, kwargs in self.entries_for_item(item):
+            self.load_entry(parent_path, path, kwargs)
+
+    def search_terms(self, parent_path, path, kwargs):
+        """The text (and any exact match terms) the `SearchIndex` should index for an entry"""
+        return path, ()
+
+    def folder_search_text(self, folder_path):
+        return folder_path
+
+    def filter_columns(self, parent_path, path, kwargs):
+        """Column values of an entry used to evaluate `FilterSpec`s, see `starfab.models.filters`"""
+        return path_filter_columns(path)
+
+    def _emit_staged(self):
+        staged = self.model.take_staged()
+        folders = self._tree_builder.take_new_folders()
+        if staged or folders:
+            self.signals.batch.emit((self, staged, folders))
 
     def run(self):
+        try:
+            self._load()
+        except Exception as e:
+            # models listen for `finished` with an `error` to report the failure, see `ThreadLoadedPathArchiveTreeModel`
+            logger.exception(f"Failed to load {self.task_name}", exc_info=e)
+            if self.streaming:
+                self.model.take_staged(finish=True)
+            if self.task_status_message:
+                self.starfab.task_finished.emit(self.task_name, False, str(e))
+            self.signals.finished.emit({"error": str(e)})
+
+    def _load(self):
         logger.debug(f"Starting to load {self.task_name}")
         start_time = time.time()
 
@@ -407,9 +780,23 @@ class PathArchiveTreeModelLoader(qtc.QRunnable):
                 self.task_name, 0, 0, len(items), ""
             )
 
+        compact = getattr(self.model, "compact_storage", False)
+        lazy = not compact and getattr(self.model, "lazy_loading", False)
+        stream = self.streaming = not (compact or lazy) and getattr(self.model, "stream_loading", False)
+        entries = []
+        if stream:
+            # folders are published to the model's `_parent_cache` as they're inserted on the GUI thread
+            self._tree_builder = PathTreeBuilder(self.model, cache={})
+            self.model.begin_staging()
+        elif not (compact or lazy):
+            self._tree_builder = PathTreeBuilder(self.model)
+        search_index = SearchIndex() if getattr(self.model, "use_search_index", False) else None
+
         t = time.time()
         for i, f in enumerate(items):
             if self._should_cancel:
+                if stream:
+                    self.model.take_staged(finish=True)
                 return  # immediately break
 
             if (time.time() - t) > 0.5:
@@ -422,14 +809,47 @@ class PathArchiveTreeModelLoader(qtc.QRunnable):
             if 0 <= self._load_limit < i:
                 break
 
-            self.load_item(f)
+            if compact or lazy:
+                item_entries = list(self.entries_for_item(f))
+                entries.extend(item_entries)
+            elif search_index is not None:
+                item_entries = list(self.entries_for_item(f))
+                for entry in item_entries:
+                    self.load_entry(*entry)
+            else:
+                self.load_item(f)
+                item_entries = ()
+
+            if search_index is not None:
+                for parent_path, path, kwargs in item_entries:
+                    search_index.add(
+                        parent_path,
+                        path,
+                        *self.search_terms(parent_path, path, kwargs),
+                        columns=self.filter_columns(parent_path, path, kwargs),
+                    )
+
+            if stream and len(self.model._staged or ()) >= self.stream_batch_size:
+                self._emit_staged()
+
+        if stream:
+            # staging ends once the last batch is inserted, see `ThreadLoadedPathArchiveTreeModel._loaded`
+            self._emit_staged()
+        # built here, but only swapped into the model on the GUI thread, see `ThreadLoadedPathArchiveTreeModel`
+        result = {}
+        if compact:
+            result["compact_store"] = CompactTreeStore.build(entries)
+        elif lazy:
+            result["lazy_source"] = LazyTreeSource(entries)
+        if search_index is not None:
+            result["search_index"] = search_index.finalize(self.folder_search_text)
 
         logger.debug(
             f"Loaded {self.task_name} in {timedelta(seconds=time.time() - start_time)}"
         )
         if self.task_status_message:
             self.starfab.task_finished.emit(self.task_name, True, "")
-        self.signals.finished.emit({})
+        self.signals.finished.emit(result)
 
 
 class ContentItem:
@@ -449,6 +869,24 @@ class ContentItem:
     def contents(self):
         return self._contents
 
+    @contextmanager
+    def open(self) -> typing.Iterator[typing.BinaryIO]:
+        """Open a readable stream of the item's contents.
+
+        Unlike `contents()` this doesn't have to hold the whole item in memory, sub-classes stream it from where it's
+        stored. Consumers that read incrementally (exporters, converters) should prefer it.
+        """
+        f = self.contents()
+        f.seek(0)
+        yield f
+
+    def content_view(self) -> memoryview:
+        """A read-only `memoryview` of the item's contents, without copying them when they're already in memory.
+
+        Use it in a `with` block (or `release()` it), the underlying buffer can't be resized while it's exported.
+        """
+        return self.contents().getbuffer().toreadonly()
+
 
 class CheckableModelWrapper(PathArchiveTreeModel):
     def __init__(self, model: PathArchiveTreeModel, checkbox_column=0, parent=None):
@@ -459,6 +897,9 @@ class CheckableModelWrapper(PathArchiveTreeModel):
         self._item_cls = model._item_cls
         self._checked = {}
         self._model = model
+        self._forwarding_inserts = []
+        model.rowsAboutToBeInserted.connect(self._handle_rows_about_to_be_inserted)
+        model.rowsInserted.connect(self._handle_rows_inserted)
 
     def _sync_checked(self, item, value, index):
         self._checked[item] = value
@@ -486,13 +927,55 @@ class CheckableModelWrapper(PathArchiveTreeModel):
     def _parent_cache(self):
         return self._model._parent_cache
 
+    @property
+    def _store(self):
+        return self._model._store
+
+    @property
+    def _lazy(self):
+        return self._model._lazy
+
+    @property
+    def search_index(self):
+        return self._model.search_index
+
+    @property
+    def p4k_index(self):
+        return getattr(self._model, "p4k_index", None)
+
+    def _compact_item(self, node):
+        return self._model._compact_item(node)
+
+    def has_pending_children(self, item):
+        return self._model.has_pending_children(item)
+
+    def fetch_children(self, item):
+        self._model.fetch_children(item)
+
+    def _handle_rows_about_to_be_inserted(self, parent, first, last):
+        # rows are inserted into the wrapped model (e.g. by `fetchMore`), re-emit them for our own views if the parent
+        # is part of our tree
+        item = parent.internalPointer() if parent.isValid() else self._model.root_item
+        ancestor = item
+        while ancestor is not None and ancestor != self.root_item:
+            ancestor = ancestor.parent
+        forward = ancestor is not None
+        self._forwarding_inserts.append(forward)
+        if forward:
+            index = qtc.QModelIndex() if item == self.root_item else self.createIndex(item.row(), 0, item)
+            self.beginInsertRows(index, first, last)
+
+    def _handle_rows_inserted(self, parent, first, last):
+        if self._forwarding_inserts and self._forwarding_inserts.pop():
+            self.endInsertRows()
+
     def flags(self, index):
         if not index.isValid():
             return qtc.Qt.NoItemFlags
         return super().flags(index) | qtc.Qt.ItemIsUserCheckable
 
     def _update_parent(self, item):
-        if item == self.root_item:
+        if item == self.root_item or item is None:
             return
 
         state = qtc.Qt.Unchecked
@@ -505,7 +988,7 @@ class CheckableModelWrapper(PathArchiveTreeModel):
         if all:
             state = qtc.Qt.Checked
         self._checked[item] = state
-        index = self.createIndex(item.parent.children.index(item), 0, item)
+        index = self.createIndex(item.row(), 0, item)
         self.dataChanged.emit(index, index, [qtc.Qt.EditRole])
         self._update_parent(item.parent)
 
@@ -526,7 +1009,9 @@ class CheckableModelWrapper(PathArchiveTreeModel):
 
 
 class ThreadLoadedPathArchiveTreeModel(PathArchiveTreeModel):
+    populating = qtc.Signal()
     loaded = qtc.Signal()
+    load_failed = qtc.Signal(str)
     unloading = qtc.Signal()
     cancel_loading = qtc.Signal()
 
@@ -544,6 +1029,11 @@ class ThreadLoadedPathArchiveTreeModel(PathArchiveTreeModel):
             archive=archive, columns=columns, item_cls=item_cls, parent=parent
         )
         self.is_loaded = False
+        self.compact_storage = False
+        self.lazy_loading = False
+        self.stream_loading = False
+        self.use_search_index = False
+        self._populating = False
         self._loader = None
         self._loader_cls = loader_cls
         self.loader_task_name = loader_task_name
@@ -557,11 +1047,44 @@ class ThreadLoadedPathArchiveTreeModel(PathArchiveTreeModel):
         self.is_loaded = False
 
     def _loaded(self):
+        # every batch of a streamed load has been inserted, the tree can be looked up and modified again
+        self.take_staged(finish=True)
         self.is_loaded = True
         del self._loader
         self._loader = None
         self.loaded.emit()
 
+    @qtc.Slot(dict)
+    def _handle_loader_finished(self, result):
+        if self.sender() is not getattr(self._loader, "signals", None):
+            return  # left over from a cancelled load
+        if (error := result.get("error")) is not None:
+            self.take_staged(finish=True)
+            self._loader = None
+            self.load_failed.emit(error)
+        else:
+            self._install_loaded(result)
+            self._loaded()
+
+    def _install_loaded(self, result):
+        """Swap what the loader built on its thread into the model"""
+        if (store := result.get("compact_store")) is not None:
+            self.set_compact_store(store)
+        elif (source := result.get("lazy_source")) is not None:
+            self.set_lazy_source(source)
+        if (search_index := result.get("search_index")) is not None:
+            self.search_index = search_index
+
+    @qtc.Slot(object)
+    def _handle_batch(self, batch):
+        loader, staged, folders = batch
+        if loader is not self._loader:
+            return  # left over from a cancelled load
+        if not self._populating:
+            self._populating = True
+            self.populating.emit()
+        self.insertChildren(staged, folders)
+
     def load(self, archive, task_name="", task_status_msg=""):
         if self.is_loaded:
             self.unload()
@@ -572,11 +1095,17 @@ class ThreadLoadedPathArchiveTreeModel(PathArchiveTreeModel):
         logger.debug(f"Loading {self.__class__.__name__} model")
 
         self.archive = archive
+        self.compact_storage = settings.snapshot.value("compact_tree_storage")
+        self.lazy_loading = settings.snapshot.value("lazy_tree_loading")
+        self.stream_loading = settings.snapshot.value("stream_tree_loading")
+        self.use_search_index = settings.snapshot.value("tree_search_index")
+        self._populating = False
         self._loader = self._loader_cls(
             self,
             item_cls=self._item_cls,
             task_name=task_name,
             task_status_msg=task_status_msg,
         )
-        self._loader.signals.finished.connect(self._loaded)
+        self._loader.signals.batch.connect(self._handle_batch)
+        self._loader.signals.finished.connect(self._handle_loader_finished)
         qtc.QThreadPool.globalInstance().start(self._loader)
@@ -0,0 +1,345 @@
+import typing
+from array import array
+
+from starfab.log import getLogger
+
+logger = getLogger(__name__)
+
+ROOT_NODE = 0
+NO_NODE = -1
+
+
+class CompactTreeStore:
+    """Array backed storage for a `PathArchiveTreeModel` hierarchy.
+
+    Every node is an integer id into a set of parallel arrays (`parents`, `name_ids`, `first_child`,
+    `child_counts`). Children of a node are stored contiguously and sorted by name, names are interned into a single
+    table and paths are rebuilt on demand by walking up the parents. Only the rare nodes whose `_path` cannot be rebuilt
+    that way (e.g. files below a folder whose name contains a `.`) store their path explicitly.
+    """
+
+    def __init__(self):
+        self.names: typing.List[str] = []
+        self.parents = array("i")
+        self.name_ids = array("i")
+        self.first_child = array("i")
+        self.child_counts = array("i")
+        self.payload_key = ""
+        self.payloads: typing.Sequence = []
+        self.path_overrides: typing.Dict[int, str] = {}
+        self.folders: typing.Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.parents)
+
+    def __repr__(self):
+        return f"<CompactTreeStore nodes:{len(self)} names:{len(self.names)}>"
+
+    def name(self, node) -> str:
+        return self.names[self.name_ids[node]]
+
+    def path(self, node) -> str:
+        if (path := self.path_overrides.get(node)) is not None:
+            return path
+        parts = []
+        while node > ROOT_NODE:
+            if (path := self.path_overrides.get(node)) is not None:
+                parts.append(path)
+                break
+            parts.append(self.names[self.name_ids[node]])
+            node = self.parents[node]
+        return "/".join(reversed(parts))
+
+    def payload(self, node) -> dict:
+        """The keyword arguments the item class should be created with for `node`"""
+        if not self.payload_key:
+            return {}
+        value = self.payloads[node]
+        if value is None or (isinstance(self.payloads, array) and value < 0):
+            return {}
+        return {self.payload_key: value}
+
+    def folder_node(self, path) -> int:
+        """Lookup the folder node `PathArchiveTreeModel.parentForPath` would return for `path`"""
+        while path:
+            parent_path, name = path.rsplit("/", maxsplit=1) if "/" in path else ("", path)
+            if "." not in name:
+                return self.folders.get(path.lower(), NO_NODE)
+            path = parent_path
+        return ROOT_NODE
+
+    def child_node(self, node, row) -> int:
+        if 0 <= row < self.child_counts[node]:
+            return self.first_child[node] + row
+        return NO_NODE
+
+    def child_node_by_name(self, node, name) -> int:
+        # children are sorted by name, duplicates resolve to the last one like `children_by_name` does
+        lo = self.first_child[node]
+        hi = lo + self.child_counts[node]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if name < self.names[self.name_ids[mid]]:
+                hi = mid
+            else:
+                lo = mid + 1
+        if lo > self.first_child[node] and self.names[self.name_ids[lo - 1]] == name:
+            return lo - 1
+        return NO_NODE
+
+    def row(self, node) -> int:
+        if node <= ROOT_NODE:
+            return 0
+        return node - self.first_child[self.parents[node]]
+
+    @classmethod
+    def build(cls, entries: typing.Iterable[typing.Tuple[str, str, dict]]) -> "CompactTreeStore":
+        """Build a store from `(parent_path, path, kwargs)` entries, as produced by
+        `PathArchiveTreeModelLoader.entries_for_item`. Folders are resolved exactly like
+        `PathArchiveTreeModel.parentForPath` so the resulting hierarchy matches the object tree.
+
+        To keep the store compact, `kwargs` may hold at most one key, and it must be the same key for every entry
+        (e.g. `record` for the DataCore or `index_id` for the P4K).
+        """
+        store = cls()
+        name_table = {}
+        parents = array("i", [NO_NODE])
+        name_ids = array("i", [0])
+        store.names.append("root")
+        name_table["root"] = 0
+        folder_paths = {ROOT_NODE: ""}
+        folders = {"": ROOT_NODE, ".": ROOT_NODE}
+        overrides = {}
+        payloads = {}
+        payload_key = ""
+
+        def _add_node(parent, path, name):
+            if (name_id := name_table.get(name)) is None:
+                name_id = name_table[name] = len(store.names)
+                store.names.append(name)
+            node = len(parents)
+            parents.append(parent)
+            name_ids.append(name_id)
+            parent_path = folder_paths.get(parent)
+            if parent_path is None or path != (f"{parent_path}/{name}" if parent_path else name):
+                overrides[node] = path
+            return node
+
+        def _folder_for(path):
+            # iterative version of `PathArchiveTreeModel.parentForPath`
+            pending = []
+            while path:
+                parent_path, name = path.rsplit("/", maxsplit=1) if "/" in path else ("", path)
+                if "." not in name:
+                    lower_path = path.lower()
+                    if lower_path in folders:
+                        break
+                    pending.append((lower_path, path, name))
+                path = parent_path
+            node = folders[path.lower()] if path else ROOT_NODE
+            for lower_path, folder_path, name in reversed(pending):
+                node = _add_node(node, folder_path, name)
+                folders[lower_path] = node
+                folder_paths[node] = folder_path
+            return node
+
+        for parent_path, path, kwargs in entries:
+            node = _add_node(_folder_for(parent_path), path, path.rsplit("/", maxsplit=1)[-1])
+            if kwargs:
+                if len(kwargs) > 1 or (payload_key and payload_key not in kwargs):
+                    raise ValueError(f"Compact trees support a single, consistent payload key: {kwargs}")
+                payload_key, payloads[node] = next(iter(kwargs.items()))
+
+        # Lay the nodes out so each node's children are contiguous and sorted by name
+        names = store.names
+        order = sorted(range(1, len(parents)), key=lambda n: (parents[n], names[name_ids[n]]))
+        new_ids = array("i", [0]) * len(parents)
+        for new_id, node in enumerate(order, start=1):
+            new_ids[node] = new_id
+
+        count = len(parents)
+        store.parents = array("i", [NO_NODE]) * count
+        store.name_ids = array("i", [0]) * count
+        store.first_child = array("i", [0]) * count
+        store.child_counts = array("i", [0]) * count
+        store.name_ids[ROOT_NODE] = name_ids[ROOT_NODE]
+        for node in order:
+            new_id = new_ids[node]
+            new_parent = new_ids[parents[node]]
+            store.parents[new_id] = new_parent
+            store.name_ids[new_id] = name_ids[node]
+            if store.child_counts[new_parent] == 0:
+                store.first_child[new_parent] = new_id
+            store.child_counts[new_parent] += 1
+
+        store.payload_key = payload_key
+        if payloads and all(isinstance(_, int) for _ in payloads.values()):
+            store.payloads = array("q", [-1]) * count
+        else:
+            store.payloads = [None] * count
+        for node, value in payloads.items():
+            store.payloads[new_ids[node]] = value
+        store.path_overrides = {new_ids[n]: p for n, p in overrides.items()}
+        store.folders = {p: new_ids[n] for p, n in folders.items()}
+        return store
+
+
+_compact_item_classes = {}
+
+
+def compact_item_class(item_cls):
+    """Returns the flyweight version of `item_cls` used by models backed by a `CompactTreeStore`"""
+    if item_cls not in _compact_item_classes:
+        _compact_item_classes[item_cls] = type(
+            f"Compact{item_cls.__name__}", (CompactTreeItemMixin, item_cls), {}
+        )
+    return _compact_item_classes[item_cls]
+
+
+class CompactChildren(typing.Sequence):
+    """Read-only, list like view over the children of a node in a `CompactTreeStore`"""
+
+    def __init__(self, model, node):
+        self._model = model
+        self._node = node
+
+    def __len__(self):
+        return self._model._store.child_counts[self._node]
+
+    def __bool__(self):
+        return self._model._store.child_counts[self._node] > 0
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[_] for _ in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if (node := self._model._store.child_node(self._node, row)) == NO_NODE:
+            raise IndexError(row)
+        return self._model._compact_item(node)
+
+    def __iter__(self):
+        store = self._model._store
+        first = store.first_child[self._node]
+        for node in range(first, first + store.child_counts[self._node]):
+            yield self._model._compact_item(node)
+
+    def index(self, item, *args):
+        if getattr(item, "_node", NO_NODE) != NO_NODE and item.model is self._model:
+            if self._model._store.parents[item._node] == self._node:
+                return self._model._store.row(item._node)
+        raise ValueError(f"{item} is not in list")
+
+
+class CompactChildrenByName(typing.Mapping):
+    """Read-only, dict like view mapping child names to child items of a node in a `CompactTreeStore`"""
+
+    def __init__(self, model, node):
+        self._model = model
+        self._node = node
+
+    def __getitem__(self, name):
+        if (node := self._model._store.child_node_by_name(self._node, name)) == NO_NODE:
+            raise KeyError(name)
+        return self._model._compact_item(node)
+
+    def __contains__(self, name):
+        return self._model._store.child_node_by_name(self._node, name) != NO_NODE
+
+    def __len__(self):
+        return self._model._store.child_counts[self._node]
+
+    def __iter__(self):
+        return (_.name for _ in CompactChildren(self._model, self._node))
+
+
+class CompactFolderCache(typing.Mapping):
+    """Stands in for `PathArchiveTreeModel._parent_cache` when the model is backed by a `CompactTreeStore`"""
+
+    def __init__(self, model):
+        self._model = model
+
+    def __getitem__(self, lower_path):
+        return self._model._compact_item(self._model._store.folders[lower_path])
+
+    def __contains__(self, lower_path):
+        return lower_path in self._model._store.folders
+
+    def __len__(self):
+        return len(self._model._store.folders)
+
+    def __iter__(self):
+        return iter(self._model._store.folders)
+
+
+class CompactTreeItemMixin:
+    """Mixed in ahead of a model's item class to turn it into a flyweight over a node in the model's
+    `CompactTreeStore`. The tree linkage (`parent`, `children`, `name`, `_path`) is read from the store, everything
+    else (cached properties, `data()`, `contents()`, etc.) is provided by the item class as usual. Flyweights are created
+    on demand by `PathArchiveTreeModel._compact_item`, so memory grows with the parts of the tree that are visited."""
+
+    _node = NO_NODE
+
+    @property
+    def _path(self):
+        return self.model._store.path(self._node)
+
+    @_path.setter
+    def _path(self, value):
+        pass  # linkage is owned by the store
+
+    @property
+    def name(self):
+        if self._node == ROOT_NODE:
+            return "root"
+        return self.model._store.name(self._node)
+
+    @name.setter
+    def name(self, value):
+        pass
+
+    @property
+    def parent(self):
+        if (parent := self.model._store.parents[self._node]) == NO_NODE:
+            return None
+        return self.model._compact_item(parent)
+
+    @parent.setter
+    def parent(self, value):
+        pass
+
+    @property
+    def children(self):
+        return CompactChildren(self.model, self._node)
+
+    @children.setter
+    def children(self, value):
+        pass
+
+    @property
+    def children_by_name(self):
+        return CompactChildrenByName(self.model, self._node)
+
+    @children_by_name.setter
+    def children_by_name(self, value):
+        pass
+
+    def has_children(self):
+        return self.model._store.child_counts[self._node] > 0
+
+    def appendChild(self, child):
+        raise TypeError("Cannot append to a compact tree, rebuild the model instead")
+
+    def removeChild(self, child):
+        raise TypeError("Cannot remove from a compact tree, rebuild the model instead")
+
+    def child(self, row):
+        if (node := self.model._store.child_node(self._node, row)) == NO_NODE:
+            return None
+        return self.model._compact_item(node)
+
+    def row(self):
+        return self.model._store.row(self._node)
+
+    def childCount(self):
+        return self.model._store.child_counts[self._node]
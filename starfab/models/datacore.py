@@ -1,5 +1,8 @@
 import io
+import json
+import typing
 from functools import cached_property
+from pathlib import Path
 
 from starfab import get_starfab
 from starfab.gui import qtc
@@ -13,13 +16,96 @@ from starfab.models.common import (
     ContentItem,
     SKIP_MODELS,
 )
+from starfab.models.datacore_index import DataCoreTextIndexBuilder
+from starfab.models.filters import evaluate_filters, is_compiled, rows_from_bitset
+from starfab.models.lazy import resolve_folder_path
+from starfab.models.lru import BytesLRUCache
+from starfab.models.search import SearchResult
+from starfab.settings import settings
 
 logger = getLogger(__name__)
 DCBVIEW_COLUMNS = ["Name", "Type"]
 RECORDS_ROOT_PATH = "libs/foundry/records/"
 
 
+def render_record(datacore, record, fmt, depth=None) -> str:
+    """Serialize `record` as `xml` or `json` (with `dump_record_xml`/`dump_record_json`), or as `dict`, the JSON of
+    `record_to_dict` used when copying records"""
+    kwargs = {"depth": depth} if depth is not None else {}
+    if fmt == "xml":
+        return datacore.dump_record_xml(record, **kwargs)
+    elif fmt == "json":
+        return datacore.dump_record_json(record, **kwargs)
+    elif fmt == "dict":
+        return json.dumps(datacore.record_to_dict(record, **kwargs), indent=2, default=str, sort_keys=True)
+    raise ValueError(f"Unknown record format {fmt}")
+
+
+class RecordRenderCache(BytesLRUCache):
+    """Serialized DataCore records (utf-8 encoded), keyed by `(guid, format, depth)`. Shared by everything that
+    renders records (opening, viewing and copying them and extracting them), see `DCBModel.record_cache`."""
+
+    def render(self, datacore, record, fmt, depth=None, store=True) -> bytes:
+        """The serialized `record`, from the cache or rendered with `render_record`. Bulk renders (extraction) pass
+        `store=False` so they don't evict everything else from the cache, nor count in its hit rate."""
+        key = (record.id.value, fmt, depth)
+        if (data := self.get(key) if store else self.peek(key)) is None:
+            data = render_record(datacore, record, fmt, depth).encode("utf-8")
+            if store:
+                self.put(key, data)
+        return data
+
+
 class DCBSortFilterProxyModel(PathArchiveTreeSortFilterProxyModel):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # match the filter text against the contents of the records (with the model's `text_index`) instead of paths
+        self.search_records = False
+        self._record_guids = None
+
+    def setSearchRecords(self, enabled):
+        self.search_records = enabled
+        self._update_search()
+        self.invalidateFilter()
+
+    def setSourceModel(self, model):
+        if (current := self.sourceModel()) is not None and hasattr(current, "text_index_ready"):
+            current.text_index_ready.disconnect(self._handle_text_index_ready)
+        super().setSourceModel(model)
+        if model is not None and hasattr(model, "text_index_ready"):
+            model.text_index_ready.connect(self._handle_text_index_ready)
+
+    @qtc.Slot()
+    def _handle_text_index_ready(self):
+        if self.search_records and self._filter:
+            self._update_search()
+            self.invalidateFilter()
+
+    def _update_search(self):
+        model = self.sourceModel()
+        self._record_guids = None
+        if not (self.search_records and self._filter and (text_index := getattr(model, "text_index", None))):
+            return super()._update_search()
+
+        guids = text_index.guids_matching(self._filter)
+        index = getattr(model, "search_index", None)
+        if index is not None and is_compiled(self.additional_filters):
+            accepted = (
+                set(rows_from_bitset(evaluate_filters(self.additional_filters, index)))
+                if self.additional_filters else None
+            )
+            rows = [
+                row for row, record in enumerate(index.column("record"))
+                if record is not None and record.id.value in guids and (accepted is None or row in accepted)
+            ]
+            self._search_result = SearchResult.from_parent_paths(
+                self._filter, [index.paths[_] for _ in rows], [index.parent_paths[_] for _ in rows]
+            )
+        else:
+            self._search_result = None
+            self._record_guids = guids
+        self.setRecursiveFilteringEnabled(self._search_result is None)
+
     def filterAcceptsRow(self, source_row, source_parent: qtc.QModelIndex) -> bool:
         if not self._filter and not self.additional_filters:
             return True
@@ -31,6 +117,10 @@ class DCBSortFilterProxyModel(PathArchiveTreeSortFilterProxyModel):
                 item = parent.children[source_row]
             except IndexError:
                 return False
+            if self._search_result is not None:
+                return self._search_result.accepts(item)
+            if self._record_guids is not None:
+                return item.record is not None and item.guid in self._record_guids and self.checkAdditionFilters(item)
             if not self.checkAdditionFilters(item):
                 return False
             if not self._filter and item.record is not None:
@@ -50,25 +140,52 @@ class DCBLoader(PathArchiveTreeModelLoader):
     def items_to_load(self):
         # trigger datacore to load here
         self.model.archive = self.model.archive.datacore
+        self._sibling_names = {}
         if 'datacore' in SKIP_MODELS:
             logger.debug(f'Skipping loading the datacore model')
             return []
         return self.model.archive.records
 
-    def load_item(self, item):
+    def _register_folder(self, path):
+        path = resolve_folder_path(path)
+        key = path.lower()
+        if key not in self._sibling_names:
+            self._sibling_names[key] = set()
+            if path:
+                parent_path, name = path.rsplit("/", maxsplit=1) if "/" in path else ("", path)
+                self._sibling_names[self._register_folder(parent_path)].add(name)
+        return key
+
+    def _unique_name(self, parent_path, name, guid):
+        """Returns `name`, or `name.guid` if the folder for `parent_path` already has a child called `name`. Tracked
+        by the loader so it works without the item tree, e.g. when building a compact store."""
+        siblings = self._sibling_names[self._register_folder(parent_path)]
+        if name in siblings:
+            name = f"{name}.{guid}"
+        siblings.add(name)
+        return name
+
+    def entries_for_item(self, item):
         path = item.filename.replace(RECORDS_ROOT_PATH, "")
         parent_path, _ = path.rsplit("/", maxsplit=1) if "/" in path else ("", path)
-        parent = self.model.parentForPath(parent_path)
 
         # name = name.replace(".xml", "")
-        name = item.name
-        if name in parent.children_by_name:
-            name = f"{name}.{item.id.value}"
+        name = self._unique_name(parent_path, item.name, item.id.value)
+        yield parent_path, f"{parent_path}/{name}", {"record": item}
 
-        new_item = self._item_cls(
-            f"{parent_path}/{name}", model=self.model, record=item, parent=parent
-        )
-        self.model._guid_cache[new_item.guid] = new_item
+    def search_terms(self, parent_path, path, kwargs):
+        # matches `DCBSortFilterProxyModel`, records are found by path or guid
+        return f"{path}\x00{kwargs['record'].id.value}", ()
+
+    def filter_columns(self, parent_path, path, kwargs):
+        record = kwargs["record"]
+        return {"type": record.type, "record": record}
+
+    def load_entry(self, parent_path, path, kwargs):
+        new_item = super().load_entry(parent_path, path, kwargs)
+        if not self.streaming:
+            self.model._guid_cache[new_item.guid] = new_item  # streamed items are registered as they're inserted
+        return new_item
 
 
 class DCBItem(PathArchiveTreeItem, ContentItem):
@@ -101,18 +218,14 @@ class DCBItem(PathArchiveTreeItem, ContentItem):
             mode = (
                 mode
                 if mode is not None
-                else get_starfab().settings.value("cryxmlbConversionFormat", "xml")
+                else get_starfab().settings.snapshot.value("cryxmlbConversionFormat", "xml")
             )
-            if mode == "xml":
-                return io.BytesIO(
-                    self.model.archive.dump_record_xml(
-                        self.model.archive.records_by_guid[self.guid]
-                    ).encode("utf-8")
-                )
             return io.BytesIO(
-                self.model.archive.dump_record_json(
-                    self.model.archive.records_by_guid[self.guid]
-                ).encode("utf-8")
+                self.model.record_cache.render(
+                    self.model.archive,
+                    self.model.archive.records_by_guid[self.guid],
+                    "xml" if mode == "xml" else "json",
+                )
             )
         return io.BytesIO(b"")
 
@@ -133,6 +246,8 @@ class DCBItem(PathArchiveTreeItem, ContentItem):
 
 
 class DCBModel(ThreadLoadedPathArchiveTreeModel):
+    text_index_ready = qtc.Signal()  # `text_index` was loaded or built
+
     def __init__(self, sc_manager, loader_cls=DCBLoader):
         self._sc_manager = sc_manager
         super().__init__(
@@ -145,6 +260,98 @@ class DCBModel(ThreadLoadedPathArchiveTreeModel):
             loader_task_status_msg="Processing DataCore",
         )
         self._guid_cache = {}
+        self.text_index = None  # `DataCoreTextIndex` of the records' contents, see `build_text_index`
+        self._text_index_builder = None
+        self.record_cache = RecordRenderCache(self._record_cache_size())
+
+    def clear(self):
+        if self._text_index_builder is not None:
+            self._text_index_builder.signals.cancel.emit()
+            self._text_index_builder = None
+        self._guid_cache = {}
+        self.text_index = None
+        if self.record_cache.hits or self.record_cache.misses:
+            logger.debug(f"Record cache stats: {self.record_cache.stats()}")
+        self.record_cache.clear()
+        self.record_cache.resize(self._record_cache_size())
+        super().clear()
+
+    @staticmethod
+    def _record_cache_size():
+        return settings.snapshot.value("datacore/record_cache_size") * 1024 * 1024
+
+    def _loaded(self):
+        super()._loaded()
+        if settings.snapshot.value("datacore/text_index"):
+            self.build_text_index()
+
+    def build_text_index(self):
+        """Load the stored text index of the records, or build it, in the background. `text_index_ready` is emitted
+        once it's available."""
+        if self.text_index is not None or self._text_index_builder is not None or self._sc_manager.sc is None:
+            return
+        self._text_index_builder = DataCoreTextIndexBuilder(self._sc_manager.sc)
+        self._text_index_builder.signals.finished.connect(self._handle_text_index_built)
+        qtc.QThreadPool.globalInstance().start(self._text_index_builder, -1)
+
+    @qtc.Slot(dict)
+    def _handle_text_index_built(self, result):
+        if self.sender() is not getattr(self._text_index_builder, "signals", None):
+            return  # left over from a cancelled build
+        self._text_index_builder = None
+        if (index := result.get("index")) is not None:
+            self.text_index = index
+            self.text_index_ready.emit()
+
+    def insertChildren(self, staged, folders=None):
+        super().insertChildren(staged, folders)
+        for _, child in staged:
+            if child.record is not None:
+                self._guid_cache[child.guid] = child
+
+    def set_compact_store(self, store):
+        super().set_compact_store(store)
+        # in compact mode the cache maps guids to node ids, see `itemForGUID`
+        self._guid_cache = {
+            record.id.value: node
+            for node, record in enumerate(self._store.payloads)
+            if record is not None
+        }
+
+    def set_lazy_source(self, source):
+        super().set_lazy_source(source)
+        # in lazy mode the cache maps guids to item paths, see `itemForGUID`
+        self._guid_cache = {
+            kwargs["record"].id.value: path for _, path, kwargs in self._lazy.entries
+        }
 
     def itemForGUID(self, guid):
-        return self._guid_cache.get(guid)
+        item = self._guid_cache.get(guid)
+        if isinstance(item, int):
+            return self._compact_item(item)
+        if isinstance(item, str):
+            return self.itemForPath(item)
+        return item
+
+    def record_items(self):
+        """Yields every item in the model that represents a record"""
+        for guid in self._guid_cache:
+            yield self.itemForGUID(guid)
+
+    def record_paths(self) -> typing.Iterator[typing.Tuple[str, Path]]:
+        """Yields the `(guid, path)` of every record in the model without creating the items of a compact or lazy
+        tree. The records are taken from the model when this is called, so the paths can be listed on another
+        thread (e.g. by a `DCBExtractRunner`)."""
+        records = list(self._guid_cache.items())
+        store = self._store
+
+        def _paths():
+            for guid, item in records:
+                if isinstance(item, int):
+                    yield guid, Path(store.path(item))
+                elif isinstance(item, str):
+                    yield guid, Path(item)
+                else:
+                    yield guid, item.path
+
+        return _paths()
@@ -0,0 +1,335 @@
+import ctypes
+import hashlib
+import json
+import time
+import typing
+from collections import namedtuple
+from pathlib import Path
+
+from scdatatools.forge import DataCoreBinary, dftypes
+from starfab import get_starfab
+from starfab.gui import qtc
+from starfab.log import getLogger
+from starfab.models.common import BackgroundRunnerSignals
+
+logger = getLogger(__name__)
+
+DATACORE_DIFF_VERSION = 1
+_DIGEST_SIZE = 16
+
+# status: added/removed/changed/error
+RecordDiff = namedtuple("RecordDiff", ["guid", "status", "path", "type", "changes"])
+PropertyChange = namedtuple("PropertyChange", ["path", "status", "old", "new"])
+
+
+def load_datacore(filename: typing.Union[str, Path]):
+    """Load a `Game.dcb` (extracted from a Data.p4k) from `filename`"""
+    with Path(filename).open("rb") as f:
+        return DataCoreBinary(bytearray(f.read()))
+
+
+def json_value(obj):
+    """`obj` with everything JSON can't represent converted to strings"""
+    if isinstance(obj, dict):
+        return {str(k): json_value(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [json_value(_) for _ in obj]
+    elif obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    return str(obj)
+
+
+class TreeHasher:
+    """Content digests of the objects of a single DataCore, walking its `dftypes` directly.
+
+    Records, structures and strong pointers have children (their properties), everything else is a value. References
+    to other records are compared by the GUID of the record, weak pointers by the structure they point to, neither is
+    followed. Digests of structures (by `dcb_offset`) and of pointers (by the instance they point to) are kept, so
+    structures shared by several records are hashed once per DataCore. Two objects with the same digest have the same
+    contents, so `diff_trees` never descends into them.
+    """
+
+    def __init__(self):
+        self._digests = {}
+        self._in_progress = set()
+
+    @staticmethod
+    def _key(obj):
+        if isinstance(obj, dftypes.StructureInstance):
+            return "struct", obj.dcb_offset, obj.name
+        if isinstance(obj, dftypes.Record):
+            return "record", obj.id.value
+        if isinstance(obj, dftypes.StrongPointer):
+            return "pointer", obj.structure_index, obj.instance_index
+        return None
+
+    def children(self, obj) -> typing.Union[dict, list, None]:
+        """The properties of `obj` (by name) or its items, `None` if it's a value"""
+        if isinstance(obj, dftypes.Record):
+            if (instance := obj.reference) is None:
+                return {"__path": obj.filename}
+            return {"__path": obj.filename, **self.children(instance)}
+        if isinstance(obj, dftypes.StrongPointer):
+            if (obj := obj.reference) is None:
+                return None
+        if isinstance(obj, dftypes.StructureInstance):
+            return {"__type": obj.name, **obj.properties}
+        if isinstance(obj, dict):
+            return {str(k): v for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return list(obj)
+        return None
+
+    @staticmethod
+    def value(obj):
+        """The value of an `obj` without children"""
+        if isinstance(obj, dftypes.Reference):
+            return obj.value.value
+        if isinstance(obj, dftypes.WeakPointer):
+            return str(obj)
+        if isinstance(obj, (dftypes.StrongPointer, dftypes.Record)):
+            return None  # null pointers
+        if isinstance(obj, (dftypes.GUID, dftypes.StringReference, dftypes.EnumChoice, ctypes._SimpleCData)):
+            return obj.value
+        return obj
+
+    def digest(self, obj) -> bytes:
+        key = self._key(obj)
+        if key is not None:
+            if (digest := self._digests.get(key)) is not None:
+                return digest
+            if key in self._in_progress:
+                # strong pointers back into a structure that is being hashed
+                return hashlib.blake2b(f"cycle:{key}".encode("utf-8"), digest_size=_DIGEST_SIZE).digest()
+
+        if isinstance(obj, dftypes.StrongPointer) and (instance := obj.reference) is not None:
+            # kept for the pointer as well, so it isn't resolved again
+            digest = self.digest(instance)
+        elif (children := self.children(obj)) is None:
+            value = self.value(obj)
+            digest = hashlib.blake2b(
+                f"{type(value).__name__}:{value}".encode("utf-8"), digest_size=_DIGEST_SIZE
+            ).digest()
+        else:
+            if key is not None:
+                self._in_progress.add(key)
+            try:
+                if isinstance(children, dict):
+                    h = hashlib.blake2b(b"{", digest_size=_DIGEST_SIZE)
+                    for name in sorted(children):
+                        h.update(name.encode("utf-8"))
+                        h.update(b"\0")
+                        h.update(self.digest(children[name]))
+                else:
+                    h = hashlib.blake2b(b"[", digest_size=_DIGEST_SIZE)
+                    for child in children:
+                        h.update(self.digest(child))
+                digest = h.digest()
+            finally:
+                self._in_progress.discard(key)
+
+        if key is not None:
+            self._digests[key] = digest
+        return digest
+
+    def to_json(self, obj, _seen=None):
+        """`obj` and everything below it as JSON, how added and removed properties are reported"""
+        if (children := self.children(obj)) is None:
+            return json_value(self.value(obj))
+        key = self._key(obj)
+        _seen = set() if _seen is None else _seen
+        if key is not None:
+            if key in _seen:
+                return f"<cycle: {obj.name}>"
+            _seen = _seen | {key}
+        if isinstance(children, dict):
+            return {name: self.to_json(child, _seen) for name, child in children.items()}
+        return [self.to_json(_, _seen) for _ in children]
+
+
+def hash_tree(obj, hasher: TreeHasher = None) -> bytes:
+    """The content digest of `obj`, see `TreeHasher`"""
+    return (hasher or TreeHasher()).digest(obj)
+
+
+def _child_path(path, key):
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    return f"{path}.{key}" if path else key
+
+
+def diff_trees(old, new, old_hasher: TreeHasher = None, new_hasher: TreeHasher = None, path="",
+               changes: list = None) -> typing.List[PropertyChange]:
+    """The properties that differ between `old` and `new` (records or any of their properties), skipping every
+    subtree whose digest didn't change. List items are compared by position. Pass the `TreeHasher` of each DataCore
+    when comparing many records so the digests of shared structures are reused."""
+    old_hasher = TreeHasher() if old_hasher is None else old_hasher
+    new_hasher = TreeHasher() if new_hasher is None else new_hasher
+    changes = [] if changes is None else changes
+    if old_hasher.digest(old) == new_hasher.digest(new):
+        return changes
+
+    old_children, new_children = old_hasher.children(old), new_hasher.children(new)
+    if isinstance(old_children, dict) and isinstance(new_children, dict):
+        for key, old_child in old_children.items():
+            if key not in new_children:
+                changes.append(
+                    PropertyChange(_child_path(path, key), "removed", old_hasher.to_json(old_child), None)
+                )
+            else:
+                diff_trees(old_child, new_children[key], old_hasher, new_hasher, _child_path(path, key), changes)
+        for key, new_child in new_children.items():
+            if key not in old_children:
+                changes.append(PropertyChange(_child_path(path, key), "added", None, new_hasher.to_json(new_child)))
+    elif isinstance(old_children, list) and isinstance(new_children, list):
+        for i, (old_child, new_child) in enumerate(zip(old_children, new_children)):
+            diff_trees(old_child, new_child, old_hasher, new_hasher, _child_path(path, i), changes)
+        for i in range(len(new_children), len(old_children)):
+            changes.append(PropertyChange(_child_path(path, i), "removed", old_hasher.to_json(old_children[i]), None))
+        for i in range(len(old_children), len(new_children)):
+            changes.append(PropertyChange(_child_path(path, i), "added", None, new_hasher.to_json(new_children[i])))
+    else:
+        changes.append(PropertyChange(path, "changed", old_hasher.to_json(old), new_hasher.to_json(new)))
+    return changes
+
+
+class DataCoreDiff:
+    """The records added, removed and changed between two DataCores, matched by GUID, and the properties that changed
+    in each changed record::
+
+        diff = DataCoreDiff.compare(old_datacore, new_datacore)
+        diff.counts()  # {"added": 12, "removed": 3, "changed": 240, "error": 0}
+        diff.save_json("diff.json")
+    """
+
+    def __init__(self, old_name="", new_name=""):
+        self.old_name = old_name
+        self.new_name = new_name
+        self.records: typing.List[RecordDiff] = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def __repr__(self):
+        counts = " ".join(f"{k}:{v}" for k, v in self.counts().items())
+        return f"<DataCoreDiff {self.old_name} -> {self.new_name} {counts}>"
+
+    def counts(self) -> typing.Dict[str, int]:
+        counts = {"added": 0, "removed": 0, "changed": 0, "error": 0}
+        for record in self.records:
+            counts[record.status] += 1
+        return counts
+
+    @classmethod
+    def compare(cls, old_datacore, new_datacore, old_name="", new_name="", progress: typing.Callable = None,
+                should_cancel: typing.Callable = None) -> typing.Optional["DataCoreDiff"]:
+        """Compare every record of `old_datacore` to the record with the same GUID in `new_datacore`.
+        `progress(done, total)` is called as records are compared, returns `None` if `should_cancel()` becomes true.
+        Records that can't be compared are listed as `error`, with the error as their only change."""
+        diff = cls(old_name, new_name)
+        old_hasher, new_hasher = TreeHasher(), TreeHasher()
+        old_records = old_datacore.records_by_guid
+        new_records = new_datacore.records_by_guid
+        for done, (guid, old_record) in enumerate(old_records.items()):
+            if should_cancel is not None and should_cancel():
+                return None
+            if progress is not None:
+                progress(done, len(old_records))
+            if (new_record := new_records.get(guid)) is None:
+                diff.records.append(RecordDiff(guid, "removed", old_record.filename, old_record.type, []))
+                continue
+            try:
+                changes = diff_trees(old_record, new_record, old_hasher, new_hasher)
+            except Exception as e:
+                logger.debug(f"Failed to compare record {guid}: {e}")
+                try:
+                    record_type = new_record.type
+                except Exception:
+                    record_type = ""
+                diff.records.append(RecordDiff(
+                    guid, "error", new_record.filename, record_type, [PropertyChange("", "error", None, str(e))]
+                ))
+                continue
+            if changes:
+                diff.records.append(RecordDiff(guid, "changed", new_record.filename, new_record.type, changes))
+
+        for guid, new_record in new_records.items():
+            if guid not in old_records:
+                diff.records.append(RecordDiff(guid, "added", new_record.filename, new_record.type, []))
+
+        diff.records.sort(key=lambda _: _.path.lower())
+        return diff
+
+    def to_json(self) -> dict:
+        return {
+            "version": DATACORE_DIFF_VERSION,
+            "old": self.old_name,
+            "new": self.new_name,
+            "counts": self.counts(),
+            "records": [
+                {
+                    "guid": record.guid,
+                    "status": record.status,
+                    "path": record.path,
+                    "type": record.type,
+                    "changes": [change._asdict() for change in record.changes],
+                }
+                for record in self.records
+            ],
+        }
+
+    def save_json(self, filename: typing.Union[str, Path]):
+        with Path(filename).open("w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, indent=2)
+
+
+class DataCoreDiffRunner(qtc.QRunnable):
+    """Compares two DataCores in the background. Each side is either a loaded DataCore or the path of a `Game.dcb`
+    to load. The result is emitted with `signals.finished` as `{"diff": diff, "cancelled": cancelled, "error": msg}`.
+    """
+
+    def __init__(self, old, new):
+        super().__init__()
+        self.signals = BackgroundRunnerSignals()
+        self.starfab = get_starfab()
+        self.old = old
+        self.new = new
+        self._should_cancel = False
+        self.signals.cancel.connect(self._handle_cancel)
+        self.setAutoDelete(True)
+
+    def _handle_cancel(self):
+        self._should_cancel = True
+
+    @staticmethod
+    def _name(source):
+        return Path(source).as_posix() if isinstance(source, (str, Path)) else "Current Game.dcb"
+
+    def run(self):
+        task_name = f"datacore_diff_{hash(self)}"
+        diff = None
+        error = ""
+        self.starfab.task_started.emit(task_name, "Loading DataCores to compare", 0, 0)
+        try:
+            old, new = (
+                load_datacore(_) if isinstance(_, (str, Path)) else _ for _ in (self.old, self.new)
+            )
+            t = time.time()
+
+            def _progress(done, total):
+                nonlocal t
+                if (time.time() - t) > 0.5:
+                    self.starfab.update_status_progress.emit(task_name, done, 0, total, "Comparing DataCore records")
+                    t = time.time()
+
+            start_time = time.time()
+            diff = DataCoreDiff.compare(
+                old, new, self._name(self.old), self._name(self.new), progress=_progress,
+                should_cancel=lambda: self._should_cancel,
+            )
+            logger.debug(f"Compared DataCores in {time.time() - start_time:.2f}s: {diff}")
+        except Exception as e:
+            logger.exception("Failed to compare DataCores", exc_info=e)
+            error = str(e)
+        self.starfab.task_finished.emit(task_name, diff is not None, error)
+        self.signals.finished.emit({"diff": diff, "cancelled": self._should_cancel, "error": error})
@@ -0,0 +1,131 @@
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path, PurePath
+
+from starfab import get_starfab
+from starfab.gui import qtc
+from starfab.log import getLogger
+from starfab.models.common import BackgroundRunnerSignals
+from starfab.settings import settings
+
+logger = getLogger(__name__)
+# records serialized and written by a worker before checking back in
+EXTRACT_BATCH_SIZE = 256
+# buffer size of the file writers
+EXTRACT_WRITE_BUFFER = 1024 * 1024
+
+
+def plan_extract_paths(
+    records: typing.Iterable[typing.Tuple[str, PurePath]], outdir: Path
+) -> typing.List[typing.Tuple[str, Path]]:
+    """The output file of each `(guid, path)` in `records` when extracted to `outdir`. A record whose file is already
+    taken, by an earlier record or a file already on disk, is written to `<stem>.<guid><suffix>` instead."""
+    planned = set()
+    paths = []
+    for guid, path in records:
+        outfile = outdir / path
+        if outfile in planned or outfile.is_file():
+            outfile = outfile.parent / f"{outfile.stem}.{guid}{outfile.suffix}"
+        planned.add(outfile)
+        paths.append((guid, outfile))
+    return paths
+
+
+class DCBExtractRunner(qtc.QRunnable):
+    """Extracts DataCore records to a directory in the background.
+
+    Records are serialized (as `xml` or `json`) and written by a pool of worker threads in batches, each file with a
+    single buffered write. Threads rather than processes, as the workers share the parsed DataCore. Serializing holds
+    the GIL, the gain is in overlapping it with the writes. Serialized records already in the `RecordRenderCache` are
+    reused, but records serialized for the extraction aren't added to it so it keeps the records being viewed.
+    `records` can also be a callable returning them, which is called on the runner's thread (e.g.
+    `DCBModel.record_paths`, so extracting everything doesn't list the records on the GUI thread). Progress is reported
+    through the task status bar, cancelling stops at the next batch. `signals.finished` is emitted with
+    `{"outdir", "extracted", "failed", "cancelled"}`.
+    """
+
+    def __init__(
+        self,
+        datacore,
+        record_cache,
+        records: typing.Union[
+            typing.List[typing.Tuple[str, PurePath]], typing.Callable[[], typing.Iterable[typing.Tuple[str, PurePath]]]
+        ],
+        outdir: Path,
+        fmt="xml",
+        workers: int = None,
+    ):
+        super().__init__()
+        self.signals = BackgroundRunnerSignals()
+        self.starfab = get_starfab()
+        self.datacore = datacore
+        self.record_cache = record_cache
+        self.records = records
+        self.outdir = Path(outdir)
+        self.fmt = "xml" if fmt == "xml" else "json"
+        self.workers = workers or settings.snapshot.value("datacore/extract_workers")
+        self._should_cancel = False
+        self.signals.cancel.connect(self._handle_cancel)
+        self.setAutoDelete(True)
+
+    def _handle_cancel(self):
+        self._should_cancel = True
+
+    def _extract_batch(self, batch) -> typing.Tuple[int, int]:
+        extracted = failed = 0
+        for guid, outfile in batch:
+            if self._should_cancel:
+                break
+            try:
+                data = self.record_cache.render(
+                    self.datacore, self.datacore.records_by_guid[guid], self.fmt, store=False
+                )
+                with outfile.open("wb", buffering=EXTRACT_WRITE_BUFFER) as o:
+                    o.write(data)
+                extracted += 1
+            except Exception as e:
+                logger.exception(f"Exception extracting record {outfile}", exc_info=e)
+                failed += 1
+        return extracted, failed
+
+    def run(self):
+        task_name = f"extract_dcb_{hash(self)}"
+        msg = f"Extracting records to {self.outdir.name}"
+        self.starfab.task_started.emit(task_name, msg, 0, 0 if callable(self.records) else len(self.records))
+        extracted = failed = total = 0
+        error = False
+        try:
+            records = list(self.records()) if callable(self.records) else self.records
+            total = len(records)
+            self.starfab.update_status_progress.emit(task_name, 0, 0, total, msg)
+            # planned up front, in order, so the duplicate names don't depend on which worker finishes first
+            paths = plan_extract_paths(records, self.outdir)
+            for parent in {outfile.parent for _, outfile in paths}:
+                parent.mkdir(parents=True, exist_ok=True)
+
+            t = time.time()
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+                futures = [
+                    executor.submit(self._extract_batch, paths[i:i + EXTRACT_BATCH_SIZE])
+                    for i in range(0, total, EXTRACT_BATCH_SIZE)
+                ]
+                for future in as_completed(futures):
+                    if self._should_cancel:
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        break
+                    batch_extracted, batch_failed = future.result()
+                    extracted += batch_extracted
+                    failed += batch_failed
+                    if (time.time() - t) > 0.5:
+                        self.starfab.update_status_progress.emit(task_name, extracted + failed, 0, total, msg)
+                        t = time.time()
+        except Exception as e:
+            logger.exception(f"Failed to extract records to {self.outdir}", exc_info=e)
+            error = True
+        finally:
+            logger.debug(f"Extracted {extracted}/{total} records to {self.outdir}, {failed} failed")
+            self.starfab.task_finished.emit(task_name, not (self._should_cancel or error), "")
+            self.signals.finished.emit(
+                {"outdir": self.outdir, "extracted": extracted, "failed": failed, "cancelled": self._should_cancel}
+            )
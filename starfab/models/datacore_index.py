@@ -0,0 +1,304 @@
+import io
+import json
+import re
+import struct
+import time
+import typing
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from starfab import get_starfab
+from starfab.gui import qtc
+from starfab.log import getLogger
+from starfab.models.common import BackgroundRunnerSignals
+from starfab.models.p4k_index import index_key_for, index_path_for
+from starfab.settings import settings
+
+logger = getLogger(__name__)
+
+DATACORE_TEXT_INDEX_MAGIC = b"SFDCBTXT"
+DATACORE_TEXT_INDEX_VERSION = 2
+DATACORE_TEXT_INDEX_FILENAME = "datacore_text.index"
+# how deep `record_to_dict` follows references when collecting the text of a record, the same depth the record view
+# filter searches
+RECORD_TEXT_DEPTH = 1
+
+_TERM_RE = re.compile(r"\w+")
+_TERM_SEP = "\n"
+
+
+def text_index_path_for(sc) -> Path:
+    """Location of the stored text index for the `StarCitizen` `sc`, next to its stored p4k index"""
+    return index_path_for(sc).with_name(DATACORE_TEXT_INDEX_FILENAME)
+
+
+def query_terms(text: str) -> typing.List[str]:
+    """Split a query (or record text) into lower-cased terms"""
+    return _TERM_RE.findall(text.lower())
+
+
+def record_terms(datacore, record) -> typing.Set[str]:
+    """The terms of the property names and values of `record`"""
+    terms = set()
+    stack = [datacore.record_to_dict(record, depth=RECORD_TEXT_DEPTH)]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                terms.update(query_terms(str(key)))
+                stack.append(value)
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif isinstance(obj, str):
+            terms.update(query_terms(obj))
+        elif obj is None or isinstance(obj, bool):
+            # as they are written in the record's json
+            terms.add(json.dumps(obj))
+        else:
+            terms.update(query_terms(str(obj)))
+    return terms
+
+
+class DataCoreTextIndex:
+    """Inverted index from the terms of the property names and values of every DataCore record to the records that
+    contain them.
+
+    A query is split into terms (runs of letters, digits and `_`, case insensitive), a record matches when each query
+    term is contained in one of its terms. Matching terms are found with `str.find` over the whole vocabulary, so
+    partial words still match, and the postings of every matching term are merged::
+
+        text_index.guids_matching("LightningBolt damage")
+        text_index.record_matches(record.id.value, "lightning")
+    """
+
+    def __init__(self, key: dict = None):
+        self.key = key or {}
+        self.guids: typing.List[str] = []
+        self.terms: typing.List[str] = []  # sorted
+        self.offsets = array("Q", [0])  # postings of term n are `postings[offsets[n]:offsets[n + 1]]`
+        self.postings = array("I")
+        self._ids_by_guid = None
+        self._vocabulary = None
+        self._term_starts = None
+        self._matches = {}
+
+    def __len__(self):
+        return len(self.guids)
+
+    def __repr__(self):
+        return f"<DataCoreTextIndex records:{len(self)} terms:{len(self.terms)}>"
+
+    @classmethod
+    def build(cls, datacore, key: dict = None, progress: typing.Callable = None,
+              should_cancel: typing.Callable = None) -> typing.Optional["DataCoreTextIndex"]:
+        """Index every record of `datacore`. `progress(done, total)` is called as records are indexed, returns `None`
+        if `should_cancel()` becomes true."""
+        index = cls(key)
+        records_by_term = {}
+        records = datacore.records
+        for record_id, record in enumerate(records):
+            if should_cancel is not None and should_cancel():
+                return None
+            if progress is not None:
+                progress(record_id, len(records))
+            index.guids.append(record.id.value)
+            try:
+                terms = record_terms(datacore, record)
+            except Exception as e:
+                logger.debug(f"Failed to index record {record.id.value}: {e}")
+                continue
+            for term in terms:
+                if (ids := records_by_term.get(term)) is None:
+                    ids = records_by_term[term] = array("I")
+                ids.append(record_id)
+
+        index.terms = sorted(records_by_term)
+        for term in index.terms:
+            index.postings.extend(records_by_term[term])
+            index.offsets.append(len(index.postings))
+        return index
+
+    def _term_ids_matching(self, query_term) -> typing.List[int]:
+        if (term_ids := self._matches.get(query_term)) is None:
+            if self._vocabulary is None:
+                self._vocabulary = _TERM_SEP.join(self.terms)
+                self._term_starts = array("Q")
+                pos = 0
+                for term in self.terms:
+                    self._term_starts.append(pos)
+                    pos += len(term) + 1
+            term_ids = []
+            vocabulary, starts = self._vocabulary, self._term_starts
+            pos = vocabulary.find(query_term)
+            while pos >= 0:
+                term_id = bisect_right(starts, pos) - 1
+                term_ids.append(term_id)
+                if term_id + 1 >= len(starts):
+                    break
+                pos = vocabulary.find(query_term, starts[term_id + 1])
+            if len(self._matches) > 256:
+                self._matches.clear()
+            self._matches[query_term] = term_ids
+        return term_ids
+
+    def record_ids_matching(self, text) -> typing.Set[int]:
+        """Ids (positions in `guids`) of the records matching every term of `text`"""
+        matched = None
+        for query_term in sorted(set(query_terms(text)), key=len, reverse=True):
+            record_ids = set()
+            for term_id in self._term_ids_matching(query_term):
+                record_ids.update(self.postings[self.offsets[term_id]:self.offsets[term_id + 1]])
+            matched = record_ids if matched is None else matched & record_ids
+            if not matched:
+                break
+        return matched or set()
+
+    def may_contain(self, text) -> bool:
+        """False if `text` can't be found in any record serialized at `RECORD_TEXT_DEPTH`, i.e. one of its terms isn't
+        part of any indexed term. Objects serialized deeper than that (e.g. structures nested further down a record)
+        can contain text that wasn't indexed, this says nothing about them."""
+        return all(self._term_ids_matching(_) for _ in query_terms(text))
+
+    def guids_matching(self, text) -> typing.Set[str]:
+        return {self.guids[_] for _ in self.record_ids_matching(text)}
+
+    def record_matches(self, guid, text) -> bool:
+        if self._ids_by_guid is None:
+            self._ids_by_guid = {guid: record_id for record_id, guid in enumerate(self.guids)}
+        if (record_id := self._ids_by_guid.get(guid)) is None:
+            return False
+        return all(
+            any(self._term_has_record(term_id, record_id) for term_id in self._term_ids_matching(query_term))
+            for query_term in query_terms(text)
+        )
+
+    def _term_has_record(self, term_id, record_id) -> bool:
+        # postings are in record order
+        lo, hi = self.offsets[term_id], self.offsets[term_id + 1]
+        pos = bisect_left(self.postings, record_id, lo, hi)
+        return pos < hi and self.postings[pos] == record_id
+
+    def save(self, filename: typing.Union[str, Path]):
+        filename = Path(filename)
+        filename.parent.mkdir(parents=True, exist_ok=True)
+
+        payload = io.BytesIO()
+        for buf in (_TERM_SEP.join(self.guids).encode("utf-8"), _TERM_SEP.join(self.terms).encode("utf-8"),
+                    self.offsets.tobytes(), self.postings.tobytes()):
+            payload.write(struct.pack("<Q", len(buf)))
+            payload.write(buf)
+
+        key = json.dumps(self.key, sort_keys=True).encode("utf-8")
+        tmp = filename.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            f.write(DATACORE_TEXT_INDEX_MAGIC)
+            f.write(struct.pack("<III", DATACORE_TEXT_INDEX_VERSION, len(key), len(self)))
+            f.write(key)
+            f.write(zlib.compress(payload.getvalue(), 1))
+        tmp.replace(filename)
+        logger.debug(f"Saved {self} to {filename}")
+
+    @classmethod
+    def load(cls, filename: typing.Union[str, Path], key: dict) -> typing.Optional["DataCoreTextIndex"]:
+        """Load a stored index from `filename`, `None` if it doesn't exist or wasn't built for `key`"""
+        filename = Path(filename)
+        if not filename.is_file():
+            return None
+
+        try:
+            with filename.open("rb") as f:
+                if f.read(len(DATACORE_TEXT_INDEX_MAGIC)) != DATACORE_TEXT_INDEX_MAGIC:
+                    return None
+                version, key_len, count = struct.unpack("<III", f.read(12))
+                if version != DATACORE_TEXT_INDEX_VERSION:
+                    return None
+                if json.loads(f.read(key_len).decode("utf-8")) != key:
+                    logger.debug(f"Ignoring stale DataCore text index {filename}")
+                    return None
+                payload = memoryview(zlib.decompress(f.read()))
+        except (OSError, ValueError, struct.error, zlib.error) as e:
+            logger.warning(f"Failed to read DataCore text index {filename}: {e}")
+            return None
+
+        def _next_buf():
+            nonlocal payload
+            (length,) = struct.unpack_from("<Q", payload)
+            buf, payload = payload[8 : 8 + length], payload[8 + length :]
+            if len(buf) != length:
+                raise ValueError("truncated payload")
+            return buf
+
+        index = cls(key)
+        try:
+            guids = bytes(_next_buf()).decode("utf-8")
+            terms = bytes(_next_buf()).decode("utf-8")
+            index.guids = guids.split(_TERM_SEP) if count else []
+            index.terms = terms.split(_TERM_SEP) if terms else []
+            index.offsets = array("Q")
+            index.offsets.frombytes(_next_buf())
+            index.postings.frombytes(_next_buf())
+        except (ValueError, struct.error) as e:
+            logger.warning(f"Ignoring corrupt DataCore text index {filename}: {e}")
+            return None
+
+        if (
+            len(index.guids) != count
+            or len(index.offsets) != len(index.terms) + 1
+            or index.offsets[-1] != len(index.postings)
+            or any(index.offsets[i] > index.offsets[i + 1] for i in range(len(index.terms)))
+            or any(_ >= count for _ in index.postings)
+        ):
+            logger.warning(f"Ignoring corrupt DataCore text index {filename}")
+            return None
+        return index
+
+
+class DataCoreTextIndexBuilder(qtc.QRunnable):
+    """Loads the stored `DataCoreTextIndex` of a `StarCitizen`, or builds (and stores) it, in the background. The
+    index is emitted with `signals.finished` as `{"index": index}`."""
+
+    def __init__(self, sc):
+        super().__init__()
+        self.signals = BackgroundRunnerSignals()
+        self.starfab = get_starfab()
+        self.sc = sc
+        self._should_cancel = False
+        self.signals.cancel.connect(self._handle_cancel)
+        self.setAutoDelete(True)
+
+    def _handle_cancel(self):
+        self._should_cancel = True
+
+    def run(self):
+        index = None
+        try:
+            key = index_key_for(self.sc)
+            filename = text_index_path_for(self.sc)
+            if (index := DataCoreTextIndex.load(filename, key)) is None:
+                index = self._build(key)
+                if index is not None and settings.snapshot.value("cache/datacore_text_index"):
+                    index.save(filename)
+        except Exception as e:
+            logger.exception("Failed to build the DataCore text index", exc_info=e)
+        self.signals.finished.emit({"index": index})
+
+    def _build(self, key):
+        task_name = f"datacore_text_index_{hash(self)}"
+        t = time.time()
+
+        def _progress(done, total):
+            nonlocal t
+            if (time.time() - t) > 0.5:
+                self.starfab.update_status_progress.emit(task_name, done, 0, total, "")
+                t = time.time()
+
+        self.starfab.task_started.emit(task_name, "Indexing DataCore records", 0, len(self.sc.datacore.records))
+        start_time = time.time()
+        index = DataCoreTextIndex.build(
+            self.sc.datacore, key, progress=_progress, should_cancel=lambda: self._should_cancel
+        )
+        logger.debug(f"Built {index} in {time.time() - start_time:.2f}s")
+        self.starfab.task_finished.emit(task_name, index is not None, "")
+        return index
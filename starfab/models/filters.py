@@ -0,0 +1,192 @@
+import operator
+import typing
+
+from scdatatools.forge.dftypes import StructureInstance
+from starfab.log import getLogger
+
+logger = getLogger(__name__)
+
+
+def bitset_from_rows(rows: typing.Iterable[int], count: int) -> int:
+    """Pack row ids into an int bitset, bit `n` is set if row `n` is in `rows`"""
+    bits = bytearray((count + 7) // 8)
+    for row in rows:
+        bits[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bits, "little")
+
+
+def rows_from_bitset(bitset: int) -> typing.Iterator[int]:
+    """Yields the row ids set in `bitset`, in order"""
+    bits = bitset.to_bytes((bitset.bit_length() + 7) // 8, "little")
+    for i, byte in enumerate(bits):
+        if byte:
+            for j in range(8):
+                if byte >> j & 1:
+                    yield (i << 3) + j
+
+
+class FilterSpec:
+    """A filter for the rows of a `PathArchiveTreeSortFilterProxyModel`.
+
+    Calling the spec tests a single item, which is how `checkAdditionFilters` has always used filters. When the source
+    model has a `SearchIndex`, `rows` is used instead to evaluate the filter over a whole column of the index at once,
+    returning a bitset of the accepted rows.
+    """
+
+    def __call__(self, item) -> bool:
+        raise NotImplementedError()
+
+    def rows(self, index) -> int:
+        raise NotImplementedError()
+
+
+class ColumnEquals(FilterSpec):
+    """Accepts rows where the column `column` has one of `values`"""
+
+    column = ""
+
+    def __init__(self, values):
+        self.values = {values} if isinstance(values, str) else set(values)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.values}>"
+
+    def value(self, item):
+        raise NotImplementedError()
+
+    def __call__(self, item) -> bool:
+        return self.value(item) in self.values
+
+    def rows(self, index) -> int:
+        return index.bitset_for_values(self.column, self.values)
+
+
+class TypeEquals(ColumnEquals):
+    column = "type"
+
+    def value(self, item):
+        return item.record.type if item.record is not None else None
+
+
+class SuffixEquals(ColumnEquals):
+    column = "suffix"
+
+    def __init__(self, values):
+        super().__init__(values)
+        self.values = {_.lower() for _ in self.values}
+
+    def value(self, item):
+        return item.path.suffix.lower()
+
+
+class PathContains(FilterSpec):
+    def __init__(self, text):
+        self.text = text.lower()
+
+    def __repr__(self):
+        return f'<PathContains "{self.text}">'
+
+    def __call__(self, item) -> bool:
+        return self.text in item._path.lower()
+
+    def rows(self, index) -> int:
+        return bitset_from_rows(index.rows_for_path_text(self.text), len(index))
+
+
+class HasTags(FilterSpec):
+    """Accepts DataCore records tagged with any (`match=any`) or all (`match=all`) of `tags`.
+
+    With a `RecordTagIndex` (`TagDatabaseModel.tag_index`) records are checked against the bitset of `tags`,
+    otherwise each record's tags are resolved through `tag_database`.
+    """
+
+    def __init__(self, tags, tag_database, match=any, tag_index=None):
+        self.tags = set(tags)
+        self.tag_database = tag_database
+        self.match = match
+        self.tag_index = tag_index
+        self._mask = tag_index.mask(self.tags, strict=match is all) if tag_index is not None else None
+
+    def __repr__(self):
+        return f"<HasTags {self.match.__name__} {self.tags}>"
+
+    def _accepts_record(self, record) -> bool:
+        if record is None:
+            return False
+        if self.tag_index is not None:
+            if self.match is all:
+                return self.tag_index.has_all(record, self._mask)
+            return self.tag_index.has_any(record, self._mask)
+        record_tags = record_tag_names(record, self.tag_database)
+        return self.match(tag in record_tags for tag in self.tags)
+
+    def __call__(self, item) -> bool:
+        return self._accepts_record(item.record)
+
+    def rows(self, index) -> int:
+        records = index.column("record")
+        if self.tag_index is not None:
+            mask, record_bits = self._mask, self.tag_index.record_bits
+            if not mask:
+                return 0
+            if self.match is all:
+                accepted = (
+                    row for row, record in enumerate(records)
+                    if record is not None and record_bits.get(record.id.value, 0) & mask == mask
+                )
+            else:
+                accepted = (
+                    row for row, record in enumerate(records)
+                    if record is not None and record_bits.get(record.id.value, 0) & mask
+                )
+            return bitset_from_rows(accepted, len(index))
+        return bitset_from_rows(
+            (row for row, record in enumerate(records) if self._accepts_record(record)), len(index)
+        )
+
+
+def record_tag_guids(record) -> typing.Iterator[str]:
+    """The guids of the tags of a DataCore `record`"""
+    record_tags = record.properties.get("tags", [])
+    if isinstance(record_tags, StructureInstance):
+        return (str(_) for _ in record_tags.properties.values())
+    return (_.name for _ in record_tags)
+
+
+def record_tag_names(record, tag_database) -> typing.Set[str]:
+    """The names of the tags of a DataCore `record`"""
+    return {str(tag) for guid in record_tag_guids(record) if (tag := tag_database.tags_by_guid.get(guid)) is not None}
+
+
+def suffix_filter_values(filters) -> typing.Optional[typing.Set[str]]:
+    """The suffixes accepted by `filters` if they only consist of `SuffixEquals` specs combined with `and`, so the
+    candidates can be looked up directly (e.g. in `P4KIndex.ids_for`). Otherwise `None`."""
+    if not filters or not all(op == operator.and_ and isinstance(f, SuffixEquals) for op, f in filters):
+        return None
+    values = set(filters[0][1].values)
+    for _, f in filters[1:]:
+        values &= f.values
+    return values
+
+
+def is_compiled(filters) -> bool:
+    """True if every `(op, filter)` in `filters` can be evaluated with `evaluate_filters`"""
+    return all(isinstance(f, FilterSpec) for _, f in filters)
+
+
+def evaluate_filters(filters, index) -> int:
+    """Evaluate `(op, filter)` pairs over every row of `index`, with the same semantics as
+    `PathArchiveTreeSortFilterProxyModel.checkAdditionFilters`, returning the bitset of accepted rows"""
+    all_rows = (1 << len(index)) - 1
+    accepted = all_rows
+    for op, spec in filters:
+        rows = spec.rows(index)
+        if op == operator.not_:
+            accepted = all_rows & ~rows
+        elif op == operator.and_:
+            accepted &= rows
+        elif op == operator.or_:
+            accepted |= rows
+        else:
+            accepted = op(accepted, rows) & all_rows
+    return accepted
@@ -0,0 +1,79 @@
+import typing
+from bisect import bisect_left
+
+from starfab.log import getLogger
+
+logger = getLogger(__name__)
+
+
+def resolve_folder_path(path) -> str:
+    """The path of the folder `PathArchiveTreeModel.parentForPath` returns for `path`, components containing a `.` are
+    not treated as folders"""
+    while path:
+        parent_path, name = path.rsplit("/", maxsplit=1) if "/" in path else ("", path)
+        if "." not in name:
+            return path
+        path = parent_path
+    return ""
+
+
+def _folder_prefix(lower_folder_path) -> str:
+    return f"/{lower_folder_path}/" if lower_folder_path else "/"
+
+
+class LazyTreeSource:
+    """A flat, sorted listing of the `(parent_path, path, kwargs)` entries of a `PathArchiveTreeModel` that lets the
+    model create the children of a folder on demand.
+
+    Every entry is keyed by the lower-cased path of the folder it belongs to followed by its name (e.g.
+    `/data/objects/foo.cgf`), so the whole sub-tree of a folder is a contiguous range of the sorted keys and the direct
+    children of a folder can be found by skipping over the ranges of its sub-folders with a bisect.
+    """
+
+    def __init__(self, entries: typing.Iterable[typing.Tuple[str, str, dict]]):
+        keyed = []
+        for parent_path, path, kwargs in entries:
+            folder = resolve_folder_path(parent_path)
+            keyed.append((f"{_folder_prefix(folder.lower())}{path.rsplit('/', maxsplit=1)[-1]}",
+                          (parent_path, path, kwargs)))
+        keyed.sort(key=lambda _: _[0])
+        self.keys: typing.List[str] = [_[0] for _ in keyed]
+        self.entries: typing.List[typing.Tuple[str, str, dict]] = [_[1] for _ in keyed]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        return f"<LazyTreeSource entries:{len(self)}>"
+
+    def range_for(self, lower_folder_path, lo=0, hi=None) -> typing.Tuple[int, int]:
+        """The range of entries below the folder `lower_folder_path`"""
+        prefix = _folder_prefix(lower_folder_path)
+        hi = len(self.keys) if hi is None else hi
+        start = bisect_left(self.keys, prefix, lo, hi)
+        return start, bisect_left(self.keys, prefix[:-1] + "0", start, hi)  # "0" sorts directly after "/"
+
+    def children(self, lower_folder_path, lo, hi):
+        """Yields the direct children of `lower_folder_path` within the entries `lo:hi`. Sub-folders are yielded as
+        `(True, folder_path, (sub_lo, sub_hi))`, entries as `(False, path, (parent_path, path, kwargs))`."""
+        prefix = _folder_prefix(lower_folder_path)
+        depth = lower_folder_path.count("/") + 1 if lower_folder_path else 0
+        i = lo
+        while i < hi:
+            rest = self.keys[i][len(prefix):]
+            if "/" not in rest:
+                yield False, self.entries[i][1], self.entries[i]
+                i += 1
+                continue
+
+            # resolve the original case of the sub-folder from the entry, the first one found wins like in the
+            # object tree. Components containing a "." are not folders, like in `parentForPath` the sub-folder is the
+            # next component without one (e.g. `a/b.socpak/c` directly below `a`)
+            components = resolve_folder_path(self.entries[i][0]).split("/")
+            end = depth
+            while "." in components[end]:
+                end += 1
+            folder_path = "/".join(components[: end + 1])
+            sub_lo, sub_hi = self.range_for(folder_path.lower(), i, hi)
+            yield True, folder_path, (sub_lo, sub_hi)
+            i = sub_hi
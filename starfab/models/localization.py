@@ -1,10 +1,32 @@
 import copy
 
 from starfab.gui import qtc
+from starfab.log import getLogger
+from starfab.models.common import BackgroundRunnerSignals
+
+logger = getLogger(__name__)
+
+
+class LocalizationLoader(qtc.QRunnable):
+    """Reads the localization files of a `StarCitizen` in the background"""
+
+    def __init__(self, sc):
+        super().__init__()
+        self.signals = BackgroundRunnerSignals()
+        self.sc = sc
+
+    def run(self):
+        try:
+            localization = self.sc.localization
+            self.signals.finished.emit({"localization": localization, "msg": ""})
+        except Exception as e:
+            logger.exception(f"Failed to load localization", exc_info=e)
+            self.signals.finished.emit({"localization": None, "msg": str(e)})
 
 
 class LocalizationModel(qtc.QAbstractTableModel):
     loaded = qtc.Signal()
+    load_failed = qtc.Signal(str)
     unloading = qtc.Signal()
     cancel_loading = qtc.Signal()
 
@@ -16,15 +38,27 @@ class LocalizationModel(qtc.QAbstractTableModel):
         self.localization = None
         self.languages = None
         self.names = []
+        self._loader = None
 
-        self._sc_manager.p4k_model.loaded.connect(self._on_p4k_loaded)
+        # loading is started by `StarCitizenManager` once the p4k's file list is available
         self._sc_manager.p4k_model.unloading.connect(
             self._on_p4k_unloading,  # qtc.Qt.BlockingQueuedConnection
         )
 
-    @qtc.Slot()
-    def _on_p4k_loaded(self):
-        self.localization = self._sc_manager.sc.localization
+    def load(self, sc):
+        self._loader = LocalizationLoader(sc)
+        self._loader.signals.finished.connect(self._on_localization_loaded)
+        qtc.QThreadPool.globalInstance().start(self._loader)
+
+    @qtc.Slot(dict)
+    def _on_localization_loaded(self, result):
+        if self.sender() is not getattr(self._loader, "signals", None):
+            return  # left over from a previous load
+        self._loader = None
+        if result["localization"] is None:
+            self.load_failed.emit(result["msg"])
+            return
+        self.localization = result["localization"]
         self.languages = list(sorted(self.localization.languages))
         self.languages.remove(self.localization.default_language)
         self.languages.insert(0, self.localization.default_language)
@@ -41,6 +75,7 @@ class LocalizationModel(qtc.QAbstractTableModel):
 
     @qtc.Slot()
     def _on_p4k_unloading(self):
+        self._loader = None
         self.unloading.emit()
         self.beginRemoveRows(qtc.QModelIndex(), 0, len(self.names))
         self.names = []
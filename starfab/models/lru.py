@@ -0,0 +1,87 @@
+import threading
+import typing
+from collections import OrderedDict
+
+
+class BytesLRUCache:
+    """A least recently used cache of `bytes` values with a size budget. Entries are evicted once the cached values
+    exceed `max_bytes`, values larger than that are never cached. Lookups are counted in `hits` and `misses`. Safe to
+    use from any thread."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: typing.OrderedDict[typing.Hashable, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__} entries:{len(self._entries)} size:{self._size}/{self.max_bytes} "
+            f"hits:{self.hits} misses:{self.misses}>"
+        )
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key) -> typing.Optional[bytes]:
+        with self._lock:
+            if (data := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return data
+
+    def peek(self, key) -> typing.Optional[bytes]:
+        """The cached value of `key` without counting the lookup or making it the most recently used"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if (previous := self._entries.pop(key, None)) is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            self._evict()
+
+    def resize(self, max_bytes: int):
+        """Change the budget, evicting the least recently used entries right away if it shrank"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,5 +1,8 @@
 import io
 import os
+import time
+import typing
+from contextlib import contextmanager
 from functools import cached_property
 
 from scdatatools.engine.cryxml import (
@@ -7,37 +10,91 @@ from scdatatools.engine.cryxml import (
     etree_from_cryxml_file,
     is_cryxmlb_file,
 )
+from starfab import get_starfab
 from starfab.gui import qtc
 from starfab.log import getLogger
 from starfab.models.common import (
+    BackgroundRunnerSignals,
     PathArchiveTreeSortFilterProxyModel,
     PathArchiveTreeItem,
     ContentItem,
     PathArchiveTreeModelLoader,
     ThreadLoadedPathArchiveTreeModel,
+    path_filter_columns,
 )
+from starfab.models.p4k_index import (
+    P4KIndex,
+    expand_subarchive,
+    index_key_for,
+    index_path_for,
+    parent_path_for,
+    resolve_info,
+    pack_date_time,
+    unpack_date_time,
+)
+from starfab.models.filters import suffix_filter_values
+from starfab.models.p4k_prefetch import P4KPrefetchCache, P4KPrefetcher
+from starfab.models.search import SearchResult
+from starfab.models.tree_builder import PathTreeBuilder
+from starfab.settings import settings
 
 logger = getLogger(__name__)
 P4K_MODEL_COLUMNS = ["Name", "Size", "Kind", "Date Modified"]
+# size of the reads `P4KItem.content_view` decompresses into its buffer
+CONTENT_CHUNK_SIZE = 1024 * 1024
 
 
 class P4KSortFilterProxyModelArchive(PathArchiveTreeSortFilterProxyModel):
-    def lessThan(self, source_left, source_right):
-        if self.sortColumn() in [1, 3]:
-            return self.sourceModel().data(
-                source_left, qtc.Qt.UserRole
-            ) < self.sourceModel().data(source_right, qtc.Qt.UserRole)
-        return super().lessThan(source_left, source_right)
+    def _update_search(self):
+        """Filters that only select file types are answered from the `P4KIndex`'s extension index, limited to the
+        model's root folder (e.g. for the content selectors), without evaluating them for every row"""
+        super()._update_search()
+        model = self.sourceModel()
+        if self._filter or (p4k_index := getattr(model, "p4k_index", None)) is None:
+            return
+        if (extensions := suffix_filter_values(self.additional_filters)) is None:
+            return
+        root = model.root_item
+        folder_path = root._path if root is not None and root.parent is not None else None
+        paths = [p4k_index.filenames[_] for _ in p4k_index.ids_for(extensions, folder_path)]
+        self._search_result = SearchResult.from_parent_paths("", paths, (parent_path_for(_) for _ in paths))
+        self.setRecursiveFilteringEnabled(False)
+
+    def setSourceModel(self, model):
+        if (current := self.sourceModel()) is not None and hasattr(current, "subarchive_expanded"):
+            current.subarchive_expanded.disconnect(self._handle_subarchive_expanded)
+        super().setSourceModel(model)
+        if model is not None and hasattr(model, "subarchive_expanded"):
+            model.subarchive_expanded.connect(self._handle_subarchive_expanded)
+
+    def setFilterText(self, text):
+        if text and (model := self.sourceModel()) is not None and hasattr(model, "expand_subarchives_in_background"):
+            # searching needs the contents of the sub-archives, results are updated as they're listed
+            model.expand_subarchives_in_background()
+        super().setFilterText(text)
+
+    @qtc.Slot(str)
+    def _handle_subarchive_expanded(self, filename):
+        if self._filter or self.additional_filters:
+            self._update_search()
+            self.invalidateFilter()
 
 
 class P4KItem(PathArchiveTreeItem, ContentItem):
     _cached_properties_ = PathArchiveTreeItem._cached_properties_ + [
         "raw_size",
         "raw_time",
+        "sort_size",
+        "sort_time",
         "size",
         "date_modified",
     ]
 
+    def __init__(self, path, model, parent=None, index_id=None):
+        super().__init__(path, model, parent)
+        # id of this item's entry in the model's `P4KIndex`, `None` for folders
+        self._index_id = index_id
+
     def _read_cryxml(self, f):
         try:
             c = pprint_xml_tree(etree_from_cryxml_file(f))
@@ -47,20 +104,68 @@ class P4KItem(PathArchiveTreeItem, ContentItem):
 
     def contents(self):
         try:
-            with self.model.archive.open(self._path) as f:
-                if is_cryxmlb_file(f):
-                    return io.BytesIO(self._read_cryxml(f).encode("utf-8"))
+            with self.open() as f:
+                if isinstance(f, io.BytesIO):
+                    return f
                 return io.BytesIO(f.read())
         except Exception as e:
             return io.BytesIO(f"Failed to read {self.name}: {e}".encode("utf-8"))
 
+    @contextmanager
+    def open(self, convert_cryxml=True):
+        """Stream the entry straight out of the p4k, decompressing it as it's read.
+
+        The reader handle is checked out of the `StarCitizenManager`'s pool until the stream is closed. CryXmlB files
+        are converted to text (into memory) unless `convert_cryxml` is `False`. Entries prefetched by the model are
+        served from memory.
+        """
+        if convert_cryxml and (data := self.model.prefetch_cache.get(self._path)) is not None:
+            yield io.BytesIO(data)
+            return
+        # entries reused from the stored index live in sub-archives that may not be expanded yet, resolving the info
+        # expands them so the entry can be found
+        info = self.info
+        with self.model._sc_manager.p4k_reader() as p4k, p4k.open(info if info is not None else self._path) as f:
+            if convert_cryxml and is_cryxmlb_file(f):
+                yield io.BytesIO(self._read_cryxml(f).encode("utf-8"))
+            else:
+                yield f
+
+    def content_view(self, convert_cryxml=True):
+        """Decompress the entry into a single buffer and return a read-only `memoryview` of it"""
+        try:
+            with self.open(convert_cryxml=convert_cryxml) as f:
+                if isinstance(f, io.BytesIO):
+                    return f.getbuffer().toreadonly()
+                info = self.info
+                buf = bytearray(info.file_size if info is not None else 0)
+                view = memoryview(buf)
+                read = 0
+                while read < len(buf):
+                    if not (n := f.readinto(view[read:read + CONTENT_CHUNK_SIZE])):
+                        break
+                    read += n
+                view.release()
+                if read == len(buf) and (rest := f.read()):
+                    buf += rest  # the size in the index is stale
+                    read = len(buf)
+                return memoryview(buf)[:read].toreadonly()
+        except Exception as e:
+            return memoryview(f"Failed to read {self.name}: {e}".encode("utf-8"))
+
     @cached_property
     def info(self):
+        if self._index_id is not None:
+            return resolve_info(self.model.archive, self._path)
         return self.model.archive.NameToInfo.get(self._path)
 
     @cached_property
     def raw_size(self):
-        if self.info is not None:
+        if self._index_id is not None:
+            return self.model.p4k_index.file_sizes[self._index_id]
+        elif (size := self.model.folder_sizes.get(self._path.lower())) is not None:
+            return size
+        elif self.info is not None:
             return self.info.file_size
         elif self.children:
             child_sizes = [_.raw_size for _ in self.children if _.raw_size is not None]
@@ -70,7 +175,11 @@ class P4KItem(PathArchiveTreeItem, ContentItem):
 
     @cached_property
     def raw_time(self):
-        if self.info is not None:
+        if self._index_id is not None:
+            return self.model.p4k_index.date_time(self._index_id)
+        elif (packed_time := self.model.folder_times.get(self._path.lower())) is not None:
+            return unpack_date_time(packed_time)
+        elif self.info is not None:
             return self.info.date_time
         elif self.children:
             child_times = [_.raw_time for _ in self.children if _.raw_time is not None]
@@ -78,6 +187,26 @@ class P4KItem(PathArchiveTreeItem, ContentItem):
                 return max(child_times)
         return None
 
+    @cached_property
+    def sort_size(self) -> int:
+        return self.raw_size or 0
+
+    @cached_property
+    def sort_time(self) -> int:
+        """`raw_time` packed into a single number, so sorting doesn't compare tuples"""
+        if self._index_id is not None:
+            return self.model.p4k_index.date_times[self._index_id]
+        elif (packed_time := self.model.folder_times.get(self._path.lower())) is not None:
+            return packed_time
+        return pack_date_time(self.raw_time) if self.raw_time is not None else -1
+
+    def sort_key(self, column):
+        if column == 1:
+            return self.sort_size
+        elif column == 3:
+            return self.sort_time
+        return super().sort_key(column)
+
     @cached_property
     def size(self):
         if os.environ.get("STARFAB_QUICK"):
@@ -131,19 +260,108 @@ class P4KItem(PathArchiveTreeItem, ContentItem):
 
 
 class P4KModelLoader(PathArchiveTreeModelLoader):
+    def _load_index(self):
+        """Load the stored index for the p4k if it is still valid, otherwise scan the archive and (re)build it.
+        Returns the index and whether it has to be saved.
+
+        When the stored index is from a previous build of the same p4k (i.e. after a patch), it is diffed against the
+        archive's central directory and the contents of every sub-archive that didn't change are reused from it, so
+        only the sub-archives touched by the patch have to be expanded again."""
+        sc = self.model._sc_manager.sc
+        use_cache = settings.snapshot.value("cache/p4k_index")
+        key = index_key_for(sc)
+
+        previous = None
+        if use_cache:
+            index_file = index_path_for(sc)
+            if (previous := P4KIndex.load(index_file)) is not None and previous.key == key:
+                logger.debug(f"Using stored p4k index {index_file}")
+                return previous, False
+
+        index = P4KIndex.from_archive(self.model.archive, key)
+        if previous is not None:
+            self.model.p4k_delta = delta = index.diff(previous)
+            reused = index.reuse_subarchive_contents(previous, delta)
+            logger.info(
+                f"Updated p4k index from {previous.key.get('version_label', '')} to {key['version_label']}: "
+                f"{delta}, reused the contents of {len(reused)} unchanged sub-archives"
+            )
+        return index, use_cache
+
+    def _save_index(self, index):
+        index_file = index_path_for(self.model._sc_manager.sc)
+        try:
+            index.save(index_file)
+        except OSError as e:
+            logger.warning(f"Failed to save p4k index {index_file}: {e}")
+
     def items_to_load(self):
-        self.model.archive.expand_subarchives()
-        return self.model.archive.filelist
-
-    def load_item(self, item):
-        self._item_cls(
-            item.filename,
-            model=self.model,
-            parent=self.model.parentForPath(item.filename),
+        # compact and lazy trees are immutable once built, so they always list the sub-archives up front
+        lazy_subarchives = settings.snapshot.value("p4k/lazy_subarchives") and not (
+            self.model.compact_storage or self.model.lazy_loading
         )
+        index, save_index = self._load_index()
+        self.model.folder_sizes, self.model.folder_times = index.folder_aggregates()
+        subarchives = index.unexpanded_subarchives()
+        if subarchives and not lazy_subarchives:
+            for filename in subarchives:
+                index.add_infos(expand_subarchive(self.model.archive, filename))
+            self.model.folder_sizes, self.model.folder_times = index.folder_aggregates()
+            subarchives = {}
+            save_index = save_index or settings.snapshot.value("cache/p4k_index")
+        if save_index:
+            self._save_index(index)
+        self.model.p4k_index = index
+        self.model.subarchive_placeholders = subarchives
+        self.model.index_ready.emit()
+        return range(len(index))
+
+    def entries_for_item(self, entry_id):
+        filename = self.model.p4k_index.filenames[entry_id]
+        yield parent_path_for(filename), filename, {"index_id": entry_id}
+
+
+class SubArchiveExpander(qtc.QRunnable):
+    """Lists the contents of the sub-archives of a `P4KModel` in the background, see
+    `P4KModel.expand_subarchives_in_background`"""
+
+    def __init__(self, model, filenames):
+        super().__init__()
+        self.signals = BackgroundRunnerSignals()
+        self.starfab = get_starfab()
+        self.model = model
+        self.filenames = filenames
+        self._should_cancel = False
+        self.signals.cancel.connect(self._handle_cancel)
+        self.setAutoDelete(True)
+
+    def _handle_cancel(self):
+        self._should_cancel = True
+
+    def run(self):
+        task_name = f"expand_subarchives_{hash(self)}"
+        self.starfab.task_started.emit(task_name, "Listing sub-archives", 0, len(self.filenames))
+        t = time.time()
+        for i, filename in enumerate(self.filenames):
+            if self._should_cancel:
+                break
+            if (time.time() - t) > 0.5:
+                self.starfab.update_status_progress.emit(task_name, i, 0, len(self.filenames), "")
+                t = time.time()
+            try:
+                self.model.expand_subarchive(filename)
+            except Exception as e:
+                logger.exception(f"Failed to expand sub-archive {filename}", exc_info=e)
+                continue
+            self.signals.batch.emit(filename)
+        self.starfab.task_finished.emit(task_name, not self._should_cancel, "")
+        self.signals.finished.emit({})
 
 
 class P4KModel(ThreadLoadedPathArchiveTreeModel):
+    index_ready = qtc.Signal()  # the archive's file list is available, emitted before the tree is built
+    subarchive_expanded = qtc.Signal(str)  # the contents of a sub-archive were added to the tree
+
     def __init__(self, sc_manager):
         self._sc_manager = sc_manager
         super().__init__(
@@ -155,3 +373,144 @@ class P4KModel(ThreadLoadedPathArchiveTreeModel):
             loader_task_name="load_p4k_model",
             loader_task_status_msg="Processing Data.p4k",
         )
+        self.p4k_index = None
+        self.p4k_delta = None  # the `P4KIndexDelta` from the previous build, if the index was updated after a patch
+        self.folder_sizes = {}
+        self.folder_times = {}
+        # sub-archives that are shown as placeholder folders until they are expanded, see `P4KModelLoader`
+        self.subarchive_placeholders = {}
+        self._subarchive_pending = {}  # placeholder folder -> filenames of the sub-archives listed in it
+        self._subarchive_folders = {}
+        self._expander = None
+        # contents of the entries read ahead of being opened, see `prefetch`
+        self.prefetch_cache = P4KPrefetchCache(self._prefetch_cache_size())
+        self._prefetcher = None
+
+    def clear(self):
+        if self._expander is not None:
+            self._expander.signals.cancel.emit()
+            self._expander = None
+        self.cancel_prefetch()
+        self.prefetch_cache.clear()
+        self.p4k_index = None
+        self.p4k_delta = None
+        self.folder_sizes = {}
+        self.folder_times = {}
+        self.subarchive_placeholders = {}
+        self._subarchive_pending = {}
+        self._subarchive_folders = {}
+        super().clear()
+
+    def _loaded(self):
+        if self.subarchive_placeholders:
+            self.begin_staging()
+            builder = PathTreeBuilder(self)
+            for filename, folder_path in self.subarchive_placeholders.items():
+                folder = builder.parent_for(folder_path)
+                self._subarchive_pending.setdefault(folder, []).append(filename)
+                self._subarchive_folders[filename] = folder
+            self.insertChildren(self.take_staged(finish=True))
+            logger.debug(f"Added {len(self._subarchive_folders)} sub-archive placeholders")
+        super()._loaded()
+        if self._subarchive_folders and settings.snapshot.value("p4k/expand_subarchives_in_background"):
+            self.expand_subarchives_in_background()
+
+    def has_pending_children(self, item):
+        return item in self._subarchive_pending or super().has_pending_children(item)
+
+    def fetch_children(self, item):
+        if (filenames := self._subarchive_pending.get(item)) is not None:
+            for filename in list(filenames):
+                self._insert_subarchive(filename)
+        else:
+            super().fetch_children(item)
+
+    def expand_subarchive(self, filename):
+        """Expand the sub-archive `filename`, returning the `P4KInfo`s of its contents. Safe to call from any
+        thread, each sub-archive is only expanded once."""
+        return expand_subarchive(self.archive, filename)
+
+    def pending_subarchives(self) -> typing.List[str]:
+        """The sub-archives that are still shown as placeholders"""
+        return list(self._subarchive_folders)
+
+    @qtc.Slot(str)
+    def insert_subarchive(self, filename):
+        """Add the contents of the sub-archive `filename` to the tree if they haven't been, e.g. once it was expanded
+        in the background"""
+        self._insert_subarchive(filename)
+
+    def _insert_subarchive(self, filename):
+        """Add the contents of the sub-archive `filename` below its placeholder folder"""
+        if (folder := self._subarchive_folders.pop(filename, None)) is None:
+            return  # already inserted
+        pending = self._subarchive_pending[folder]
+        pending.remove(filename)
+        if not pending:
+            del self._subarchive_pending[folder]
+
+        infos = self.expand_subarchive(filename)
+        entry_ids = self.p4k_index.add_infos(infos)
+        self.begin_staging()
+        builder = PathTreeBuilder(self)
+        for entry_id, info in zip(entry_ids, infos):
+            parent_path = parent_path_for(info.filename)
+            self._item_cls(info.filename, model=self, parent=builder.parent_for(parent_path), index_id=entry_id)
+            if self.search_index is not None:
+                self.search_index.add(
+                    parent_path, info.filename, info.filename, columns=path_filter_columns(info.filename)
+                )
+        self.insertChildren(self.take_staged(finish=True))
+        self._add_folder_aggregates(entry_ids)
+        # the size and date of the placeholder and the folders above it now include its contents
+        item = folder
+        while item is not None:
+            item.clear_cache()
+            item = item.parent
+        self.subarchive_expanded.emit(filename)
+
+    def _add_folder_aggregates(self, entry_ids):
+        """Count the entries `entry_ids` added to the index in `folder_sizes` and `folder_times`"""
+        if not self.folder_sizes:
+            return  # without the aggregates of the rest of the index, folders are summed from their children
+        sizes, times = self.p4k_index.folder_aggregates(entry_ids)
+        for folder, size in sizes.items():
+            self.folder_sizes[folder] = self.folder_sizes.get(folder, 0) + size
+        for folder, packed_time in times.items():
+            if packed_time > self.folder_times.get(folder, -1):
+                self.folder_times[folder] = packed_time
+
+    def expand_subarchives_in_background(self):
+        """Start listing the contents of every sub-archive that hasn't been expanded yet at a low priority, adding
+        them to the tree as they're ready"""
+        if self._expander is not None or not self._subarchive_folders:
+            return
+        self._expander = SubArchiveExpander(self, list(self._subarchive_folders))
+        self._expander.signals.batch.connect(self.insert_subarchive)
+        self._expander.signals.finished.connect(self._handle_expander_finished)
+        qtc.QThreadPool.globalInstance().start(self._expander, -1)
+
+    @staticmethod
+    def _prefetch_cache_size():
+        return settings.snapshot.value("p4k/prefetch_cache_size") * 1024 * 1024
+
+    def prefetch(self, item):
+        """Read the contents of `item` into `prefetch_cache` at a low priority, so opening it doesn't have to wait for
+        the read, decompression and conversion. Cancels the previous prefetch, if it's still running."""
+        self.cancel_prefetch()
+        if not settings.snapshot.value("p4k/prefetch") or item is None or getattr(item, "_index_id", None) is None:
+            return  # folders and sub-archive placeholders have no contents
+        self.prefetch_cache.resize(self._prefetch_cache_size())
+        if item._path in self.prefetch_cache or (item.raw_size or 0) > self.prefetch_cache.max_bytes:
+            return
+        self._prefetcher = P4KPrefetcher(item, self.prefetch_cache)
+        qtc.QThreadPool.globalInstance().start(self._prefetcher, -2)
+
+    def cancel_prefetch(self):
+        if self._prefetcher is not None:
+            self._prefetcher.signals.cancel.emit()
+            self._prefetcher = None
+
+    @qtc.Slot(dict)
+    def _handle_expander_finished(self, result):
+        self._expander = None
@@ -0,0 +1,252 @@
+import fnmatch
+import os
+import re
+import time
+import typing
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from scdatatools.engine.cryxml import pprint_xml_tree, etree_from_cryxml_file, is_cryxmlb_file
+from starfab import get_starfab
+from starfab.gui import qtc
+from starfab.log import getLogger
+from starfab.models.common import BackgroundRunnerSignals
+from starfab.models.p4k_index import resolve_info
+from starfab.settings import settings
+
+logger = getLogger(__name__)
+
+ContentGrepHit = namedtuple("ContentGrepHit", ["path", "line_number", "line"])
+# hits past this are not reported for a single entry
+MAX_HITS_PER_ENTRY = 100
+# matched lines are truncated to this many characters
+MAX_LINE_LENGTH = 300
+# entries queued per worker thread, the rest are only submitted as the queued ones complete
+ENTRIES_PER_WORKER = 8
+# the files that could not be searched are only listed up to this many
+MAX_REPORTED_FAILURES = 50
+
+
+class GrepFileFilter:
+    """A `;` or `,` separated list of extensions (`.mtl`) or glob patterns (`*.xml`, `Data/Libs/*.xml`), case
+    insensitive. An empty filter matches everything."""
+
+    def __init__(self, file_filter: str):
+        self.extensions = set()
+        self._prefixes = []  # the literal start of each glob, to tell which folders it can match in
+        globs = []
+        for pattern in (_.strip().lower() for _ in re.split(r"[;,]", file_filter or "") if _.strip()):
+            if pattern.startswith("*.") and not any(_ in pattern[1:] for _ in "*?[/"):
+                pattern = pattern[1:]
+            if pattern.startswith(".") and not any(_ in pattern for _ in "*?[/"):
+                self.extensions.add(pattern)
+            else:
+                globs.append(fnmatch.translate(pattern))
+                self._prefixes.append(re.split(r"[*?\[]", pattern, maxsplit=1)[0])
+        self.match_all = not self.extensions and not globs
+        self._match = re.compile("|".join(globs)).match if globs else None
+
+    def globs_match(self, filename) -> bool:
+        return self._match is not None and self._match(filename.lower()) is not None
+
+    def matches(self, filename) -> bool:
+        return (
+            self.match_all
+            or os.path.splitext(filename.rsplit("/", maxsplit=1)[-1])[1].lower() in self.extensions
+            or self.globs_match(filename)
+        )
+
+    def may_match_below(self, folder_path) -> bool:
+        """If the filter can match entries below `folder_path`, e.g. the contents of a sub-archive"""
+        if self.match_all or self.extensions:
+            return True
+        folder = f"{folder_path.lower()}/"
+        return any(folder.startswith(_) or _.startswith(folder) for _ in self._prefixes)
+
+
+def grep_candidates(p4k_index, file_filter: str) -> typing.List[int]:
+    """The ids of the entries in `p4k_index` matching `file_filter`, see `GrepFileFilter`"""
+    file_filter = GrepFileFilter(file_filter)
+    if file_filter.match_all:
+        return list(range(len(p4k_index)))
+    ids = set()
+    for extension in file_filter.extensions:
+        ids.update(p4k_index.ids_for_extension(extension))  # answered from the extension index
+    if file_filter._match is not None:
+        ids.update(i for i, filename in enumerate(p4k_index.filenames) if file_filter.globs_match(filename))
+    return sorted(ids)
+
+
+def grep_subarchives(subarchives: typing.Iterable[str], file_filter: str) -> typing.List[str]:
+    """The sub-archives in `subarchives` whose contents `file_filter` can match"""
+    file_filter = GrepFileFilter(file_filter)
+    return [_ for _ in subarchives if file_filter.may_match_below(_.rsplit(".", maxsplit=1)[0])]
+
+
+def grep_buffer(data: bytes, pattern: re.Pattern) -> typing.List[typing.Tuple[int, str]]:
+    """`(line number, line)` for each line of `data` matching the bytes `pattern`, one hit per line"""
+    hits = []
+    line_number = 1
+    line_start = 0
+    last_line_end = -1
+    for m in pattern.finditer(data):
+        if m.start() < last_line_end:
+            continue  # already reported this line
+        line_number += data.count(b"\n", line_start, m.start())
+        line_start = data.rfind(b"\n", 0, m.start()) + 1
+        if (last_line_end := data.find(b"\n", m.start())) < 0:
+            last_line_end = len(data)
+        line = data[line_start:min(last_line_end, line_start + MAX_LINE_LENGTH)]
+        hits.append((line_number, line.decode("utf-8", errors="replace").strip()))
+        if len(hits) >= MAX_HITS_PER_ENTRY:
+            break
+    return hits
+
+
+def compile_grep_pattern(text: str, regex=False, case_sensitive=False) -> re.Pattern:
+    pattern = text.encode("utf-8") if regex else re.escape(text.encode("utf-8"))
+    return re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+
+
+class P4KContentGrepSignals(BackgroundRunnerSignals):
+    subarchive_expanded = qtc.Signal(str)  # the contents of a sub-archive were listed so they could be searched
+
+
+class P4KContentGrep(qtc.QRunnable):
+    """Searches the contents of p4k entries for a pattern.
+
+    The `subarchives` that haven't been expanded yet are listed first and their contents matching `file_filter` are
+    searched as well. Entries are read, decompressed (and optionally converted from CryXmlB) and scanned by a pool of
+    worker threads, each reading through its own handle from the `StarCitizenManager`'s reader pool. Entries are fed
+    to the workers a few at a time rather than all queued up front, so cancelling is quick. Hits are emitted in
+    batches from `signals.batch` as lists of `ContentGrepHit`s while the search is running, progress is reported
+    through the task status bar. `signals.finished` reports the number of hits and the files that could not be read.
+    """
+
+    def __init__(
+        self,
+        sc_manager,
+        filenames: typing.List[str],
+        pattern: re.Pattern,
+        convert_cryxml=False,
+        workers: int = None,
+        subarchives: typing.List[str] = None,
+        file_filter: str = "",
+    ):
+        super().__init__()
+        self.signals = P4KContentGrepSignals()
+        self.starfab = get_starfab()
+        self.sc_manager = sc_manager
+        self.filenames = list(filenames)
+        self.pattern = pattern
+        self.convert_cryxml = convert_cryxml
+        self.workers = workers or settings.snapshot.value("p4k/reader_handles")
+        self.subarchives = subarchives or []
+        self.file_filter = file_filter
+        self.failed: typing.List[typing.Tuple[str, str]] = []  # (filename, error)
+        self._failed_count = 0
+        self._should_cancel = False
+        self.signals.cancel.connect(self._handle_cancel)
+        self.setAutoDelete(True)
+
+    def _handle_cancel(self):
+        self._should_cancel = True
+
+    def _failed(self, filename, error):
+        self._failed_count += 1
+        if len(self.failed) < MAX_REPORTED_FAILURES:
+            self.failed.append((filename, error))
+
+    def _grep_entry(self, filename):
+        """`(hits, error)` for the entry `filename`"""
+        if self._should_cancel:
+            return [], None
+        try:
+            if (info := resolve_info(self.sc_manager.p4k_model.archive, filename)) is None:
+                return [], "not found"
+            with self.sc_manager.p4k_reader() as p4k, p4k.open(info) as f:
+                if self.convert_cryxml and is_cryxmlb_file(f):
+                    data = pprint_xml_tree(etree_from_cryxml_file(f)).encode("utf-8")
+                else:
+                    data = f.read()
+        except Exception as e:
+            logger.debug(f"Failed to search {filename}: {e}")
+            return [], str(e) or e.__class__.__name__
+        return [ContentGrepHit(filename, n, line) for n, line in grep_buffer(data, self.pattern)], None
+
+    def _expand_subarchives(self, task_name):
+        """List the contents of `subarchives`, adding the ones matching `file_filter` to the entries to search"""
+        file_filter = GrepFileFilter(self.file_filter)
+        t = time.time()
+        for i, filename in enumerate(self.subarchives):
+            if self._should_cancel:
+                return
+            if (time.time() - t) > 0.25:
+                self.starfab.update_status_progress.emit(
+                    task_name, i, 0, len(self.subarchives), f"Listing {len(self.subarchives)} sub-archives"
+                )
+                t = time.time()
+            try:
+                infos = self.sc_manager.p4k_model.expand_subarchive(filename)
+            except Exception as e:
+                logger.exception(f"Failed to expand sub-archive {filename}", exc_info=e)
+                self._failed(filename, str(e) or e.__class__.__name__)
+                continue
+            self.signals.subarchive_expanded.emit(filename)
+            self.filenames.extend(_.filename for _ in infos if file_filter.matches(_.filename))
+
+    def run(self):
+        task_name = f"content_grep_{hash(self)}"
+        if self.subarchives:
+            self.starfab.task_started.emit(
+                task_name, f"Listing {len(self.subarchives)} sub-archives", 0, len(self.subarchives)
+            )
+            self._expand_subarchives(task_name)
+
+        total = len(self.filenames)
+        self.starfab.task_started.emit(task_name, f"Searching {total} files", 0, total)
+        pending = []
+        hit_count = 0
+        completed = 0
+        t = time.time()
+        workers = max(1, self.workers)
+        filenames = iter(self.filenames)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            in_flight = set()
+            while True:
+                while not self._should_cancel and len(in_flight) < workers * ENTRIES_PER_WORKER:
+                    if (filename := next(filenames, None)) is None:
+                        break
+                    future = executor.submit(self._grep_entry, filename)
+                    future.filename = filename
+                    in_flight.add(future)
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    completed += 1
+                    hits, error = future.result()
+                    if error is not None:
+                        self._failed(future.filename, error)
+                    pending.extend(hits)
+                if (time.time() - t) > 0.25:
+                    self.starfab.update_status_progress.emit(
+                        task_name, completed, 0, total, f"Searching {total} files, {hit_count + len(pending)} hits"
+                    )
+                    if pending:
+                        hit_count += len(pending)
+                        self.signals.batch.emit(pending)
+                        pending = []
+                    t = time.time()
+        if pending:
+            hit_count += len(pending)
+            self.signals.batch.emit(pending)
+        if self._failed_count:
+            logger.warning(f"Content search could not read {self._failed_count} of {total} files")
+        self.starfab.task_finished.emit(task_name, not self._should_cancel, "")
+        self.signals.finished.emit({
+            "hits": hit_count,
+            "cancelled": self._should_cancel,
+            "failed": self.failed,
+            "failed_count": self._failed_count,
+        })
@@ -0,0 +1,432 @@
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+import typing
+import zlib
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+from scdatatools.p4k import P4KFile, SUB_ARCHIVES
+from starfab.log import getLogger
+from starfab.models.lazy import resolve_folder_path
+from starfab.settings import get_cache_dir
+
+logger = getLogger(__name__)
+
+P4K_INDEX_MAGIC = b"SFP4KIDX"
+P4K_INDEX_VERSION = 1
+P4K_INDEX_FILENAME = "p4k.index"
+
+_subarchive_locks_lock = threading.Lock()
+
+
+def pack_date_time(date_time) -> int:
+    """Pack a zip style `date_time` tuple into a single 32-bit DOS timestamp"""
+    year, month, day, hour, minute, second = date_time
+    return (
+        ((year - 1980) & 0x7F) << 25
+        | (month & 0xF) << 21
+        | (day & 0x1F) << 16
+        | (hour & 0x1F) << 11
+        | (minute & 0x3F) << 5
+        | (second // 2) & 0x1F
+    )
+
+
+def unpack_date_time(packed: int) -> tuple:
+    """Inverse of :func:`pack_date_time`"""
+    return (
+        (packed >> 25) + 1980,
+        (packed >> 21) & 0xF,
+        (packed >> 16) & 0x1F,
+        (packed >> 11) & 0x1F,
+        (packed >> 5) & 0x3F,
+        (packed & 0x1F) * 2,
+    )
+
+
+def index_key_for(sc) -> dict:
+    """The key used to determine if a stored index is still valid for the `StarCitizen` `sc`"""
+    p4k_file = Path(sc.p4k_file).absolute()
+    stat = p4k_file.stat()
+    return {
+        "p4k": p4k_file.as_posix(),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "version_label": sc.version_label or "",
+    }
+
+
+def index_path_for(sc) -> Path:
+    """Location of the stored index for the `StarCitizen` `sc`. Each p4k gets its own file so that LIVE and PTU
+    indexes do not evict one another."""
+    p4k_hash = hashlib.sha1(Path(sc.p4k_file).absolute().as_posix().encode("utf-8")).hexdigest()[:16]
+    return get_cache_dir("p4k", p4k_hash) / P4K_INDEX_FILENAME
+
+
+def subarchive_for_path(archive: P4KFile, path: str) -> typing.Optional[str]:
+    """Returns the filename of the sub-archive within `archive` that contains `path`, or None if `path` does not
+    live inside of a sub-archive"""
+    lookup = getattr(archive, "_starfab_subarchive_lookup", None)
+    if lookup is None:
+        lookup = {}
+        for filename in archive.subarchives:
+            base, ext = filename.rsplit(".", maxsplit=1)
+            if ext.casefold() in SUB_ARCHIVES:
+                lookup[base.casefold()] = filename
+        archive._starfab_subarchive_lookup = lookup
+
+    parts = path.casefold().split("/")
+    for i in range(len(parts) - 1, 0, -1):
+        if (filename := lookup.get("/".join(parts[:i]))) is not None:
+            return filename
+    return None
+
+
+def subarchive_lock(archive: P4KFile) -> threading.RLock:
+    """The lock every thread holds while expanding one of the sub-archives of `archive`. Expanding a sub-archive marks
+    it as expanded before its contents are added to the archive's file list, so it must not be looked at meanwhile."""
+    if (lock := getattr(archive, "_starfab_subarchive_lock", None)) is None:
+        with _subarchive_locks_lock:
+            if (lock := getattr(archive, "_starfab_subarchive_lock", None)) is None:
+                lock = archive._starfab_subarchive_lock = threading.RLock()
+    return lock
+
+
+def expand_subarchive(archive: P4KFile, filename: str) -> typing.List:
+    """Expand the sub-archive `filename` of `archive` if it hasn't been already, returning the `P4KInfo`s of its
+    contents. Safe to call from any thread."""
+    with subarchive_lock(archive):
+        if archive.subarchives.get(filename) is None:
+            # scdatatools can only expand every sub-archive at once publicly
+            archive._expand_subarchive(filename)
+        return list(archive.NameToInfo[filename].filelist)
+
+
+def resolve_info(archive: P4KFile, path: str):
+    """Lookup the `P4KInfo` for `path`, expanding the sub-archive that contains it if it hasn't been already"""
+    if (info := archive.NameToInfo.get(path)) is not None:
+        return info
+    if (subarchive := subarchive_for_path(archive, path)) is not None:
+        logger.debug(f"Resolving {path} from sub-archive {subarchive}")
+        expand_subarchive(archive, subarchive)
+        return archive.NameToInfo.get(path)
+    return None
+
+
+def _extension(filename) -> str:
+    return os.path.splitext(filename.rsplit("/", maxsplit=1)[-1])[1].lower()
+
+
+def is_subarchive(filename) -> bool:
+    """If `filename` is one of the `subarchives` of a `P4KFile`, which takes everything after the first "." of the
+    path as the extension"""
+    return "." in filename and filename.split(".", maxsplit=1)[1].casefold() in SUB_ARCHIVES
+
+
+def _containing_subarchive(subarchives: typing.Dict[str, str], filename) -> typing.Optional[str]:
+    """The filename of the sub-archive in `subarchives` (keyed by their lower-cased path without the extension) that
+    `filename` was listed from, if any"""
+    parts = filename.casefold().split("/")
+    for i in range(len(parts) - 1, 0, -1):
+        if (subarchive := subarchives.get("/".join(parts[:i]))) is not None:
+            return subarchive
+    return None
+
+
+def parent_path_for(filename) -> str:
+    """The path of the folder containing `filename`, `""` for top level entries"""
+    return filename.rsplit("/", maxsplit=1)[0] if "/" in filename else ""
+
+
+class P4KIndexDelta:
+    """The differences between two `P4KIndex`es of the same p4k from different builds, entries are matched by name
+    and compared by CRC and size. `added` and `changed` are entry ids in the new index, `removed` are filenames from
+    the previous one. The contents of sub-archives that didn't change are not `removed`, even if they haven't been
+    listed in the new index yet (see `P4KIndex.reuse_subarchive_contents`)."""
+
+    def __init__(self, added: typing.List[int], changed: typing.List[int], removed: typing.List[str]):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+
+    def __len__(self):
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+    def __repr__(self):
+        return f"<P4KIndexDelta added:{len(self.added)} changed:{len(self.changed)} removed:{len(self.removed)}>"
+
+
+class P4KIndex:
+    """A compact, column oriented listing of every entry in a Data.p4k (and of the sub-archives that were expanded)
+    that can be persisted to disk and used to rebuild the `P4KModel` without re-scanning the archive.
+
+    Entries are stored as parallel arrays, `filenames[i]`, `file_sizes[i]`, etc. all describe the same entry.
+    """
+
+    def __init__(self, key: dict = None):
+        self.key = key or {}
+        self.filenames: typing.List[str] = []
+        self.file_sizes = array("Q")
+        self.compress_sizes = array("Q")
+        self.date_times = array("I")
+        self.crcs = array("I")
+        self._ids_by_name = None
+        # secondary indexes, built the first time they're used
+        self._ids_by_extension: typing.Optional[typing.Dict[str, array]] = None
+        self._sorted_names: typing.Optional[typing.List[str]] = None
+        self._sorted_ids: typing.Optional[array] = None
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def __repr__(self):
+        return f'<P4KIndex {self.key.get("version_label", "")} entries:{len(self)}>'
+
+    def add(self, filename, file_size, compress_size, date_time, crc):
+        self.filenames.append(filename)
+        self.file_sizes.append(file_size)
+        self.compress_sizes.append(compress_size)
+        self.date_times.append(pack_date_time(date_time))
+        self.crcs.append(crc & 0xFFFFFFFF)
+        entry_id = len(self.filenames) - 1
+        if self._ids_by_name is not None:
+            self._ids_by_name[filename] = entry_id
+        if self._ids_by_extension is not None:
+            self._ids_by_extension.setdefault(_extension(filename), array("I")).append(entry_id)
+        self._sorted_names = self._sorted_ids = None
+
+    def id_for_name(self, filename) -> typing.Optional[int]:
+        if self._ids_by_name is None:
+            self._ids_by_name = {name: i for i, name in enumerate(self.filenames)}
+        return self._ids_by_name.get(filename)
+
+    def ids_for_extension(self, extension) -> array:
+        """Ids of the entries with the (last) file extension `extension`, e.g. `.socpak`"""
+        if self._ids_by_extension is None:
+            ids_by_extension = {}
+            for entry_id, filename in enumerate(self.filenames):
+                ids_by_extension.setdefault(_extension(filename), array("I")).append(entry_id)
+            self._ids_by_extension = ids_by_extension
+        return self._ids_by_extension.get(extension.lower(), array("I"))
+
+    def ids_with_prefix(self, prefix) -> array:
+        """Ids of the entries whose (case insensitive) path starts with `prefix`"""
+        if self._sorted_names is None:
+            order = sorted(range(len(self.filenames)), key=lambda _: self.filenames[_].lower())
+            self._sorted_ids = array("I", order)
+            self._sorted_names = [self.filenames[_].lower() for _ in order]
+        prefix = prefix.lower()
+        if not prefix:
+            return self._sorted_ids[:]
+        start = bisect_left(self._sorted_names, prefix)
+        end = bisect_left(self._sorted_names, prefix[:-1] + chr(ord(prefix[-1]) + 1), start)
+        return self._sorted_ids[start:end]
+
+    def ids_under(self, folder_path) -> array:
+        """Ids of every entry below the folder `folder_path`"""
+        return self.ids_with_prefix(f"{folder_path}/") if folder_path else array("I", range(len(self)))
+
+    def ids_for(self, extensions=None, folder_path=None) -> typing.List[int]:
+        """Ids of the entries below `folder_path` (if given) that have one of `extensions` (if given), in order"""
+        if extensions is None:
+            return sorted(self.ids_under(folder_path))
+        ids = set()
+        for extension in extensions:
+            ids.update(self.ids_for_extension(extension))
+        if folder_path:
+            prefix = f"{folder_path.lower()}/"
+            ids = {_ for _ in ids if self.filenames[_].lower().startswith(prefix)}
+        return sorted(ids)
+
+    def date_time(self, entry_id) -> tuple:
+        return unpack_date_time(self.date_times[entry_id])
+
+    def folder_aggregates(self, entry_ids=None) -> typing.Tuple[typing.Dict[str, int], typing.Dict[str, int]]:
+        """Total size and latest (packed) date of every folder in the index, keyed by the lower-cased folder path the
+        `P4KModel` uses for it (`""` is the root). Computed with a single pass over the entries followed by a
+        deepest-first pass over the folders, rather than recursing through the item tree. Only the entries
+        `entry_ids` are counted, if given."""
+        sizes = {}
+        times = {}
+        if entry_ids is None:
+            entries = zip(self.filenames, self.file_sizes, self.date_times)
+        else:
+            entries = ((self.filenames[_], self.file_sizes[_], self.date_times[_]) for _ in entry_ids)
+        for filename, size, packed_time in entries:
+            folder = resolve_folder_path(parent_path_for(filename)).lower()
+            sizes[folder] = sizes.get(folder, 0) + size
+            if packed_time > times.get(folder, -1):
+                times[folder] = packed_time
+
+        # folders containing only sub-folders have no entries of their own
+        for folder in list(sizes):
+            while folder:
+                folder = folder.rsplit("/", maxsplit=1)[0] if "/" in folder else ""
+                if folder in sizes:
+                    break
+                sizes[folder] = 0
+
+        for folder in sorted(sizes, key=lambda _: _.count("/") if _ else -1, reverse=True):
+            if not folder:
+                continue
+            parent = folder.rsplit("/", maxsplit=1)[0] if "/" in folder else ""
+            sizes[parent] += sizes[folder]
+            if times.get(folder, -1) > times.get(parent, -1):
+                times[parent] = times[folder]
+        return sizes, times
+
+    def unexpanded_subarchives(self) -> typing.Dict[str, str]:
+        """The sub-archives in the index whose contents are not, as `{filename: folder_path}`. A sub-archive's contents
+        are listed below its path without the extension, `folder_path` is the folder they are added to following the
+        same rules as the rest of the tree."""
+        subarchives = {}
+        for entry_id in self.ids_for(extensions=[f".{_}" for _ in SUB_ARCHIVES]):
+            if not is_subarchive(filename := self.filenames[entry_id]):
+                continue
+            base = filename.rsplit(".", maxsplit=1)[0]
+            if not self.ids_with_prefix(f"{base}/"):
+                subarchives[filename] = resolve_folder_path(base)
+        return subarchives
+
+    def add_infos(self, infos) -> range:
+        """Add `P4KInfo`s to the index, returning the range of their entry ids"""
+        start = len(self)
+        for info in infos:
+            self.add(info.filename, info.file_size, info.compress_size, info.date_time, getattr(info, "CRC", 0))
+        return range(start, len(self))
+
+    def _signature(self, entry_id) -> tuple:
+        return self.crcs[entry_id], self.file_sizes[entry_id], self.compress_sizes[entry_id]
+
+    def diff(self, previous: "P4KIndex") -> P4KIndexDelta:
+        """Compare the index against the index of a `previous` build"""
+        added = []
+        changed = []
+        for entry_id, filename in enumerate(self.filenames):
+            if (previous_id := previous.id_for_name(filename)) is None:
+                added.append(entry_id)
+            elif previous._signature(previous_id) != self._signature(entry_id):
+                changed.append(entry_id)
+        unchanged = self._unchanged_subarchives(added, changed)
+        names = set(self.filenames)
+        removed = [
+            _ for _ in previous.filenames if _ not in names and _containing_subarchive(unchanged, _) is None
+        ]
+        return P4KIndexDelta(added, changed, removed)
+
+    def _unchanged_subarchives(self, added, changed) -> typing.Dict[str, str]:
+        """`{lower-cased path without the extension: filename}` of the sub-archives that are neither `added` nor
+        `changed`"""
+        changed = {self.filenames[_] for _ in added}.union(self.filenames[_] for _ in changed)
+        return {
+            filename.rsplit(".", maxsplit=1)[0].casefold(): filename
+            for filename in self.filenames
+            if is_subarchive(filename) and filename not in changed
+        }
+
+    def reuse_subarchive_contents(self, previous: "P4KIndex", delta: P4KIndexDelta) -> typing.List[str]:
+        """Copy the contents of every sub-archive that is unchanged since the `previous` build from its index, so
+        they don't have to be expanded again. Returns the filenames of the sub-archives that were reused."""
+        unchanged = self._unchanged_subarchives(delta.added, delta.changed)
+        if not unchanged:
+            return []
+
+        # sub-archive contents are never top level entries, so they're among the names that aren't in this index
+        names = set(self.filenames)
+        reused = set()
+        for entry_id, filename in enumerate(previous.filenames):
+            if filename in names or (subarchive := _containing_subarchive(unchanged, filename)) is None:
+                continue
+            self.filenames.append(filename)
+            self.file_sizes.append(previous.file_sizes[entry_id])
+            self.compress_sizes.append(previous.compress_sizes[entry_id])
+            self.date_times.append(previous.date_times[entry_id])
+            self.crcs.append(previous.crcs[entry_id])
+            reused.add(subarchive)
+        self._ids_by_name = self._ids_by_extension = self._sorted_names = self._sorted_ids = None
+        return sorted(reused)
+
+    @classmethod
+    def from_archive(cls, archive: P4KFile, key: dict = None) -> "P4KIndex":
+        """Build an index from the `filelist` of `archive`, only sub-archives that have been expanded are included"""
+        index = cls(key)
+        index.add_infos(archive.filelist)
+        return index
+
+    def save(self, filename: typing.Union[str, Path]):
+        filename = Path(filename)
+        filename.parent.mkdir(parents=True, exist_ok=True)
+
+        payload = io.BytesIO()
+        names = "\n".join(self.filenames).encode("utf-8")
+        for buf in (names, self.file_sizes.tobytes(), self.compress_sizes.tobytes(),
+                    self.date_times.tobytes(), self.crcs.tobytes()):
+            payload.write(struct.pack("<Q", len(buf)))
+            payload.write(buf)
+
+        key = json.dumps(self.key, sort_keys=True).encode("utf-8")
+        tmp = filename.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            f.write(P4K_INDEX_MAGIC)
+            f.write(struct.pack("<III", P4K_INDEX_VERSION, len(key), len(self)))
+            f.write(key)
+            f.write(zlib.compress(payload.getvalue(), 1))
+        tmp.replace(filename)
+        logger.debug(f"Saved {self} to {filename}")
+
+    @classmethod
+    def load(cls, filename: typing.Union[str, Path], key: dict = None) -> typing.Optional["P4KIndex"]:
+        """Load a stored index from `filename`. If `key` is provided and does not match the key stored in the index,
+        or the index is from a different version of StarFab, `None` is returned. Without a `key` the index of a
+        previous build is returned as is, see `diff`."""
+        filename = Path(filename)
+        if not filename.is_file():
+            return None
+
+        try:
+            with filename.open("rb") as f:
+                if f.read(len(P4K_INDEX_MAGIC)) != P4K_INDEX_MAGIC:
+                    return None
+                version, key_len, count = struct.unpack("<III", f.read(12))
+                if version != P4K_INDEX_VERSION:
+                    logger.debug(f"Ignoring p4k index {filename}, version {version} != {P4K_INDEX_VERSION}")
+                    return None
+                stored_key = json.loads(f.read(key_len).decode("utf-8"))
+                if key is not None and stored_key != key:
+                    logger.debug(f"Ignoring stale p4k index {filename}")
+                    return None
+                payload = memoryview(zlib.decompress(f.read()))
+        except (OSError, ValueError, struct.error, zlib.error) as e:
+            logger.warning(f"Failed to read p4k index {filename}: {e}")
+            return None
+
+        def _next_buf():
+            nonlocal payload
+            (length,) = struct.unpack_from("<Q", payload)
+            buf, payload = payload[8 : 8 + length], payload[8 + length :]
+            if len(buf) != length:
+                raise ValueError("truncated payload")
+            return buf
+
+        index = cls(stored_key)
+        try:
+            names = bytes(_next_buf()).decode("utf-8")
+            index.filenames = names.split("\n") if count else []
+            index.file_sizes.frombytes(_next_buf())
+            index.compress_sizes.frombytes(_next_buf())
+            index.date_times.frombytes(_next_buf())
+            index.crcs.frombytes(_next_buf())
+        except (ValueError, struct.error) as e:
+            logger.warning(f"Ignoring corrupt p4k index {filename}: {e}")
+            return None
+
+        columns = (index.filenames, index.file_sizes, index.compress_sizes, index.date_times, index.crcs)
+        if any(len(_) != count for _ in columns):
+            logger.warning(f"Ignoring corrupt p4k index {filename}")
+            return None
+        return index
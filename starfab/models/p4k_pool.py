@@ -0,0 +1,156 @@
+import threading
+import typing
+from contextlib import contextmanager
+
+from scdatatools.p4k import P4KFile, P4KInfo, SUB_ARCHIVES
+from starfab.log import getLogger
+
+logger = getLogger(__name__)
+
+
+class P4KReaderHandle(P4KFile):
+    """A `P4KFile` sharing the already parsed central directory of `archive`, but reading through its own file object
+    (and so its own file position and decompressors).
+
+    The sub-archives `archive` has expanded read through `archive`'s file, so the entries inside of them are opened
+    through a copy of the sub-archive that the handle opens itself the first time one of its entries is read. A handle
+    is meant to be used by one thread at a time, e.g. checked out of a `P4KReaderPool`.
+    """
+
+    def __init__(self, archive: P4KFile):
+        # set before anything can fail, `ZipFile.__del__` closes half built handles as well
+        self._own_fp = None
+        self._handle_subarchives = {}  # the shared archive's sub-archives -> this handle's copy of them
+        fp = open(archive.filename, "rb")
+        # not calling `P4KFile.__init__`, that would read the central directory again. The shared archive's file is
+        # never copied, so closing the handle can't close it
+        self.__dict__.update(
+            {k: v for k, v in archive.__dict__.items() if k not in ("fp", "_own_fp", "_handle_subarchives")}
+        )
+        self.fp = self._own_fp = fp
+        self._fileRefCnt = 1
+        self._lock = threading.RLock()
+        self.shared_archive = archive
+        self._subarchive_names = {}  # the shared archive's sub-archives -> their filename
+
+    def __repr__(self):
+        return f"<P4KReaderHandle {self.filename}>"
+
+    def _subarchive_for(self, subarchive):
+        if (own := self._handle_subarchives.get(subarchive)) is None:
+            if subarchive not in self._subarchive_names:
+                # sub-archives are expanded as they're needed, pick up the ones expanded since the last time
+                self._subarchive_names = {
+                    _: filename for filename, _ in list(self.shared_archive.subarchives.items()) if _ is not None
+                }
+            filename = self._subarchive_names[subarchive]
+            own = SUB_ARCHIVES[filename.split(".", maxsplit=1)[-1]](self.open(self.NameToInfo[filename]))
+            self._handle_subarchives[subarchive] = own
+        return own
+
+    def open(self, name, mode="r", *args, **kwargs):
+        info = name if isinstance(name, P4KInfo) or mode.strip("b") != "r" else self.getinfo(name)
+        if isinstance(info, P4KInfo) and info.subinfo is not None:
+            return self._subarchive_for(info.archive).open(info.subinfo, mode, *args, **kwargs)
+        return super().open(info, mode, *args, **kwargs)
+
+    def close(self):
+        """Closes the file (and sub-archives) this handle opened, never the shared archive's"""
+        for subarchive in self._handle_subarchives.values():
+            subarchive.close()
+        self._handle_subarchives = {}
+        if self._own_fp is not None:
+            self._own_fp.close()
+
+
+class P4KReaderPool:
+    """A pool of independent reader handles for a `P4KFile`.
+
+    Every read through the shared `sc.p4k` goes through the same file object, so concurrent readers (previews,
+    exports, loaders) take turns seeking it. Each handle checked out of the pool is a `P4KReaderHandle` with its own
+    file object, including for the entries of sub-archives. At most `size` handles are opened, when all of them are in
+    use `reader()` waits for one to be returned. Long running readers (e.g. exports) should use a `dedicated_reader()`
+    instead, so they don't hold on to one of the pool's handles.
+
+        with pool.open("Data/Libs/Foundry/Records/foo.xml") as f:
+            data = f.read()
+
+        with pool.reader() as p4k:
+            p4k.extractall(...)
+    """
+
+    def __init__(self, archive: P4KFile, size: int = 4):
+        self.archive = archive
+        self.size = max(1, size)
+        self._free: typing.List[P4KReaderHandle] = []
+        self._handles: typing.List[P4KReaderHandle] = []
+        self._available = threading.Condition()
+        self._closed = False
+
+    def __repr__(self):
+        return f"<P4KReaderPool {self.archive.filename} handles:{len(self._handles)}/{self.size}>"
+
+    def _new_handle(self) -> P4KFile:
+        try:
+            return P4KReaderHandle(self.archive)
+        except OSError as e:
+            # the shared archive is safe to use from any thread, it just serializes the reads
+            logger.warning(f"Failed to open a p4k reader handle, using the shared archive: {e}")
+            return self.archive
+
+    def _checkout(self) -> P4KFile:
+        with self._available:
+            while True:
+                if self._closed:
+                    raise ValueError(f"{self} is closed")
+                if self._free:
+                    return self._free.pop()
+                if len(self._handles) < self.size:
+                    if (handle := self._new_handle()) is not self.archive:
+                        self._handles.append(handle)
+                    return handle
+                self._available.wait()
+
+    def _checkin(self, handle: P4KFile):
+        if handle is self.archive:
+            return
+        with self._available:
+            if self._closed:
+                handle.close()
+            else:
+                self._free.append(handle)
+            self._available.notify()
+
+    @contextmanager
+    def reader(self) -> typing.Iterator[P4KFile]:
+        """Check out a reader handle for the duration of the `with` block"""
+        handle = self._checkout()
+        try:
+            yield handle
+        finally:
+            self._checkin(handle)
+
+    @contextmanager
+    def dedicated_reader(self) -> typing.Iterator[P4KFile]:
+        """A reader handle of its own for the duration of the `with` block, that doesn't count against `size`"""
+        handle = self._new_handle()
+        try:
+            yield handle
+        finally:
+            if handle is not self.archive:
+                handle.close()
+
+    @contextmanager
+    def open(self, name, *args, **kwargs) -> typing.Iterator[typing.BinaryIO]:
+        """Open `name` (a path or `P4KInfo`) with a reader handle, the handle is returned when the file is closed"""
+        with self.reader() as handle:
+            with handle.open(name, *args, **kwargs) as f:
+                yield f
+
+    def close(self):
+        with self._available:
+            self._closed = True
+            for handle in self._free:
+                handle.close()
+            self._free = []
+            self._available.notify_all()
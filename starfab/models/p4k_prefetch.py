@@ -0,0 +1,44 @@
+from starfab.gui import qtc
+from starfab.log import getLogger
+from starfab.models.common import BackgroundRunnerSignals
+from starfab.models.lru import BytesLRUCache
+
+logger = getLogger(__name__)
+# size of the reads a `P4KPrefetcher` checks for cancellation between
+PREFETCH_CHUNK_SIZE = 256 * 1024
+
+
+class P4KPrefetchCache(BytesLRUCache):
+    """The (decompressed and converted) contents of p4k entries read ahead of being opened, keyed by their path in
+    the archive"""
+
+
+class P4KPrefetcher(qtc.QRunnable):
+    """Reads the contents of a `P4KItem` into a `P4KPrefetchCache` ahead of it being opened, see
+    `P4KModel.prefetch`. Cancelling it stops the read at the next chunk."""
+
+    def __init__(self, item, cache: P4KPrefetchCache):
+        super().__init__()
+        self.signals = BackgroundRunnerSignals()
+        self.item = item
+        self.cache = cache
+        self._should_cancel = False
+        self.signals.cancel.connect(self._handle_cancel)
+        self.setAutoDelete(True)
+
+    def _handle_cancel(self):
+        self._should_cancel = True
+
+    def run(self):
+        if self._should_cancel:
+            return
+        chunks = []
+        try:
+            with self.item.open() as f:
+                while not self._should_cancel and (chunk := f.read(PREFETCH_CHUNK_SIZE)):
+                    chunks.append(chunk)
+        except Exception as e:
+            logger.debug(f"Failed to prefetch {self.item.path}: {e}")
+            return
+        if not self._should_cancel:
+            self.cache.put(self.item._path, b"".join(chunks))
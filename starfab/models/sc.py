@@ -1,17 +1,23 @@
 import time
 import typing
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
 
 import sentry_sdk
 
+from scdatatools.forge import DataCoreBinary
 from scdatatools.sc import StarCitizen
 from scdatatools.utils import log_time
 from starfab.gui import qtc
 from starfab.log import getLogger
+from starfab.settings import settings
 from .audio import AudioTreeModel
+from .common import SKIP_MODELS
 from .datacore import DCBModel
 from .localization import LocalizationModel
 from .p4k import P4KModel
+from .p4k_pool import P4KReaderPool
 from .tag_database import TagDatabaseModel
 
 logger = getLogger(__name__)
@@ -20,6 +26,7 @@ logger = getLogger(__name__)
 class _LoaderSignals(qtc.QObject):
     started = qtc.Signal()
     finished = qtc.Signal()
+    failed = qtc.Signal(str)
 
     task_started = qtc.Signal(str, str, int, int)
     update_status_progress = qtc.Signal(str, int, int, int, str)
@@ -59,6 +66,159 @@ class _SCLoader(qtc.QRunnable):
             self.signals.finished.emit()
 
 
+def _load_datacore(sc, p4k_reader):
+    """Loads `sc.datacore`, reading the Game.dcb through a handle from `p4k_reader` instead of the shared `sc.p4k`"""
+    if sc._datacore is None and sc.cache_dir is None:
+        with p4k_reader() as p4k, p4k.open("Data/Game.dcb") as f:
+            sc._datacore = DataCoreBinary(f.read())
+            sc._is_loaded["datacore"] = True
+    return sc.datacore
+
+
+class _SCResourceLoader(qtc.QRunnable):
+    """Loads one of the lazily loaded attributes of a `StarCitizen` (e.g. `datacore`) in the background, with `load`
+    if it's given. `signals.failed` is emitted instead of `signals.finished` if it could not be loaded."""
+
+    def __init__(self, sc, attr, load: typing.Callable = None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.signals = _LoaderSignals()
+        self.sc = sc
+        self.attr = attr
+        self.load = load
+
+    def run(self):
+        try:
+            with log_time(f"Loading {self.attr}", logger.debug):
+                if self.load is not None:
+                    self.load()
+                else:
+                    getattr(self.sc, self.attr)
+        except Exception as e:
+            logger.exception(f"Failed to load {self.attr}", exc_info=e)
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit()
+
+
+class _LoadStage(qtc.QObject):
+    def __init__(self, name, deps, start, done_signal, failed_signal, scheduler):
+        # parented to the scheduler so `done_signal` is delivered on the GUI thread even when emitted by a worker
+        super().__init__(parent=scheduler)
+        self.name = name
+        self.deps = deps
+        self.start = start
+        self.done_signal = done_signal
+        self.failed_signal = failed_signal
+        self.started_at = None
+        self.finished_at = None
+        self.error = None  # why the stage failed, or was skipped
+        self._scheduler = scheduler
+        self._connected = False
+
+    @qtc.Slot()
+    def _done(self):
+        self._scheduler._stage_finished(self)
+
+    @qtc.Slot(str)
+    def _failed(self, msg):
+        self._scheduler._stage_finished(self, error=msg or "failed")
+
+
+class ModelLoadScheduler(qtc.QObject):
+    """Starts each loading stage as soon as the stages it depends on have finished, so independent stages (e.g.
+    building the P4K tree and parsing the DataCore) run concurrently. Stages start their work in the background and
+    signal `done_signal` when they are complete, or `failed_signal` if they fail, in which case the stages depending on
+    them are skipped. Once every stage has finished, the time spent in each one and the critical path through them is
+    logged."""
+
+    finished = qtc.Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+        self._stages: typing.Dict[str, _LoadStage] = {}
+        self._start_time = 0
+
+    def add_stage(self, name, deps, start: typing.Callable, done_signal, failed_signal=None):
+        self._stages[name] = _LoadStage(name, list(deps), start, done_signal, failed_signal, self)
+
+    def start(self):
+        self._start_time = time.time()
+        self._start_ready()
+
+    def cancel(self):
+        for stage in self._stages.values():
+            self._disconnect(stage)
+        self._stages = {}
+
+    def _disconnect(self, stage):
+        if stage._connected:
+            for signal, slot in ((stage.done_signal, stage._done), (stage.failed_signal, stage._failed)):
+                if signal is None:
+                    continue
+                try:
+                    signal.disconnect(slot)
+                except (RuntimeError, TypeError):
+                    pass
+            stage._connected = False
+
+    def _start_ready(self):
+        for stage in list(self._stages.values()):
+            if stage.started_at is not None:
+                continue
+            if all(self._stages[_].finished_at is not None for _ in stage.deps):
+                stage.started_at = time.time()
+                if failed := [_ for _ in stage.deps if self._stages[_].error is not None]:
+                    self._stage_finished(stage, error=f"skipped, {', '.join(failed)} failed")
+                    continue
+                stage.done_signal.connect(stage._done)
+                if stage.failed_signal is not None:
+                    stage.failed_signal.connect(stage._failed)
+                stage._connected = True
+                logger.debug(f"Starting load stage {stage.name}")
+                stage.start()
+
+    def _stage_finished(self, stage, error=None):
+        if stage.finished_at is not None or self._stages.get(stage.name) is not stage:
+            return
+        stage.finished_at = time.time()
+        stage.error = error
+        self._disconnect(stage)
+        if error is None:
+            logger.debug(f"Finished load stage {stage.name} in {stage.finished_at - stage.started_at:0.2f}s")
+        else:
+            logger.warning(f"Load stage {stage.name} failed: {error}")
+
+        if all(_.finished_at is not None for _ in self._stages.values()):
+            logger.info(self.report())
+            self.finished.emit()
+        else:
+            self._start_ready()
+
+    def critical_path(self) -> typing.List[_LoadStage]:
+        """The chain of stages that determined the total load time, following each stage back through the
+        dependency that finished last"""
+        stages = [_ for _ in self._stages.values() if _.finished_at is not None]
+        if not stages:
+            return []
+        path = [max(stages, key=lambda _: _.finished_at)]
+        while path[-1].deps:
+            path.append(max((self._stages[_] for _ in path[-1].deps), key=lambda _: _.finished_at))
+        return list(reversed(path))
+
+    def report(self) -> str:
+        lines = [f"Loaded in {max(_.finished_at for _ in self._stages.values()) - self._start_time:0.2f}s"]
+        for stage in sorted(self._stages.values(), key=lambda _: _.started_at):
+            lines.append(
+                f"  {stage.name:<20} started {stage.started_at - self._start_time:>7.2f}s  "
+                f"took {stage.finished_at - stage.started_at:>7.2f}s"
+                + (f"  ({stage.error})" if stage.error is not None else "")
+            )
+        lines.append("  critical path: " + " -> ".join(
+            f"{_.name} ({_.finished_at - _.started_at:0.2f}s)" for _ in self.critical_path()
+        ))
+        return "\n".join(lines)
+
+
 class StarCitizenManager(qtc.QObject):
     preparing_to_load = qtc.Signal(str)
     preparing_to_unload = qtc.Signal()
@@ -88,15 +248,35 @@ class StarCitizenManager(qtc.QObject):
         self.localization_model = LocalizationModel(self)
         self.tag_database_model = TagDatabaseModel(self)
         self.audio_model = AudioTreeModel(self)
+        self._scheduler = None
+        self.p4k_pool = None
+
+    @contextmanager
+    def p4k_reader(self, dedicated=False):
+        """Check out a reader handle for the loaded Data.p4k from `p4k_pool`, so reads from different threads don't
+        share a file position. Long running readers (e.g. exports) should use a `dedicated` handle, which doesn't take
+        one of the pool's handles."""
+        if self.p4k_pool is None:
+            yield self.sc.p4k
+        else:
+            with (self.p4k_pool.dedicated_reader() if dedicated else self.p4k_pool.reader()) as p4k:
+                yield p4k
 
     @qtc.Slot()
     def _unload(self):
         """Unload the currently loaded StarCitizen"""
         logger.debug(f"Unloading {self.sc.game_folder}")
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            self._scheduler.deleteLater()
+            self._scheduler = None
         if self.sc is not None:
             self.preparing_to_unload.emit()
         self.p4k_model.unload()
         self.datacore_model.unload()
+        if self.p4k_pool is not None:
+            self.p4k_pool.close()
+            self.p4k_pool = None
         sentry_sdk.set_context("sc", {})
         sentry_sdk.set_tag('sc.version', None)
         sentry_sdk.set_tag('sc.mode', None)
@@ -104,13 +284,52 @@ class StarCitizenManager(qtc.QObject):
         del self.sc
         self.sc = None
 
+    def _create_scheduler(self):
+        """The loading stages after the p4k header has been read. Each model depends only on what it actually reads:
+        the audio and localization models need the p4k's file list (`p4k_index`), not the full P4K tree, and the tag
+        database needs the parsed DataCore, not the DataCore tree."""
+        scheduler = ModelLoadScheduler(self)
+
+        # the Game.dcb is read through a handle from the reader pool, leaving localization as the only reader of the
+        # shared `sc.p4k` while loading (it opens its files through their `P4KInfo`s, which belong to `sc.p4k`)
+        datacore_loader = _SCResourceLoader(self.sc, "datacore", partial(_load_datacore, self.sc, self.p4k_reader))
+        scheduler.add_stage(
+            "datacore", [], lambda: qtc.QThreadPool.globalInstance().start(datacore_loader),
+            datacore_loader.signals.finished, datacore_loader.signals.failed
+        )
+        scheduler.add_stage(
+            "p4k_index", [], lambda: self.p4k_model.load(self.sc.p4k), self.p4k_model.index_ready,
+            self.p4k_model.load_failed
+        )
+        scheduler.add_stage(
+            "p4k_model", ["p4k_index"], lambda: None, self.p4k_model.loaded, self.p4k_model.load_failed
+        )
+        # datacore loader expects the StarCitizen object
+        scheduler.add_stage(
+            "datacore_model", ["datacore"], lambda: self.datacore_model.load(self.sc), self.datacore_model.loaded,
+            self.datacore_model.load_failed
+        )
+        if 'tag_database' not in SKIP_MODELS:
+            scheduler.add_stage(
+                "tag_database_model", ["datacore"], lambda: self.tag_database_model.load(self.sc),
+                self.tag_database_model.loaded, self.tag_database_model.load_failed
+            )
+        scheduler.add_stage(
+            "audio_model", ["p4k_index"], lambda: self.audio_model.load(self.sc), self.audio_model.loaded,
+            self.audio_model.load_failed
+        )
+        scheduler.add_stage(
+            "localization_model", ["p4k_index"], lambda: self.localization_model.load(self.sc),
+            self.localization_model.loaded, self.localization_model.load_failed
+        )
+        return scheduler
+
     @qtc.Slot()
     def _loaded(self):
+        self.p4k_pool = P4KReaderPool(self.sc.p4k, settings.snapshot.value("p4k/reader_handles"))
         self.loaded.emit()
-        self.p4k_model.load(self.sc.p4k)
-        self.datacore_model.load(
-            self.sc
-        )  # datacore loader expects the StarCitizen object
+        self._scheduler = self._create_scheduler()
+        self._scheduler.start()
 
     @qtc.Slot(str)
     def _load_sc(self, game_folder: typing.Union[str, Path], p4k_file="Data.p4k"):
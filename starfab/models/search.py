@@ -0,0 +1,236 @@
+import typing
+from array import array
+from bisect import bisect_right
+
+from starfab.log import getLogger
+from starfab.models.filters import bitset_from_rows, rows_from_bitset, evaluate_filters
+from starfab.models.lazy import resolve_folder_path
+
+logger = getLogger(__name__)
+
+_DOC_SEP = "\x00"
+
+
+class _Haystack:
+    """All of the documents lower-cased and joined into a single string, so a query is answered by `str.find` running
+    over the whole haystack instead of a Python level test per document"""
+
+    def __init__(self, texts: typing.List[str]):
+        texts = [_.lower() for _ in texts]
+        self.text = _DOC_SEP.join(texts)
+        self.starts = array("q")
+        pos = 0
+        for text in texts:
+            self.starts.append(pos)
+            pos += len(text) + 1
+
+    def find(self, query) -> typing.Iterator[int]:
+        """Yields the id of every document containing `query` (which must already be lower-cased)"""
+        text, starts = self.text, self.starts
+        pos = text.find(query)
+        while pos >= 0:
+            doc = bisect_right(starts, pos) - 1
+            yield doc
+            if doc + 1 >= len(starts):
+                break
+            pos = text.find(query, starts[doc + 1])
+
+
+class SearchResult:
+    """The items matched by a `SearchIndex` query. `paths` holds the `_path` of every matched entry and `folders`
+    the lower-cased path of every folder that either matched itself or contains a match, so a proxy can decide if
+    a row is shown without recursing into its children."""
+
+    def __init__(self, query, paths: typing.Set[str], folders: typing.Set[str]):
+        self.query = query
+        self.paths = paths
+        self.folders = folders
+
+    def __repr__(self):
+        return f'<SearchResult "{self.query}" paths:{len(self.paths)} folders:{len(self.folders)}>'
+
+    def accepts(self, item) -> bool:
+        return item._path in self.paths or (item.has_children() and item._path.lower() in self.folders)
+
+    @classmethod
+    def from_parent_paths(cls, query, paths, parent_paths) -> "SearchResult":
+        """A result matching `paths`, whose entries were added to the model with `parent_paths`"""
+        folders = set()
+        for parent_path in parent_paths:
+            folder = resolve_folder_path(parent_path).lower()
+            while folder and folder not in folders:
+                folders.add(folder)
+                folder = folder.rsplit("/", maxsplit=1)[0] if "/" in folder else ""
+        return cls(query, set(paths), folders)
+
+
+class SearchIndex:
+    """Case insensitive substring index over the entries of a `PathArchiveTreeModel`, built by its loader.
+
+    Each entry is indexed with a search text (its path by default) and optionally a set of exact terms (e.g. the wem
+    ids of an audio trigger). Folders are indexed separately with the text from
+    `PathArchiveTreeModelLoader.folder_search_text`.
+
+    Entries can also carry column values (see `PathArchiveTreeModelLoader.filter_columns`), which `FilterSpec`s
+    evaluate over all rows at once.
+
+    Entries added after `finalize` (e.g. the contents of a sub-archive expanded on demand) are kept in a second,
+    smaller haystack that is rebuilt when they change.
+    """
+
+    def __init__(self):
+        self.paths: typing.List[str] = []
+        self.parent_paths: typing.List[str] = []
+        self._texts: typing.List[str] = []
+        self._terms: typing.Dict[str, typing.List[int]] = {}
+        self._entries: typing.Optional[_Haystack] = None
+        self._folder_paths: typing.List[str] = []
+        self._folders: typing.Optional[_Haystack] = None
+        self._path_haystack: typing.Optional[_Haystack] = None
+        self._columns: typing.Dict[str, list] = {}
+        self._inverted: typing.Dict[str, typing.Dict[typing.Any, int]] = {}
+        self._interned = {}
+        self._folder_search_text = None
+        self._seen_folders: typing.Set[str] = set()
+        self._finalized_count = 0
+        self._late_texts: typing.List[str] = []
+        self._late_entries: typing.Optional[_Haystack] = None
+        self._late_folder_paths: typing.List[str] = []
+        self._late_folder_texts: typing.List[str] = []
+        self._late_folders: typing.Optional[_Haystack] = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __repr__(self):
+        return f"<SearchIndex entries:{len(self)} folders:{len(self._folder_paths)}>"
+
+    def add(self, parent_path, path, text, terms=(), columns=None):
+        doc = len(self.paths)
+        self.paths.append(path)
+        self.parent_paths.append(parent_path)
+        if self._entries is None:
+            self._texts.append(text)
+        else:
+            self._add_late(parent_path, text)
+        for term in terms:
+            self._terms.setdefault(str(term).lower(), []).append(doc)
+
+        columns = dict(columns or {})
+        for name, values in self._columns.items():
+            values.append(self._intern(columns.pop(name, None)))
+        for name, value in columns.items():
+            self._columns[name] = [None] * doc + [self._intern(value)]
+
+    def _intern(self, value):
+        if isinstance(value, str):
+            return self._interned.setdefault(value, value)
+        return value
+
+    def column(self, name) -> list:
+        return self._columns.get(name, [None] * len(self))
+
+    def bitset_for_values(self, column, values) -> int:
+        """Bitset of the rows whose `column` holds one of `values`"""
+        if (inverted := self._inverted.get(column)) is None:
+            rows_by_value = {}
+            for row, value in enumerate(self.column(column)):
+                if value is not None:
+                    rows_by_value.setdefault(value, []).append(row)
+            inverted = self._inverted[column] = {
+                value: bitset_from_rows(rows, len(self)) for value, rows in rows_by_value.items()
+            }
+        bitset = 0
+        for value in values:
+            bitset |= inverted.get(value, 0)
+        return bitset
+
+    def rows_for_path_text(self, text) -> typing.Iterable[int]:
+        """Rows whose path contains `text` (lower-cased)"""
+        if self._path_haystack is None:
+            self._path_haystack = _Haystack(self.paths)
+        return self._path_haystack.find(text)
+
+    def _new_folders(self, parent_path) -> typing.Iterator[typing.Tuple[str, str]]:
+        """Yields `(lower_folder_path, text)` for the folders leading to `parent_path` that are not indexed yet"""
+        folder = resolve_folder_path(parent_path)
+        while folder and (lower_folder := folder.lower()) not in self._seen_folders:
+            self._seen_folders.add(lower_folder)
+            yield lower_folder, folder if self._folder_search_text is None else self._folder_search_text(folder)
+            folder = folder.rsplit("/", maxsplit=1)[0] if "/" in folder else ""
+
+    def finalize(self, folder_search_text=None):
+        """Build the haystacks, entries added afterwards are indexed separately (see `_add_late`)"""
+        self._folder_search_text = folder_search_text
+        folder_texts = []
+        for parent_path in self.parent_paths:
+            for lower_folder, text in self._new_folders(parent_path):
+                self._folder_paths.append(lower_folder)
+                folder_texts.append(text)
+
+        self._entries = _Haystack(self._texts)
+        self._folders = _Haystack(folder_texts)
+        self._finalized_count = len(self._texts)
+        self._texts = []
+        logger.debug(f"Built {self}")
+        return self
+
+    def _add_late(self, parent_path, text):
+        self._late_texts.append(text)
+        self._late_entries = None
+        for lower_folder, folder_text in self._new_folders(parent_path):
+            self._late_folder_paths.append(lower_folder)
+            self._late_folder_texts.append(folder_text)
+            self._late_folders = None
+        # the row count changed, so any cached column bitsets are stale
+        self._inverted = {}
+        self._path_haystack = None
+
+    def _late_haystacks(self) -> typing.Tuple[_Haystack, _Haystack]:
+        if self._late_entries is None:
+            self._late_entries = _Haystack(self._late_texts)
+        if self._late_folders is None:
+            self._late_folders = _Haystack(self._late_folder_texts)
+        return self._late_entries, self._late_folders
+
+    def _docs_matching(self, query) -> typing.Set[int]:
+        docs = set(self._entries.find(query))
+        if self._late_texts:
+            late_entries, _ = self._late_haystacks()
+            docs.update(self._finalized_count + _ for _ in late_entries.find(query))
+        docs.update(self._terms.get(query, ()))
+        return docs
+
+    def _folders_matching(self, query) -> typing.Iterator[str]:
+        for folder in self._folders.find(query):
+            yield self._folder_paths[folder]
+        if self._late_folder_texts:
+            _, late_folders = self._late_haystacks()
+            for folder in late_folders.find(query):
+                yield self._late_folder_paths[folder]
+
+    def search(self, query) -> SearchResult:
+        return self.select(query)
+
+    def select(self, query="", filters=()) -> SearchResult:
+        """The rows matching the search text `query` that are also accepted by the compiled `(op, FilterSpec)`
+        `filters`, see `starfab.models.filters.evaluate_filters`"""
+        query = query.lower()
+        if filters:
+            accepted = evaluate_filters(filters, self)
+            if query:
+                accepted &= bitset_from_rows(self._docs_matching(query), len(self))
+            docs = list(rows_from_bitset(accepted))
+        else:
+            docs = self._docs_matching(query)
+
+        result = SearchResult.from_parent_paths(
+            query, (self.paths[_] for _ in docs), (self.parent_paths[_] for _ in docs)
+        )
+        if query and not filters:
+            # folders don't pass the additional filters themselves, they are only shown when they contain a match
+            for folder in self._folders_matching(query):
+                while folder and folder not in result.folders:
+                    result.folders.add(folder)
+                    folder = folder.rsplit("/", maxsplit=1)[0] if "/" in folder else ""
+        return result
@@ -1,5 +1,6 @@
 from functools import cached_property
 
+from scdatatools.utils import log_time
 from starfab.gui import qtc
 from starfab.log import getLogger
 from starfab.models.common import (
@@ -8,6 +9,7 @@ from starfab.models.common import (
     PathArchiveTreeModelLoader,
     SKIP_MODELS,
 )
+from starfab.models.tag_index import RecordTagIndex
 
 logger = getLogger(__name__)
 TAG_DATABASE_COLUMNS = ["Name"]
@@ -15,7 +17,14 @@ TAG_DATABASE_COLUMNS = ["Name"]
 
 class TagDatabaseLoader(PathArchiveTreeModelLoader):
     def items_to_load(self):
-        self.model.archive = self.model.archive.tag_database
+        sc = self.model.archive
+        self.model.archive = sc.tag_database
+        try:
+            with log_time("Building the record tag index", logger.debug):
+                self.model.tag_index = RecordTagIndex.build(sc.tag_database, sc.datacore.records)
+        except Exception as e:
+            # tag filters fall back to resolving each record's tags
+            logger.exception("Failed to build the record tag index", exc_info=e)
         return self.model.archive.tags_by_guid.values()
 
     def load_item(self, tag):
@@ -47,6 +56,7 @@ class TagDatabaseTreeItem:
     def __init__(self, tag, model):
         self.tag = tag
         self.model = model
+        self._row = None
 
     @property
     def name(self):
@@ -64,12 +74,23 @@ class TagDatabaseTreeItem:
 
     def row(self):
         if self.parent is not None:
-            return self.parent.tag.children.index(self.tag)
+            siblings = self.parent.tag.children
+            if self._row is None or self._row >= len(siblings) or siblings[self._row] is not self.tag:
+                # number all of the siblings at once, so looking up every row of a parent stays linear, and again
+                # once tags were added to or removed from the parent
+                self._row = None
+                for row, tag in enumerate(siblings):
+                    if (sibling := self.model.itemForGUID(tag.guid)) is not None:
+                        sibling._row = row
+            return self._row
         return 0
 
     def has_children(self):
         return bool(self.tag.children)
 
+    def sort_key(self, column):
+        return (self.tag.name if column == 0 else self.tag.guid).casefold()
+
     @property
     def children(self):
         return self.model.itemForGUID(self.tag.chilren)
@@ -104,6 +125,7 @@ class TagDatabaseTreeItem:
 
 class TagDatabaseModel(PathArchiveTreeModel):
     loaded = qtc.Signal()
+    load_failed = qtc.Signal(str)
     unloading = qtc.Signal()
     cancel_loading = qtc.Signal()
 
@@ -112,6 +134,7 @@ class TagDatabaseModel(PathArchiveTreeModel):
         self._sc_manager = sc_manager
         self._loader = None
         self.is_loaded = False
+        self.tag_index = None  # `RecordTagIndex` of the loaded DataCore's records, built while loading
 
         super().__init__(
             None,
@@ -123,15 +146,11 @@ class TagDatabaseModel(PathArchiveTreeModel):
         if 'tag_database' in SKIP_MODELS:
             logger.debug(f'Skipping loading the tag_database model')
         else:
-            self._sc_manager.datacore_model.loaded.connect(self._on_datacore_loaded)
+            # loading is started by `StarCitizenManager` once the DataCore has been parsed
             self._sc_manager.datacore_model.unloading.connect(
                 self._on_datacore_unloading,  # qtc.Qt.BlockingQueuedConnection
             )
 
-    @qtc.Slot()
-    def _on_datacore_loaded(self):
-        self.load(self._sc_manager.sc)
-
     @qtc.Slot()
     def _on_datacore_unloading(self):
         self.unload()
@@ -159,6 +178,7 @@ class TagDatabaseModel(PathArchiveTreeModel):
         if self._loader is not None:
             self._loader.cancel.emit()
         self.clear()
+        self.tag_index = None
         self.is_loaded = False
 
     def _loaded(self):
@@ -168,6 +188,16 @@ class TagDatabaseModel(PathArchiveTreeModel):
         self.is_loaded = True
         self.loaded.emit()
 
+    @qtc.Slot(dict)
+    def _handle_loader_finished(self, result):
+        if self.sender() is not getattr(self._loader, "signals", None):
+            return  # left over from a cancelled load
+        if (error := result.get("error")) is not None:
+            self._loader = None
+            self.load_failed.emit(error)
+        else:
+            self._loaded()
+
     def load(self, sc):
         if self.is_loaded:
             self.unload()
@@ -178,5 +208,5 @@ class TagDatabaseModel(PathArchiveTreeModel):
             task_name="load_tag_db_model",
             task_status_msg="Processing Tag Database",
         )
-        self._loader.signals.finished.connect(self._loaded)
+        self._loader.signals.finished.connect(self._handle_loader_finished)
         qtc.QThreadPool.globalInstance().start(self._loader)
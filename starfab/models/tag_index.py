@@ -0,0 +1,83 @@
+import typing
+
+from starfab.log import getLogger
+from starfab.models.filters import bitset_from_rows, record_tag_guids, rows_from_bitset
+
+logger = getLogger(__name__)
+
+
+class RecordTagIndex:
+    """The tags of every DataCore record, as bitsets over dense tag ids.
+
+    Every tag name of the tag database gets an id (its bit), and every record that has tags gets the bitset of its tags.
+    Checking a record against a set of tags is then a single `&` of two ints instead of resolving and stringifying its
+    tags each time::
+
+        mask = tag_index.mask(["TagA", "TagB"])
+        tag_index.has_any(record, mask)
+        tag_index.has_all(record, mask)
+
+    Built once by the `TagDatabaseModel`'s loader and available as `TagDatabaseModel.tag_index`.
+    """
+
+    def __init__(self, tag_names: typing.List[str], ids_by_guid: typing.Dict[str, int],
+                 record_bits: typing.Dict[str, int]):
+        self.tag_names = tag_names
+        self.ids_by_name = {name: tag_id for tag_id, name in enumerate(tag_names)}
+        self.ids_by_guid = ids_by_guid
+        # record guid -> bitset of its tag ids, records without tags are left out
+        self.record_bits = record_bits
+
+    def __repr__(self):
+        return f"<RecordTagIndex tags:{len(self.tag_names)} tagged records:{len(self.record_bits)}>"
+
+    @classmethod
+    def build(cls, tag_database, records) -> "RecordTagIndex":
+        tag_names = []
+        ids_by_name = {}
+        ids_by_guid = {}
+        for guid, tag in tag_database.tags_by_guid.items():
+            # filters match tags by name, so tags sharing a name share an id
+            if (tag_id := ids_by_name.get(name := str(tag))) is None:
+                tag_id = ids_by_name[name] = len(tag_names)
+                tag_names.append(name)
+            ids_by_guid[guid] = tag_id
+
+        record_bits = {}
+        for record in records:
+            bits = 0
+            for guid in record_tag_guids(record):
+                if (tag_id := ids_by_guid.get(guid)) is not None:
+                    bits |= 1 << tag_id
+            if bits:
+                record_bits[record.id.value] = bits
+        return cls(tag_names, ids_by_guid, record_bits)
+
+    def mask(self, tags: typing.Iterable[str], strict=False) -> int:
+        """The bitset of the tags named `tags`. Unknown names are ignored, unless `strict` is set in which case the
+        mask is `0` (so `has_all` can't match tags that don't exist)"""
+        tag_ids = [self.ids_by_name.get(_) for _ in tags]
+        if strict and None in tag_ids:
+            return 0
+        return bitset_from_rows((_ for _ in tag_ids if _ is not None), len(self.tag_names))
+
+    def bits(self, record) -> int:
+        return self.record_bits.get(record.id.value, 0) if record is not None else 0
+
+    def has_any(self, record, mask: int) -> bool:
+        return bool(self.bits(record) & mask)
+
+    def has_all(self, record, mask: int) -> bool:
+        return mask != 0 and self.bits(record) & mask == mask
+
+    def record_tag_names(self, record) -> typing.Set[str]:
+        """The names of the tags of `record`, the same as `filters.record_tag_names`"""
+        return {self.tag_names[_] for _ in rows_from_bitset(self.bits(record))}
+
+    def records_with_tags(self, tags: typing.Iterable[str], match=any) -> typing.List[str]:
+        """The guids of the records tagged with any (`match=any`) or all (`match=all`) of `tags`"""
+        if match is all:
+            mask = self.mask(tags, strict=True)
+            return [guid for guid, bits in self.record_bits.items() if mask and bits & mask == mask]
+        mask = self.mask(tags)
+        return [guid for guid, bits in self.record_bits.items() if bits & mask]
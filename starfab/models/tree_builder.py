@@ -0,0 +1,78 @@
+import typing
+
+from starfab.log import getLogger
+from starfab.models.lazy import resolve_folder_path
+
+logger = getLogger(__name__)
+
+
+class PathTreeBuilder:
+    """Resolves the parent folders of the entries of a `PathArchiveTreeModel` while it is being loaded, creating them
+    as needed.
+
+    This returns exactly what `PathArchiveTreeModel.parentForPath` would, but instead of walking up every path and
+    probing the folder cache once per level, it keeps the chain of folders of the previous entry and only resolves the
+    components that differ. Archives list their files grouped by directory, so most entries share their whole folder
+    with the previous one and the rest share a long prefix of it.
+
+    Folders are registered in the model's `_parent_cache`, so `parentForPath` and the builder can be mixed. A loader
+    streaming the tree to the GUI thread passes its own `cache` instead, the folders created since the last call to
+    `take_new_folders` are handed over with the staged items and only published once they're in the tree.
+    """
+
+    def __init__(self, model, cache=None):
+        self.model = model
+        self._cache = model._parent_cache if cache is None else cache
+        self._new_folders = None if cache is None else {}
+        self._last_parent_path = None
+        self._last_folder = None
+        # (lower-cased component, lower-cased path, item) for each folder leading to `_last_folder`
+        self._chain: typing.List[typing.Tuple[str, str, typing.Any]] = []
+
+    def parent_for(self, parent_path):
+        if parent_path == self._last_parent_path:
+            return self._last_folder
+
+        folder_path = resolve_folder_path(parent_path)
+        if not folder_path:
+            self._chain = []
+            self._last_parent_path, self._last_folder = parent_path, self.model.root_item
+            return self._last_folder
+
+        components = folder_path.split("/")
+        lower_components = folder_path.lower().split("/")
+        chain = self._chain
+        common = 0
+        while (
+            common < len(chain) and common < len(lower_components) and chain[common][0] == lower_components[common]
+        ):
+            common += 1
+        del chain[common:]
+
+        cache = self._cache
+        parent = chain[-1][2] if chain else self.model.root_item
+        lower_path = chain[-1][1] if chain else ""
+        for i in range(common, len(components)):
+            lower_path = f"{lower_path}/{lower_components[i]}" if i else lower_components[i]
+            if not lower_path:
+                folder = self.model.root_item  # a leading "/", `parentForPath` resolves the empty path to the root
+            elif "." in components[i]:
+                folder = parent  # components containing a "." are not folders, their children go to the parent
+            elif (folder := cache.get(lower_path)) is None:
+                folder = cache[lower_path] = self.model._item_cls(
+                    "/".join(components[: i + 1]), model=self.model, parent=parent
+                )
+                if self._new_folders is not None:
+                    self._new_folders[lower_path] = folder
+            chain.append((lower_components[i], lower_path, folder))
+            parent = folder
+
+        self._last_parent_path, self._last_folder = parent_path, parent
+        return parent
+
+    def take_new_folders(self) -> typing.Dict[str, typing.Any]:
+        """The folders created in a private `cache` since the last call, keyed by their lower-cased path"""
+        if not self._new_folders:
+            return {}
+        new_folders, self._new_folders = self._new_folders, {}
+        return new_folders
@@ -3,12 +3,17 @@ import sys
 import typing
 from pathlib import Path
 
+from scdatatools.utils import parse_bool
 from starfab import CONTRIB_DIR
 from starfab.gui import qtc
 
 settings_defaults = {
     "theme": "Monokai Dimmed",
     "tree_view_folders_first": "true",
+    "compact_tree_storage": "false",
+    "lazy_tree_loading": "false",
+    "stream_tree_loading": "false",
+    "tree_search_index": "true",
     "defaultWorkspace": "data",
     "checkForUpdates": "true",
     "enableErrorReporting": "true",
@@ -28,6 +33,25 @@ settings_defaults = {
     "exportDirectory": str(qtc.QDir.homePath() + "/Desktop/StarFab_Exports"),
     "extract/auto_open_folder": "true",
 
+    # caches
+    "cacheDirectory": str(
+        Path(qtc.QStandardPaths.writableLocation(qtc.QStandardPaths.GenericCacheLocation)) / "StarFab"
+    ),
+    "cache/p4k_index": "true",
+    "cache/datacore_text_index": "true",
+
+    # p4k
+    "p4k/lazy_subarchives": "true",
+    "p4k/expand_subarchives_in_background": "false",
+    "p4k/reader_handles": "4",
+    "p4k/prefetch": "true",
+    "p4k/prefetch_cache_size": "64",  # MiB
+
+    # datacore
+    "datacore/text_index": "true",
+    "datacore/record_cache_size": "128",  # MiB
+    "datacore/extract_workers": "4",
+
     # editor
     "editor/theme": "Monokai",
     "editor/key_bindings": "Default",
@@ -54,6 +78,61 @@ first_run_flags = {
 }
 
 
+_BOOL_STRINGS = ("true", "false")
+
+
+class SettingsSnapshot:
+    """In-memory copy of the settings values read from hot paths.
+
+    Values are read from QSettings the first time they are requested and kept (already parsed, see `_typed`) until
+    the settings are updated, so the following reads are a dict lookup. Values are updated in place by
+    `StarFabSettings.setValue` and the whole snapshot is refreshed on `settings_updated`.
+    `reads` counts the QSettings reads the snapshot made and `saved_reads` the ones it avoided.
+    """
+
+    def __init__(self, settings: "StarFabSettings"):
+        self._settings = settings
+        self._values = {}
+        self.reads = 0
+        self.saved_reads = 0
+        settings.settings_updated.connect(self.refresh)
+
+    def __repr__(self):
+        return f"<SettingsSnapshot values:{len(self._values)} reads:{self.reads} saved_reads:{self.saved_reads}>"
+
+    @staticmethod
+    def _typed(key, value):
+        """Settings whose default is a `"true"`/`"false"` string are returned as a `bool`, and those whose default is
+        a number as an `int` (the default, if the value isn't one)"""
+        default = settings_defaults.get(key)
+        if value is None or not isinstance(default, str):
+            return value
+        if default in _BOOL_STRINGS:
+            return bool(parse_bool(value))  # `strtobool` returns 0 or 1
+        if default.isdigit():
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return int(default)
+        return value
+
+    def refresh(self):
+        self._values = {}
+
+    def set(self, key, value):
+        self._values[key] = self._typed(key, value)
+
+    def value(self, key: str, default: typing.Optional[typing.Any] = None) -> typing.Any:
+        """Returns the value of `key`, falling back to `settings_defaults` and then `default`"""
+        try:
+            value = self._values[key]
+            self.saved_reads += 1
+        except KeyError:
+            value = self._values[key] = self._typed(key, self._settings.value(key))
+            self.reads += 1
+        return default if value is None else value
+
+
 class StarFabSettings(qtc.QSettings):
     settings_updated = qtc.Signal()
 
@@ -64,6 +143,7 @@ class StarFabSettings(qtc.QSettings):
         self._debounce.timeout.connect(self._settings_updated)
 
         super().__init__(*args, **kwargs)
+        self.snapshot = SettingsSnapshot(self)
 
         # TODO: combine first run flags with settings init to better serve initial interactions as needed,
         #       for example check for updates, create default config, etc.
@@ -80,6 +160,7 @@ class StarFabSettings(qtc.QSettings):
 
     def setValue(self, key: str, value: typing.Any) -> None:
         super().setValue(key, value)
+        self.snapshot.set(key, value)
         self._debounce.start()
 
     def configure_defaults(self):
@@ -121,6 +202,13 @@ def get_compressonatorcli():
     return _get_exec("compressonatorcli", "external_tools/compressonatorcli")
 
 
+def get_cache_dir(*sub_dirs) -> Path:
+    """Returns the StarFab cache directory (or a sub directory of it), ensuring it exists"""
+    cache_dir = Path(settings.snapshot.value("cacheDirectory")).joinpath(*sub_dirs)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
 settings = StarFabSettings("SCModding", "StarFab")
 
 
@@ -0,0 +1,95 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+def _zip_bytes(files: dict) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for name, data in files.items():
+            z.writestr(name, data)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from starfab.gui import qtw
+
+    return qtw.QApplication.instance() or qtw.QApplication([])
+
+
+@pytest.fixture
+def make_p4k(tmp_path):
+    """Writes a (stored, unencrypted) p4k with the given `{filename: bytes}` contents, sub-archives can be created
+    with `subarchive({filename: bytes})`"""
+
+    def _make_p4k(files: dict, name="Data.p4k"):
+        path = tmp_path / name
+        path.write_bytes(_zip_bytes(files))
+        return path
+
+    return _make_p4k
+
+
+@pytest.fixture
+def subarchive():
+    return _zip_bytes
+
+
+# paths of a typical archive, including components with a "." that aren't treated as folders (sub-archives, versioned
+# folders) and folders that only differ in case
+TREE_PATHS = [
+    "Data/a.txt",
+    "Data/Objects/ship.socpak",
+    "Data/Objects/ship/inner/x.txt",
+    "Data/Objects/ship/y.txt",
+    "Data/Objects/b.socpak/c/x.xml",
+    "Data/Objects/b.socpak/c/d/z.xml",
+    "Data/Objects/b.socpak/w.xml",
+    "Data/Libs/v1.2/conf/file.cfg",
+    "Data/Libs/v1.2/readme",
+    "Data/Libs/config.ini",
+    "Data/UPPER/Mixed.txt",
+    "Data/upper/lower.txt",
+    "top.txt",
+    "Shaders/Cache/d3d11.pak",
+]
+
+
+def tree_entries(paths=TREE_PATHS):
+    return [(path.rsplit("/", maxsplit=1)[0] if "/" in path else "", path, {}) for path in paths]
+
+
+def tree_edges(item, fetch=None) -> set:
+    """Every `(parent path, child path)` pair below `item`, lower-cased so trees are compared regardless of which
+    spelling of a folder was seen first. `fetch(item)` is called before a folder's children are read."""
+    edges = set()
+    pending = [item]
+    while pending:
+        parent = pending.pop()
+        if fetch is not None:
+            fetch(parent)
+        for child in parent.children:
+            assert child.parent is parent or child.parent._path == parent._path
+            edges.add((parent._path.lower() if parent.parent is not None else "", child._path.lower()))
+            pending.append(child)
+    return edges
+
+
+@pytest.fixture
+def eager_model():
+    """A `PathArchiveTreeModel` populated item by item with `parentForPath`, the reference every other way of
+    building a tree is compared against"""
+    from starfab.models.common import PathArchiveTreeModel
+
+    def _eager_model(entries):
+        model = PathArchiveTreeModel(None)
+        for parent_path, path, kwargs in entries:
+            model._item_cls(path, model=model, parent=model.parentForPath(parent_path), **kwargs)
+        return model
+
+    return _eager_model
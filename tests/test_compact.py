@@ -0,0 +1,72 @@
+from conftest import TREE_PATHS, tree_edges, tree_entries
+
+from starfab.models.common import PathArchiveTreeModel
+from starfab.models.compact import NO_NODE, ROOT_NODE, CompactTreeStore
+
+
+def _compact_model(entries):
+    model = PathArchiveTreeModel(None)
+    model.build_compact(entries)
+    return model
+
+
+def _folder_path(item):
+    return item._path.lower() if item.parent is not None else ""
+
+
+def test_compact_matches_object_tree(eager_model):
+    entries = tree_entries()
+    assert tree_edges(_compact_model(entries).root_item) == tree_edges(eager_model(entries).root_item)
+
+
+def test_compact_children_sorted_and_rows():
+    model = _compact_model(tree_entries())
+    pending = [model.root_item]
+    while pending:
+        item = pending.pop()
+        names = [_.name for _ in item.children]
+        assert names == sorted(names)
+        for row, child in enumerate(item.children):
+            assert child.row() == row
+            assert item.child(row) is child
+            assert item.children_by_name[child.name] is child
+            assert item.children.index(child) == row
+        assert item.childCount() == len(names)
+        pending.extend(item.children)
+
+
+def test_compact_lookups(eager_model):
+    entries = tree_entries()
+    model = _compact_model(entries)
+    eager = eager_model(entries)
+    for path in TREE_PATHS:
+        item = model.itemForPath(path)
+        expected = eager.itemForPath(path)
+        assert (item._path if item is not None else None) == (expected._path if expected is not None else None)
+        parent_path = path.rsplit("/", maxsplit=1)[0] if "/" in path else ""
+        assert _folder_path(model.parentForPath(parent_path)) == _folder_path(eager.parentForPath(parent_path))
+    assert model.itemForPath("Data/missing.txt") is None
+
+
+def test_compact_paths_and_payloads():
+    store = CompactTreeStore.build([(p, path, {"index_id": i}) for i, (p, path, _) in enumerate(tree_entries())])
+    assert store.payload_key == "index_id"
+    for i, path in enumerate(TREE_PATHS):
+        parent = store.folder_node(path.rsplit("/", maxsplit=1)[0] if "/" in path else "")
+        node = store.child_node_by_name(parent, path.rsplit("/", maxsplit=1)[-1])
+        assert node != NO_NODE
+        assert store.path(node) == path
+        assert store.payload(node) == {"index_id": i}
+    # folders have no payload
+    assert store.payload(store.folder_node("Data/Objects")) == {}
+    assert store.folder_node("") == ROOT_NODE
+    assert store.folder_node("Data/nope") == NO_NODE
+
+
+def test_compact_rejects_mixed_payloads():
+    try:
+        CompactTreeStore.build([("", "a", {"record": 1}), ("", "b", {"index_id": 2})])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("mixed payload keys should be rejected")
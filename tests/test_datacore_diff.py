@@ -0,0 +1,160 @@
+from types import SimpleNamespace
+
+from scdatatools.forge import dftypes
+
+from starfab.models.datacore_diff import DataCoreDiff, PropertyChange, TreeHasher, diff_trees, hash_tree
+
+
+class _Struct(dftypes.StructureInstance):
+    """A structure instance with fixed properties, counting how often they're read"""
+
+    def __init__(self, name, offset, properties):
+        super().__init__(None, offset, SimpleNamespace(name=name))
+        self._properties = properties
+        self.reads = 0
+
+    @property
+    def properties(self):
+        self.reads += 1
+        return self._properties
+
+
+class _DataCore:
+    def __init__(self):
+        self.instances = {}
+        self.strings = {}
+        self.records_by_guid = {}
+        self.structure_definitions = [SimpleNamespace(name="Ship")]
+
+    def get_structure_instance(self, structure_index, instance_index):
+        return self.instances[structure_index, instance_index]
+
+    def string_for_offset(self, offset):
+        return self.strings[offset]
+
+    def struct(self, name, properties, instance_index=None):
+        instance = _Struct(name, len(self.instances) * 100, properties)
+        if instance_index is not None:
+            self.instances[0, instance_index] = instance
+        return instance
+
+    def pointer(self, instance_index, cls=dftypes.StrongPointer):
+        pointer = cls(structure_index=0, instance_index=instance_index)
+        pointer._dcb = self
+        return pointer
+
+    def record(self, guid, filename, instance_index):
+        record = dftypes.Record(
+            name_offset=1, filename_offset=len(self.strings) + 2, structure_index=0, instance_index=instance_index
+        )
+        record.id.raw_guid[0] = guid
+        record._dcb = self
+        self.strings[1] = "Record"
+        self.strings[record.filename_offset] = filename
+        self.records_by_guid[record.id.value] = record
+        return record
+
+
+def _reference(guid):
+    reference = dftypes.Reference(instance_index=0)
+    reference.value.raw_guid[0] = guid
+    return reference
+
+
+def test_hash_tree():
+    assert hash_tree({"a": 1, "b": [1, 2]}) == hash_tree({"b": [1, 2], "a": 1})
+    assert hash_tree({"a": 1}) != hash_tree({"a": "1"})
+    assert hash_tree([1, 2]) != hash_tree([2, 1])
+    assert hash_tree({"a": _reference(1)}) == hash_tree({"a": _reference(1)}) != hash_tree({"a": _reference(2)})
+
+    dcb = _DataCore()
+    shared = dcb.struct("Shared", {"value": 5}, instance_index=0)
+    hasher = TreeHasher()
+    # structures are hashed by their contents and type, and only once
+    assert hasher.digest(dcb.pointer(0)) == hasher.digest(shared) == hash_tree(_Struct("Shared", 999, {"value": 5}))
+    assert hash_tree(_Struct("Other", 999, {"value": 5})) != hasher.digest(shared)
+    hasher.digest(dcb.struct("Parent", {"a": dcb.pointer(0), "b": [dcb.pointer(0), shared]}))
+    assert shared.reads == 1
+
+
+def test_hash_tree_cycles():
+    dcb = _DataCore()
+    dcb.struct("A", {"next": dcb.pointer(1)}, instance_index=0)
+    dcb.struct("B", {"next": dcb.pointer(0)}, instance_index=1)
+    assert hash_tree(dcb.pointer(0)) != hash_tree(dcb.pointer(1))
+    assert TreeHasher().to_json(dcb.pointer(0)) == {"__type": "A", "next": {"__type": "B", "next": "<cycle: A>"}}
+
+
+def test_diff_trees():
+    old = {"same": {"x": 1}, "changed": 1, "removed": [1], "list": [1, 2, 3], "type": {"a": 1}}
+    new = {"same": {"x": 1}, "changed": 2, "added": {"y": None}, "list": [1, 4], "type": "a"}
+    assert sorted(diff_trees(old, new)) == sorted([
+        PropertyChange("changed", "changed", 1, 2),
+        PropertyChange("removed", "removed", [1], None),
+        PropertyChange("added", "added", None, {"y": None}),
+        PropertyChange("list[1]", "changed", 2, 4),
+        PropertyChange("list[2]", "removed", 3, None),
+        PropertyChange("type", "changed", {"a": 1}, "a"),
+    ])
+    assert diff_trees(old, dict(old)) == []
+
+
+def test_diff_trees_only_descends_into_changed_subtrees():
+    old_dcb, new_dcb = _DataCore(), _DataCore()
+    old_same = old_dcb.struct("Same", {"value": 1})
+    new_same = new_dcb.struct("Same", {"value": 1})
+    old_changed = old_dcb.struct("Changed", {"value": 1, "ref": _reference(1)}, instance_index=0)
+    new_changed = new_dcb.struct("Changed", {"value": 1, "ref": _reference(2)}, instance_index=0)
+    old = old_dcb.struct("Root", {
+        "same": old_same, "changed": old_dcb.pointer(0), "weak": old_dcb.pointer(0, dftypes.WeakPointer)
+    })
+    new = new_dcb.struct("Root", {
+        "same": new_same, "changed": new_dcb.pointer(0), "weak": new_dcb.pointer(0, dftypes.WeakPointer)
+    })
+
+    old_hasher, new_hasher = TreeHasher(), TreeHasher()
+    changes = diff_trees(old, new, old_hasher, new_hasher)
+    assert changes == [PropertyChange("changed.ref", "changed", str(_reference(1).value), str(_reference(2).value))]
+    # hashed once each, the unchanged subtree is never descended into
+    assert (old_same.reads, new_same.reads) == (1, 1)
+    assert (old_changed.reads, new_changed.reads) == (2, 2)
+    assert old.reads == new.reads == 2
+
+    # a struct that changed its type
+    assert diff_trees(old_dcb.struct("A", {"v": 1}), new_dcb.struct("B", {"v": 1})) == [
+        PropertyChange("__type", "changed", "A", "B")
+    ]
+
+
+def test_compare():
+    old_dcb, new_dcb = _DataCore(), _DataCore()
+    old_dcb.struct("Ship", {"speed": 10, "name": "a"}, instance_index=0)
+    new_dcb.struct("Ship", {"speed": 12, "name": "a"}, instance_index=0)
+    old_dcb.struct("Ship", {"speed": 5}, instance_index=1)
+    new_dcb.struct("Ship", {"speed": 5}, instance_index=1)
+    old_dcb.struct("Ship", {"speed": 1}, instance_index=2)
+    new_dcb.struct("Ship", {"speed": 1}, instance_index=3)
+    old_dcb.record(1, "libs/changed.xml", 0)
+    new_dcb.record(1, "libs/changed.xml", 0)
+    old_dcb.record(2, "libs/same.xml", 1)
+    new_dcb.record(2, "libs/same.xml", 1)
+    old_dcb.record(3, "libs/removed.xml", 2)
+    new_dcb.record(4, "libs/added.xml", 3)
+    old_dcb.record(5, "libs/broken.xml", 9)  # points to an instance that doesn't exist
+    new_dcb.record(5, "libs/broken.xml", 9)
+
+    progress = []
+    diff = DataCoreDiff.compare(old_dcb, new_dcb, "old", "new", progress=lambda *_: progress.append(_))
+    assert progress == [(0, 4), (1, 4), (2, 4), (3, 4)]
+    assert [(_.path, _.status) for _ in diff.records] == [
+        ("libs/added.xml", "added"),
+        ("libs/broken.xml", "error"),
+        ("libs/changed.xml", "changed"),
+        ("libs/removed.xml", "removed"),
+    ]
+    assert diff.records[2].changes == [PropertyChange("speed", "changed", 10, 12)]
+    assert diff.records[1].changes[0].status == "error"
+    assert diff.counts() == {"added": 1, "removed": 1, "changed": 1, "error": 1}
+    assert diff.to_json()["counts"]["error"] == 1
+
+    assert DataCoreDiff.compare(old_dcb, new_dcb, should_cancel=lambda: True) is None
@@ -0,0 +1,91 @@
+from pathlib import PurePosixPath
+from types import SimpleNamespace
+
+import pytest
+
+from starfab.gui import qtc
+from starfab.models.compact import CompactTreeStore
+from starfab.models.datacore import DCBModel, RecordRenderCache
+from starfab.models.datacore_extract import DCBExtractRunner, plan_extract_paths
+from starfab.models.lazy import LazyTreeSource
+
+
+def test_plan_extract_paths(tmp_path):
+    (tmp_path / "libs").mkdir()
+    (tmp_path / "libs" / "on_disk.xml").write_text("")
+    records = [
+        ("g0", PurePosixPath("libs/a.xml")),
+        ("g1", PurePosixPath("libs/a.xml")),
+        ("g2", PurePosixPath("libs/b/a.xml")),
+        ("g3", PurePosixPath("libs/on_disk.xml")),
+        ("g4", PurePosixPath("libs/a.xml")),
+    ]
+    assert plan_extract_paths(records, tmp_path) == [
+        ("g0", tmp_path / "libs/a.xml"),
+        ("g1", tmp_path / "libs/a.g1.xml"),
+        ("g2", tmp_path / "libs/b/a.xml"),
+        ("g3", tmp_path / "libs/on_disk.g3.xml"),
+        ("g4", tmp_path / "libs/a.g4.xml"),
+    ]
+    assert plan_extract_paths([], tmp_path) == []
+
+
+class _Signal:
+    def emit(self, *args):
+        pass
+
+
+class _DataCore:
+    def __init__(self, guids, broken=()):
+        self.records_by_guid = {_: SimpleNamespace(id=SimpleNamespace(value=_)) for _ in guids}
+        self.broken = set(broken)
+
+    def dump_record_json(self, record):
+        if record.id.value in self.broken:
+            raise ValueError("can't serialize")
+        return f'{{"guid": "{record.id.value}"}}'
+
+
+def test_extract(qapp, tmp_path):
+    guids = [f"g{_}" for _ in range(600)]
+    records = [(guid, PurePosixPath(f"libs/{int(guid[1:]) % 7}/record.json")) for guid in guids]
+    cache = RecordRenderCache(1024)
+    runner = DCBExtractRunner(_DataCore(guids, broken=["g5"]), cache, records, tmp_path, fmt="json", workers=3)
+    runner.starfab = SimpleNamespace(task_started=_Signal(), update_status_progress=_Signal(), task_finished=_Signal())
+    results = []
+    runner.signals.finished.connect(results.append)
+    runner.run()
+
+    assert results == [{"outdir": tmp_path, "extracted": 599, "failed": 1, "cancelled": False}]
+    assert (tmp_path / "libs/0/record.json").read_text() == '{"guid": "g0"}'
+    assert (tmp_path / "libs/0/record.g7.json").read_text() == '{"guid": "g7"}'
+    assert len(list(tmp_path.rglob("*.json"))) == 599
+    # nothing was cached or counted for the extraction
+    assert len(cache) == 0 and cache.hits == cache.misses == 0
+
+
+@pytest.mark.parametrize("mode", ["compact", "lazy"])
+def test_extract_all_lists_the_records_in_the_runner(qapp, tmp_path, mode):
+    guids = [f"g{_}" for _ in range(50)]
+    datacore = _DataCore(guids)
+    folders = {guid: f"ships/{int(guid[1:]) % 3}" for guid in guids}
+    entries = [
+        (folders[guid], f"{folders[guid]}/{guid}.xml", {"record": datacore.records_by_guid[guid]}) for guid in guids
+    ]
+    model = DCBModel(qtc.QObject())
+    if mode == "compact":
+        model.set_compact_store(CompactTreeStore.build(entries))
+    else:
+        model.set_lazy_source(LazyTreeSource(entries))
+
+    runner = DCBExtractRunner(datacore, model.record_cache, model.record_paths, tmp_path, fmt="json", workers=2)
+    runner.starfab = SimpleNamespace(task_started=_Signal(), update_status_progress=_Signal(), task_finished=_Signal())
+    results = []
+    runner.signals.finished.connect(results.append)
+    runner.run()
+
+    assert results == [{"outdir": tmp_path, "extracted": 50, "failed": 0, "cancelled": False}]
+    assert (tmp_path / "ships/1/g4.xml").read_text() == '{"guid": "g4"}'
+    if mode == "lazy":
+        # none of the lazy tree's items were created to list the records
+        assert model.has_pending_children(model.root_item) and not model.root_item.children
@@ -0,0 +1,114 @@
+import json
+import struct
+import zlib
+from types import SimpleNamespace
+
+import pytest
+
+from starfab.models.datacore_index import (
+    DATACORE_TEXT_INDEX_MAGIC,
+    DataCoreTextIndex,
+    query_terms,
+    record_terms,
+)
+
+RECORD_DICTS = {
+    "r0": {"name": "LightningBolt", "damage": {"DamageEnergy": 12.5}, "enabled": True},
+    "r1": {"name": "FireBolt", "damage": {"DamageHeat": 30}, "tags": ["Weapon", "Ballistic"]},
+    "r2": {"name": "Shield_Generator", "health": 1000, "parent": None},
+    "r3": {"name": "broken"},
+}
+
+
+class _DataCore:
+    def __init__(self, record_dicts, broken=()):
+        self.record_dicts = record_dicts
+        self.broken = set(broken)
+        self.records = [SimpleNamespace(id=SimpleNamespace(value=_)) for _ in record_dicts]
+
+    def record_to_dict(self, record, depth=100):
+        if record.id.value in self.broken:
+            raise ValueError("can't serialize")
+        return self.record_dicts[record.id.value]
+
+
+@pytest.fixture
+def text_index():
+    return DataCoreTextIndex.build(_DataCore(RECORD_DICTS, broken=["r3"]), key={"p4k": "Data.p4k"})
+
+
+def test_record_terms():
+    datacore = _DataCore(RECORD_DICTS)
+    assert record_terms(datacore, datacore.records[0]) == {
+        "name", "lightningbolt", "damage", "damageenergy", "12", "5", "enabled", "true"
+    }
+    # every term of a record's json is indexed
+    for record in datacore.records:
+        assert set(query_terms(json.dumps(RECORD_DICTS[record.id.value]))) == record_terms(datacore, record)
+
+
+def test_guids_matching(text_index):
+    assert len(text_index) == 4
+    assert text_index.guids_matching("bolt") == {"r0", "r1"}
+    assert text_index.guids_matching("BOLT damageheat") == {"r1"}
+    assert text_index.guids_matching("shield_gen") == {"r2"}
+    assert text_index.guids_matching("null") == {"r2"}
+    assert text_index.guids_matching("lightning heat") == set()
+    assert text_index.guids_matching("missing") == set()
+    # records that failed to serialize are listed but match nothing
+    assert text_index.guids_matching("broken") == set()
+
+
+def test_record_matches_and_may_contain(text_index):
+    assert text_index.record_matches("r0", "lightning 12.5")
+    assert not text_index.record_matches("r1", "lightning")
+    assert not text_index.record_matches("unknown", "bolt")
+    for guid in ("r0", "r1", "r2", "r3"):
+        for text in ("bolt", "damage weapon", "1000", "name"):
+            assert text_index.record_matches(guid, text) == (guid in text_index.guids_matching(text)), (guid, text)
+
+    # every term is in some record, even though no record has both
+    assert text_index.may_contain("lightning heat")
+    assert not text_index.may_contain("lightning missing")
+
+
+def test_save_and_load_round_trip(tmp_path, text_index):
+    text_index.save(tmp_path / "datacore_text.index")
+    loaded = DataCoreTextIndex.load(tmp_path / "datacore_text.index", {"p4k": "Data.p4k"})
+    assert loaded.guids == text_index.guids
+    assert loaded.terms == text_index.terms
+    assert loaded.offsets == text_index.offsets and loaded.postings == text_index.postings
+    assert loaded.guids_matching("bolt") == {"r0", "r1"}
+
+    assert DataCoreTextIndex.load(tmp_path / "datacore_text.index", {"p4k": "Other.p4k"}) is None
+    assert DataCoreTextIndex.load(tmp_path / "missing.index", {}) is None
+    (tmp_path / "bad.index").write_bytes(b"not an index")
+    assert DataCoreTextIndex.load(tmp_path / "bad.index", {}) is None
+
+
+def test_load_rejects_corrupt_payloads(tmp_path, text_index):
+    filename = tmp_path / "datacore_text.index"
+    guids_len = len("\n".join(text_index.guids))
+    corruptions = [
+        lambda payload: payload[:-3],  # truncated in the middle of the postings
+        lambda payload: payload[: 8 + guids_len + 4],  # truncated in the middle of a length
+        lambda payload: payload[:8] + b"\xff" + payload[9:],  # not utf-8
+        lambda payload: payload[:-4] + struct.pack("<I", 1000),  # a posting past the last record
+        lambda payload: b"",
+    ]
+    for corrupt in corruptions:
+        text_index.save(filename)
+        data = filename.read_bytes()
+        (key_len,) = struct.unpack_from("<I", data, len(DATACORE_TEXT_INDEX_MAGIC) + 4)
+        header_len = len(DATACORE_TEXT_INDEX_MAGIC) + 12 + key_len
+        filename.write_bytes(data[:header_len] + zlib.compress(corrupt(zlib.decompress(data[header_len:]))))
+        assert DataCoreTextIndex.load(filename, {"p4k": "Data.p4k"}) is None
+
+
+def test_build_progress_and_cancel():
+    datacore = _DataCore(RECORD_DICTS)
+    progress = []
+    DataCoreTextIndex.build(datacore, progress=lambda done, total: progress.append((done, total)))
+    assert progress == [(0, 4), (1, 4), (2, 4), (3, 4)]
+    assert DataCoreTextIndex.build(datacore, should_cancel=lambda: len(progress) > 4,
+                                   progress=lambda *_: progress.append(_)) is None
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+from scdatatools.forge import dftypes
+
+from starfab.models.datacore_index import DataCoreTextIndex
+
+# the record widgets import the editor, which needs QtWebEngine (and the system libraries it links against)
+dcbrecord = pytest.importorskip("starfab.gui.widgets.dcbrecord", exc_type=ImportError)
+DCBLazyCollapsableObjWidget = dcbrecord.DCBLazyCollapsableObjWidget
+DCBObjWidget = dcbrecord.DCBObjWidget
+DCBRecordItemView = dcbrecord.DCBRecordItemView
+
+
+class _DataCore:
+    def __init__(self, record_dicts):
+        self.record_dicts = record_dicts
+        self.records = [SimpleNamespace(id=SimpleNamespace(value=_)) for _ in record_dicts]
+
+    def record_to_dict(self, record, depth=100):
+        return self.record_dicts[record.id.value]
+
+
+def _struct(name):
+    return dftypes.StructureInstance(None, 0, SimpleNamespace(name=name))
+
+
+def _record(guid):
+    record = dftypes.Record()
+    record.id.raw_guid[0] = guid
+    return record
+
+
+def _view(record_widget, text_index, text):
+    # `_on_filter_changed` of a record view, without loading its ui
+    return SimpleNamespace(
+        record_filter=SimpleNamespace(text=lambda: text),
+        starfab=SimpleNamespace(sc_manager=SimpleNamespace(datacore_model=SimpleNamespace(text_index=text_index))),
+        record_widget=record_widget,
+    )
+
+
+def test_terms_only_in_nested_structures_are_found(qapp):
+    # the record is indexed one level deep, "needle" is further down one of its structures
+    text_index = DataCoreTextIndex.build(_DataCore({"r0": {"name": "ship", "nested": {"inner": "struct"}}}))
+    assert not text_index.may_contain("needle")
+
+    record_widget = DCBObjWidget(SimpleNamespace(properties={"nested": _struct("Nested"), "other": _struct("Other")}))
+    nested, other = record_widget.subObjects()
+    nested.__dict__["_search_text"] = '{"inner": {"deeper": "needle"}}'
+    other.__dict__["_search_text"] = '{"inner": "haystack"}'
+
+    DCBRecordItemView._on_filter_changed(_view(record_widget, text_index, "NEEDLE"))
+    assert not nested.isHidden() and other.isHidden()
+
+    DCBRecordItemView._on_filter_changed(_view(record_widget, text_index, ""))
+    assert not nested.isHidden() and not other.isHidden()
+
+
+def test_records_are_ruled_out_by_the_index(qapp):
+    matching, ruled_out = _record(1), _record(2)
+    widgets = [DCBLazyCollapsableObjWidget("record", _) for _ in (matching, ruled_out)]
+    widgets[0].__dict__["_search_text"] = '{"name": "needle"}'
+
+    # the ruled out record isn't serialized (there is no starfab to serialize it with)
+    matching_guids = {matching.id.value}
+    assert widgets[0].filter("needle", matching_guids=matching_guids)
+    assert not widgets[1].filter("needle", matching_guids=matching_guids)
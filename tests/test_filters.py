@@ -0,0 +1,139 @@
+import operator
+from pathlib import PurePosixPath
+from types import SimpleNamespace
+
+import pytest
+
+from starfab.models.filters import (
+    HasTags,
+    PathContains,
+    SuffixEquals,
+    TypeEquals,
+    bitset_from_rows,
+    evaluate_filters,
+    is_compiled,
+    rows_from_bitset,
+    suffix_filter_values,
+)
+from starfab.models.search import SearchIndex
+from starfab.models.tag_index import RecordTagIndex
+
+TAGS = {"guid-a": "TagA", "guid-b": "TagB", "guid-c": "TagC"}
+
+
+def _record(guid, record_type, tags=()):
+    return SimpleNamespace(
+        id=SimpleNamespace(value=guid),
+        type=record_type,
+        properties={"tags": [SimpleNamespace(name=_) for _ in tags]},
+    )
+
+
+RECORDS = [
+    ("libs/ships/a.xml", _record("r0", "EntityClassDefinition", ["guid-a"])),
+    ("libs/ships/b.xml", _record("r1", "EntityClassDefinition", ["guid-a", "guid-b"])),
+    ("libs/items/c.xml", _record("r2", "AmmoParams", ["guid-b", "guid-c"])),
+    ("libs/items/d.json", _record("r3", "AmmoParams")),
+    ("libs/other/e.xml", _record("r4", "Tag", ["guid-a", "guid-b", "guid-c"])),
+]
+
+
+@pytest.fixture
+def tag_database():
+    return SimpleNamespace(tags_by_guid=TAGS)
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    for path, record in RECORDS:
+        parent_path = path.rsplit("/", maxsplit=1)[0]
+        index.add(parent_path, path, path, columns={
+            "suffix": PurePosixPath(path).suffix, "type": record.type, "record": record
+        })
+    return index.finalize()
+
+
+def _items():
+    return [SimpleNamespace(_path=path, path=PurePosixPath(path), record=record) for path, record in RECORDS]
+
+
+def _check_addition_filters(filters, item):
+    # `PathArchiveTreeSortFilterProxyModel.checkAdditionFilters`
+    accepted = True
+    for op, adfilt in filters:
+        if op == operator.not_:
+            accepted = op(adfilt(item))
+        else:
+            accepted = op(accepted, adfilt(item))
+    return accepted
+
+
+def test_bitsets_round_trip():
+    rows = [0, 3, 7, 8, 64, 1000]
+    assert list(rows_from_bitset(bitset_from_rows(rows, 1001))) == rows
+    assert list(rows_from_bitset(0)) == []
+
+
+def test_suffix_filter_values():
+    assert suffix_filter_values([(operator.and_, SuffixEquals([".XML", ".json"]))]) == {".xml", ".json"}
+    assert suffix_filter_values(
+        [(operator.and_, SuffixEquals([".xml", ".json"])), (operator.and_, SuffixEquals(".xml"))]
+    ) == {".xml"}
+    assert suffix_filter_values([(operator.or_, SuffixEquals(".xml"))]) is None
+    assert suffix_filter_values([(operator.and_, PathContains("libs"))]) is None
+    assert suffix_filter_values([]) is None
+
+
+@pytest.mark.parametrize("use_tag_index", [False, True])
+def test_evaluate_filters_matches_item_checks(index, tag_database, use_tag_index):
+    tag_index = RecordTagIndex.build(tag_database, [r for _, r in RECORDS]) if use_tag_index else None
+    filter_sets = [
+        [(operator.and_, TypeEquals("AmmoParams"))],
+        [(operator.and_, SuffixEquals(".xml")), (operator.and_, PathContains("ITEMS"))],
+        [(operator.and_, TypeEquals("Tag")), (operator.or_, PathContains("ships"))],
+        [(operator.not_, TypeEquals("AmmoParams"))],
+        [(operator.and_, HasTags(["TagA"], tag_database, tag_index=tag_index))],
+        [(operator.and_, HasTags(["TagA", "TagC"], tag_database, tag_index=tag_index))],
+        [(operator.and_, HasTags(["TagA", "TagB"], tag_database, match=all, tag_index=tag_index))],
+        [(operator.and_, HasTags(["TagB", "Missing"], tag_database, match=all, tag_index=tag_index))],
+        [(operator.and_, HasTags(["TagB", "Missing"], tag_database, tag_index=tag_index))],
+        [(operator.xor, SuffixEquals(".json"))],
+    ]
+    for filters in filter_sets:
+        assert is_compiled(filters)
+        expected = [row for row, item in enumerate(_items()) if _check_addition_filters(filters, item)]
+        assert list(rows_from_bitset(evaluate_filters(filters, index))) == expected, filters
+
+
+def test_has_all_tags_requires_every_tag(tag_database):
+    tag_index = RecordTagIndex.build(tag_database, [r for _, r in RECORDS])
+    for ti in (None, tag_index):
+        has_all = HasTags(["TagA", "TagB"], tag_database, match=all, tag_index=ti)
+        assert [path for path, record in RECORDS if has_all(SimpleNamespace(record=record))] == [
+            "libs/ships/b.xml", "libs/other/e.xml"
+        ]
+        # a tag that doesn't exist can't be had
+        assert not any(
+            HasTags(["TagA", "Missing"], tag_database, match=all, tag_index=ti)(SimpleNamespace(record=record))
+            for _, record in RECORDS
+        )
+        has_any = HasTags(["TagC", "Missing"], tag_database, tag_index=ti)
+        assert [path for path, record in RECORDS if has_any(SimpleNamespace(record=record))] == [
+            "libs/items/c.xml", "libs/other/e.xml"
+        ]
+        assert not HasTags(["TagA"], tag_database, tag_index=ti)(SimpleNamespace(record=None))
+
+
+def test_select_with_filters_only_shows_folders_containing_matches(index):
+    result = index.select("", [(operator.and_, SuffixEquals(".xml"))])
+    assert result.paths == {path for path, _ in RECORDS if path.endswith(".xml")}
+    assert result.folders == {"libs", "libs/ships", "libs/items", "libs/other"}
+
+    # folders matching the text don't count when there are filters, only the ones containing an accepted entry
+    result = index.select("ships", [(operator.and_, TypeEquals("AmmoParams"))])
+    assert result.paths == set()
+    assert result.folders == set()
+    result = index.select("items", [(operator.and_, SuffixEquals(".json"))])
+    assert result.paths == {"libs/items/d.json"}
+    assert result.folders == {"libs", "libs/items"}
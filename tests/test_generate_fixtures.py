@@ -0,0 +1,42 @@
+import importlib.util
+import json
+from pathlib import Path
+
+from scdatatools.forge import DataCoreBinary
+from scdatatools.forge.tags import TagDatabase
+from scdatatools.p4k import P4KFile
+
+from starfab.models.tag_index import RecordTagIndex
+
+spec = importlib.util.spec_from_file_location(
+    "generate_fixtures", Path(__file__).parent.parent / "make" / "generate_fixtures.py"
+)
+generate_fixtures = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(generate_fixtures)
+
+
+def test_generated_game_dcb(tmp_path):
+    generate_fixtures.generate(tmp_path, files=100, socpaks=2, audio_files=1, records=300, tags=40)
+    p4k = P4KFile(str(tmp_path / "Data.p4k"))
+    with p4k.open("Data/Game.dcb") as f:
+        dcb = DataCoreBinary(f.read())
+
+    assert len(dcb.records) == 1 + 40 + 300
+    assert set(generate_fixtures.RECORD_TYPES) | {"TagDatabase", "Tag"} == dcb.record_types
+    records = [_ for _ in dcb.records if _.type in generate_fixtures.RECORD_TYPES]
+    assert all(_.filename.startswith(generate_fixtures.RECORDS_ROOT_PATH) for _ in records)
+    assert len(dcb.records_by_guid) == len(dcb.records)
+
+    record = json.loads(dcb.dump_record_json(records[0]))
+    assert record["__type"] == "SyntheticRecordBase" and record["__polymorphicType"] == records[0].type
+    assert record["size"] in generate_fixtures.ITEM_SIZES
+    assert record["physics"]["__type"] == "SPhysicsParams"
+    assert record["displayName"] and record["description"].startswith("@")
+
+    tag_database = TagDatabase(dcb)
+    assert len(tag_database.tags_by_guid) == 1 + 40
+    tag_index = RecordTagIndex.build(tag_database, dcb.records)
+    assert tag_index.record_bits
+    tagged = next(_ for _ in records if _.id.value in tag_index.record_bits)
+    tag_guids = [_.value.value for _ in tagged.properties["tags"]]
+    assert tag_index.record_tag_names(tagged) == {str(tag_database.tags_by_guid[_]) for _ in tag_guids}
@@ -0,0 +1,65 @@
+from conftest import TREE_PATHS, tree_edges, tree_entries
+
+from starfab.models.common import PathArchiveTreeModel
+from starfab.models.lazy import LazyTreeSource, resolve_folder_path
+
+
+def _lazy_model(entries):
+    model = PathArchiveTreeModel(None)
+    model.build_lazy(entries)
+    return model
+
+
+def test_resolve_folder_path():
+    assert resolve_folder_path("") == ""
+    assert resolve_folder_path("Data/Objects") == "Data/Objects"
+    assert resolve_folder_path("Data/Objects/b.socpak") == "Data/Objects"
+    assert resolve_folder_path("Data/Objects/b.socpak/c") == "Data/Objects/b.socpak/c"
+    assert resolve_folder_path("a.b/c.d") == ""
+
+
+def test_lazy_matches_object_tree(eager_model):
+    entries = tree_entries()
+    model = _lazy_model(entries)
+    assert model.has_pending_children(model.root_item)
+    assert tree_edges(model.root_item, fetch=model.fetch_children) == tree_edges(eager_model(entries).root_item)
+    assert not model._lazy_pending
+
+
+def test_lazy_matches_object_tree_nested_dotted_folders(eager_model):
+    entries = tree_entries([
+        "a/b.c/d.e/f/x.txt",
+        "a/b.c/g/y.txt",
+        "a/b.c/z.txt",
+        "a/h/i.j/k/w.txt",
+        "a/h/v.txt",
+    ])
+    model = _lazy_model(entries)
+    assert tree_edges(model.root_item, fetch=model.fetch_children) == tree_edges(eager_model(entries).root_item)
+
+
+def test_lazy_lookups_fetch_on_demand(eager_model):
+    entries = tree_entries()
+    eager = eager_model(entries)
+    for path in TREE_PATHS:
+        # a fresh model each time so the lookup has to fetch the folders leading to the path itself
+        model = _lazy_model(entries)
+        item = model.itemForPath(path)
+        expected = eager.itemForPath(path)
+        assert (item._path if item is not None else None) == (expected._path if expected is not None else None)
+
+    model = _lazy_model(entries)
+    folder = model.parentForPath("Data/Objects/b.socpak/c/d")
+    assert folder._path == "Data/Objects/b.socpak/c/d"
+    assert folder.parent._path == "Data/Objects/b.socpak/c"
+    assert folder.parent.parent._path == "Data/Objects"
+
+
+def test_lazy_source_children():
+    source = LazyTreeSource(tree_entries())
+    lo, hi = source.range_for("data/objects")
+    children = list(source.children("data/objects", lo, hi))
+    folders = {path for is_folder, path, _ in children if is_folder}
+    files = {path for is_folder, path, _ in children if not is_folder}
+    assert folders == {"Data/Objects/ship", "Data/Objects/b.socpak/c"}
+    assert files == {"Data/Objects/ship.socpak", "Data/Objects/b.socpak/w.xml"}
@@ -0,0 +1,120 @@
+import json
+import threading
+from types import SimpleNamespace
+
+from starfab.models.datacore import RecordRenderCache
+from starfab.models.lru import BytesLRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = BytesLRUCache(10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"  # "b" is now the least recently used
+    cache.put("c", b"cccc")
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.size == 8 and len(cache) == 2
+    assert cache.evictions == 1
+
+    # replacing an entry accounts for the size of the previous value
+    cache.put("a", b"a")
+    assert cache.size == 5
+    cache.put("d", b"dddd")
+    assert len(cache) == 3 and cache.evictions == 1
+
+
+def test_values_larger_than_the_budget_are_not_cached():
+    cache = BytesLRUCache(4)
+    cache.put("a", b"aa")
+    cache.put("big", b"12345")
+    assert "big" not in cache and cache.get("a") == b"aa"
+    assert cache.size == 2
+
+
+def test_byte_budget():
+    cache = BytesLRUCache(10)
+    for key in "abcde":
+        cache.put(key, b"xx")
+    cache.get("a")
+    # a single large value evicts as many of the least recently used entries as it needs room for
+    cache.put("big", b"x" * 7)
+    assert list(cache._entries) == ["a", "big"] and cache.size == 9
+    assert cache.evictions == 4
+
+    # shrinking the budget evicts right away
+    cache.resize(8)
+    assert list(cache._entries) == ["big"] and cache.size == 7 and cache.evictions == 5
+    cache.resize(100)
+    cache.put("f", b"x" * 90)
+    assert cache.size == 97 and cache.evictions == 5
+
+
+def test_peek_is_not_counted():
+    cache = BytesLRUCache(8)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.peek("a") == b"aaaa" and cache.peek("missing") is None
+    assert cache.hits == cache.misses == 0
+    # nor does it keep "a" from being evicted
+    cache.put("c", b"cccc")
+    assert "a" not in cache and "b" in cache
+
+
+def test_stats_and_clear():
+    cache = BytesLRUCache(100)
+    assert cache.stats()["hit_rate"] == 0.0
+    cache.put("a", b"a")
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["size"]) == (2, 1, 1, 1)
+    assert stats["hit_rate"] == 2 / 3
+
+    cache.clear()
+    assert len(cache) == 0 and cache.size == 0 and cache.get("a") is None
+
+
+def test_concurrent_use_keeps_the_size_consistent():
+    cache = BytesLRUCache(1000)
+
+    def _use(offset):
+        for i in range(2000):
+            key = (offset + i) % 97
+            if cache.get(key) is None:
+                cache.put(key, bytes(key % 31 + 1))
+
+    threads = [threading.Thread(target=_use, args=(_ * 13,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.size == sum(len(cache._entries[_]) for _ in cache._entries) <= 1000
+    assert cache.hits + cache.misses == 6 * 2000
+
+
+class _DataCore:
+    def __init__(self):
+        self.renders = 0
+
+    def record_to_dict(self, record, depth=100):
+        self.renders += 1
+        return {"name": record.id.value, "depth": depth, "value": 1.5}
+
+
+def test_record_render_cache():
+    cache = RecordRenderCache(1024)
+    datacore = _DataCore()
+    record = SimpleNamespace(id=SimpleNamespace(value="guid"))
+    rendered = cache.render(datacore, record, "dict")
+    assert json.loads(rendered) == {"name": "guid", "depth": 100, "value": 1.5}
+    assert cache.render(datacore, record, "dict") is rendered
+    assert json.loads(cache.render(datacore, record, "dict", depth=1))["depth"] == 1
+    assert datacore.renders == 2
+
+    # bulk renders reuse cached records but neither store nor count
+    hits, misses = cache.hits, cache.misses
+    assert cache.render(datacore, record, "dict", store=False) is rendered
+    cache.render(datacore, SimpleNamespace(id=SimpleNamespace(value="other")), "dict", store=False)
+    assert ("other", "dict", None) not in cache
+    assert (cache.hits, cache.misses) == (hits, misses)
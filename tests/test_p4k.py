@@ -0,0 +1,174 @@
+import operator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from conftest import tree_edges
+from scdatatools.p4k import P4KFile
+
+from starfab.gui import qtc
+from starfab.models.common import PathArchiveTreeModel
+from starfab.models.filters import SuffixEquals
+from starfab.models.p4k import P4KItem, P4KModel, P4KSortFilterProxyModelArchive
+from starfab.models.p4k_index import P4KIndex, expand_subarchive, parent_path_for, resolve_info
+from starfab.models.tree_builder import PathTreeBuilder
+
+
+def _model(archive, index):
+    @contextmanager
+    def p4k_reader():
+        yield archive
+
+    return SimpleNamespace(
+        archive=archive,
+        p4k_index=index,
+        prefetch_cache={},
+        _sc_manager=SimpleNamespace(p4k_reader=p4k_reader),
+    )
+
+
+def test_warm_open_subarchive_entry(make_p4k, subarchive, tmp_path):
+    p4k_file = make_p4k({
+        "Data/a.txt": b"top level",
+        "Data/Objects/ship.socpak": subarchive({"ship/inner/x.txt": b"inside", "y.txt": b"also inside"}),
+    })
+
+    # a previous session expanded the sub-archive and stored the index
+    archive = P4KFile(str(p4k_file))
+    archive.expand_subarchives()
+    P4KIndex.from_archive(archive).save(tmp_path / "p4k.index")
+
+    # warm open, the sub-archive is listed from the index but hasn't been expanded
+    index = P4KIndex.load(tmp_path / "p4k.index")
+    archive = P4KFile(str(p4k_file))
+    assert archive.subarchives["Data/Objects/ship.socpak"] is None
+    model = _model(archive, index)
+
+    for path, data in (
+        ("Data/a.txt", b"top level"),
+        ("Data/Objects/ship/inner/x.txt", b"inside"),
+        ("Data/Objects/ship/y.txt", b"also inside"),
+    ):
+        item = P4KItem(path, model, index_id=index.id_for_name(path))
+        with item.open(convert_cryxml=False) as f:
+            assert f.read() == data
+        assert item.contents().read() == data
+
+
+def test_concurrent_resolve_info_expands_each_subarchive_once(make_p4k, subarchive):
+    p4k_file = make_p4k({
+        f"Data/Objects/ship_{i}.socpak": subarchive({f"part_{j}.xml": b"x" for j in range(20)}) for i in range(4)
+    })
+    archive = P4KFile(str(p4k_file))
+    paths = [f"Data/Objects/ship_{i}/part_{j}.xml" for i in range(4) for j in range(20)]
+
+    with ThreadPoolExecutor(8) as pool:
+        infos = list(pool.map(lambda _: resolve_info(archive, _), paths * 4))
+        expanded = list(pool.map(lambda _: expand_subarchive(archive, _), list(archive.subarchives) * 4))
+
+    assert all(info is not None for info in infos)
+    assert len(archive.filelist) == 4 + len(paths)
+    assert all(len(_) == 20 for _ in expanded)
+
+
+def test_subarchive_placeholders_follow_the_tree_rules(qapp, make_p4k, subarchive):
+    p4k_file = make_p4k({
+        "Data/Objects/ship.socpak": subarchive({"ship/inner/x.xml": b"", "y.xml": b"", "readme": b""}),
+        "Data/Objects/Ship.pak": subarchive({"z.xml": b""}),
+        # not a sub-archive to `P4KFile`, which takes everything after the first "." as the extension
+        "Data/Objects/v1.2_station.socpak": subarchive({"w.xml": b""}),
+        "Data/Objects/crate.cgf": b"",
+    })
+    archive = P4KFile(str(p4k_file))
+    index = P4KIndex.from_archive(archive)
+    subarchives = index.unexpanded_subarchives()
+    assert subarchives == {"Data/Objects/ship.socpak": "Data/Objects/ship", "Data/Objects/Ship.pak": "Data/Objects/Ship"}
+
+    model = P4KModel(qtc.QObject())
+    model.archive, model.p4k_index, model.subarchive_placeholders = archive, index, subarchives
+    builder = PathTreeBuilder(model)
+    for entry_id, filename in enumerate(index.filenames):
+        P4KItem(filename, model=model, parent=builder.parent_for(parent_path_for(filename)), index_id=entry_id)
+    model._loaded()
+
+    # both sub-archives are listed in the same (case insensitive) folder
+    ship = model.parentForPath("Data/Objects/ship")
+    assert model.has_pending_children(ship)
+    model.fetch_children(ship)
+    assert not model.has_pending_children(ship)
+
+    # the same tree as if the sub-archives had been expanded before loading
+    archive.expand_subarchives()
+    eager = PathArchiveTreeModel(None)
+    for info in archive.filelist:
+        eager._item_cls(info.filename, model=eager, parent=eager.parentForPath(parent_path_for(info.filename)))
+    assert tree_edges(model.root_item) == tree_edges(eager.root_item)
+    assert ("data/objects/ship", "data/objects/ship/readme") in tree_edges(model.root_item)
+    assert not index.unexpanded_subarchives()
+
+
+def test_inserted_subarchives_update_the_folder_aggregates(qapp, make_p4k, subarchive):
+    p4k_file = make_p4k({
+        "Data/a.txt": b"a",
+        "Data/Objects/ship.socpak": subarchive({"inner/x.xml": b"x" * 100, "y.xml": b"y" * 1000}),
+    })
+    archive = P4KFile(str(p4k_file))
+    index = P4KIndex.from_archive(archive)
+    model = P4KModel(qtc.QObject())
+    model.archive, model.p4k_index = archive, index
+    model.subarchive_placeholders = index.unexpanded_subarchives()
+    model.folder_sizes, model.folder_times = index.folder_aggregates()
+    builder = PathTreeBuilder(model)
+    for entry_id, filename in enumerate(index.filenames):
+        P4KItem(filename, model=model, parent=builder.parent_for(parent_path_for(filename)), index_id=entry_id)
+    model._loaded()
+
+    folders = ["Data/Objects/ship", "Data/Objects", "Data"]
+    before = {_: model.parentForPath(_).raw_size for _ in folders}
+    model.fetch_children(model.parentForPath("Data/Objects/ship"))
+
+    # the same as if the sub-archive had been expanded before loading
+    assert (model.folder_sizes, model.folder_times) == index.folder_aggregates()
+    for folder in folders + ["Data/Objects/ship/inner"]:
+        item = model.parentForPath(folder)
+        assert item.raw_size == model.folder_sizes[folder.lower()]
+        assert item.sort_time == model.folder_times[folder.lower()]
+    assert model.parentForPath("Data/Objects/ship").raw_size == 1100
+    assert model.parentForPath("Data").raw_size == before["Data"] + 1100
+    assert model.root_item.raw_size == model.folder_sizes[""]
+
+
+def test_suffix_filters_are_answered_from_the_index(qapp):
+    index = P4KIndex()
+    for filename in (
+        "Data/Objects/ship/hull.dds", "Data/Objects/ship/hull.mtl", "Data/Objects/ship/readme",
+        "Data/Textures/rock.DDS", "Data/Textures/rock.dds.1", "Data/a.txt",
+    ):
+        index.add(filename, 1, 1, (2023, 1, 1, 0, 0, 0), 0)
+    model = P4KModel(qtc.QObject())
+    model.p4k_index = index
+    builder = PathTreeBuilder(model)
+    for entry_id, filename in enumerate(index.filenames):
+        P4KItem(filename, model=model, parent=builder.parent_for(parent_path_for(filename)), index_id=entry_id)
+
+    proxy = P4KSortFilterProxyModelArchive()
+    proxy.setSourceModel(model)
+    proxy.setAdditionFilters([(operator.and_, SuffixEquals([".dds"]))])
+    assert proxy._search_result is not None
+
+    shown, expected = set(), set()
+
+    def _visit(item):
+        if proxy._search_result.accepts(item):
+            shown.add(item._path)
+        matched = not item.children and item.path.suffix.lower() == ".dds"
+        for child in item.children:
+            matched = _visit(child) or matched
+        if matched:
+            expected.add(item._path)
+        return matched
+
+    for child in model.root_item.children:
+        _visit(child)
+    assert shown == expected
+    assert {"Data/Objects/ship/hull.dds", "Data/Textures/rock.DDS", "Data/Objects/ship"} <= shown
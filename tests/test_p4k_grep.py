@@ -0,0 +1,97 @@
+import re
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from scdatatools.p4k import P4KFile
+
+from starfab.gui import qtc
+from starfab.models.p4k import P4KModel
+from starfab.models.p4k_grep import (
+    GrepFileFilter,
+    P4KContentGrep,
+    compile_grep_pattern,
+    grep_buffer,
+    grep_candidates,
+    grep_subarchives,
+)
+from starfab.models.p4k_index import P4KIndex
+
+
+def _index(filenames):
+    index = P4KIndex()
+    for filename in filenames:
+        index.add(filename, 1, 1, (2023, 1, 1, 0, 0, 0), 0)
+    return index
+
+
+def test_file_filter():
+    file_filter = GrepFileFilter("*.mtl; Data/Libs/*.xml, .DDS")
+    assert file_filter.extensions == {".mtl", ".dds"}
+    assert file_filter.matches("Data/Objects/ship.MTL")
+    assert file_filter.matches("Data/Libs/foundry/records/a.xml")
+    assert file_filter.matches("Data/Textures/rock.dds")
+    assert not file_filter.matches("Data/Objects/a.xml")
+    assert not file_filter.matches("Data/Textures/rock.dds.1")
+    assert GrepFileFilter("").matches("anything")
+
+    index = _index(["Data/Objects/ship.mtl", "Data/Libs/a.xml", "Data/Objects/a.xml", "Data/rock.dds"])
+    assert grep_candidates(index, "*.mtl; Data/Libs/*.xml, .DDS") == [0, 1, 3]
+    assert grep_candidates(index, "") == [0, 1, 2, 3]
+
+
+def test_subarchives_the_filter_can_match():
+    subarchives = ["Data/ObjectContainers/a.socpak", "Data/Objects/b.socpak", "Data/Libs/c.socpak"]
+    assert grep_subarchives(subarchives, "") == subarchives
+    assert grep_subarchives(subarchives, ".xml") == subarchives
+    assert grep_subarchives(subarchives, "Data/Objects/*.xml") == ["Data/Objects/b.socpak"]
+    # the literal start of the glob can end inside of the sub-archive's folder
+    assert grep_subarchives(subarchives, "data/objectcontainers/a/inner/*") == ["Data/ObjectContainers/a.socpak"]
+    assert grep_subarchives(subarchives, "Data/Obj*.xml") == subarchives[:2]
+
+
+def test_grep_buffer():
+    data = b"first line\nsecond MATCH match\nthird\nmatch at the end"
+    assert grep_buffer(data, compile_grep_pattern("match")) == [(2, "second MATCH match"), (4, "match at the end")]
+    assert grep_buffer(data, compile_grep_pattern("MATCH", case_sensitive=True)) == [(2, "second MATCH match")]
+    assert grep_buffer(data, compile_grep_pattern(r"th\w+d", regex=True)) == [(3, "third")]
+
+
+class _Signal:
+    def emit(self, *args):
+        pass
+
+
+def test_searches_subarchives_and_reports_failures(qapp, make_p4k, subarchive):
+    archive = P4KFile(str(make_p4k({
+        "Data/a.xml": b"<needle/>",
+        "Data/Objects/ship.socpak": subarchive({"inner/b.xml": b"no\nneedle here", "c.txt": b"needle"}),
+        "Data/Other/skipped.socpak": subarchive({"d.xml": b"needle"}),
+    })))
+
+    @contextmanager
+    def p4k_reader():
+        yield archive
+
+    model = P4KModel(qtc.QObject())
+    model.archive = archive
+    sc_manager = SimpleNamespace(p4k_model=model, p4k_reader=p4k_reader)
+
+    file_filter = "Data/Objects/*.xml; Data/a.xml; Data/missing.xml"
+    subarchives = grep_subarchives(["Data/Objects/ship.socpak", "Data/Other/skipped.socpak"], file_filter)
+    grep = P4KContentGrep(
+        sc_manager, ["Data/a.xml", "Data/missing.xml"], re.compile(b"needle"), workers=2,
+        subarchives=subarchives, file_filter=file_filter,
+    )
+    grep.starfab = SimpleNamespace(task_started=_Signal(), update_status_progress=_Signal(), task_finished=_Signal())
+    hits, results, expanded = [], [], []
+    grep.signals.batch.connect(hits.extend)
+    grep.signals.finished.connect(results.append)
+    grep.signals.subarchive_expanded.connect(expanded.append)
+    grep.run()
+
+    assert expanded == ["Data/Objects/ship.socpak"]
+    assert sorted((_.path, _.line_number) for _ in hits) == [("Data/Objects/ship/inner/b.xml", 2), ("Data/a.xml", 1)]
+    assert results[0]["hits"] == 2
+    assert results[0]["failed_count"] == 1
+    assert results[0]["failed"] == [("Data/missing.xml", "not found")]
+
@@ -0,0 +1,182 @@
+import struct
+import zlib
+
+from starfab.models.p4k_index import P4K_INDEX_MAGIC, P4KIndex, pack_date_time, unpack_date_time
+
+DATE_TIME = (2023, 4, 5, 6, 7, 8)
+
+
+def _index(entries, key=None):
+    """`entries` is `{filename: crc}`, the size is derived from the crc so changing one changes the signature"""
+    index = P4KIndex(key)
+    for filename, crc in entries.items():
+        index.add(filename, crc * 10, crc * 5, DATE_TIME, crc)
+    return index
+
+
+def _names(index, ids):
+    return sorted(index.filenames[_] for _ in ids)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    key = {"p4k": "Data.p4k", "version_label": "3.20"}
+    index = _index({"Data/a.txt": 1, "Data/Objects/ship.socpak": 2, "Data/Objects/ship/x.xml": 3}, key)
+    index.save(tmp_path / "p4k.index")
+
+    loaded = P4KIndex.load(tmp_path / "p4k.index", key)
+    assert loaded.key == key
+    assert loaded.filenames == index.filenames
+    for column in ("file_sizes", "compress_sizes", "date_times", "crcs"):
+        assert getattr(loaded, column) == getattr(index, column)
+    assert loaded.date_time(0) == DATE_TIME == unpack_date_time(pack_date_time(DATE_TIME))
+
+    # a different key is stale, no key returns the index of a previous build as is
+    assert P4KIndex.load(tmp_path / "p4k.index", {**key, "version_label": "3.21"}) is None
+    assert P4KIndex.load(tmp_path / "p4k.index").key == key
+
+
+def test_load_rejects_missing_and_corrupt_files(tmp_path):
+    assert P4KIndex.load(tmp_path / "missing.index") is None
+    (tmp_path / "bad_magic.index").write_bytes(b"not an index")
+    assert P4KIndex.load(tmp_path / "bad_magic.index") is None
+
+    _index({"Data/a.txt": 1}).save(tmp_path / "truncated.index")
+    data = (tmp_path / "truncated.index").read_bytes()
+    (tmp_path / "truncated.index").write_bytes(data[:-4])
+    assert P4KIndex.load(tmp_path / "truncated.index") is None
+
+
+def _rewrite_payload(filename, rewrite):
+    """Replace the (decompressed) payload of a stored index with `rewrite(payload)`"""
+    data = filename.read_bytes()
+    (key_len,) = struct.unpack_from("<I", data, len(P4K_INDEX_MAGIC) + 4)
+    header_len = len(P4K_INDEX_MAGIC) + 12 + key_len
+    payload = zlib.decompress(data[header_len:])
+    filename.write_bytes(data[:header_len] + zlib.compress(rewrite(payload)))
+
+
+def test_load_rejects_corrupt_payloads(tmp_path):
+    filename = tmp_path / "p4k.index"
+    index = _index({"Data/a.txt": 1, "Data/b.txt": 2})
+    names_len = len("Data/a.txt\nData/b.txt")
+    corruptions = [
+        lambda payload: payload[:-3],  # truncated in the middle of the last column
+        lambda payload: payload[: 8 + names_len + 4],  # truncated in the middle of a length
+        # a column whose length isn't a multiple of its item size
+        lambda payload: payload[: 8 + names_len] + struct.pack("<Q", 3) + payload[8 + names_len + 8:],
+        lambda payload: payload[:8] + b"\xff" + payload[9:],  # not utf-8
+        lambda payload: b"",
+    ]
+    for corrupt in corruptions:
+        index.save(filename)
+        assert P4KIndex.load(filename) is not None
+        _rewrite_payload(filename, corrupt)
+        assert P4KIndex.load(filename) is None
+
+
+def test_empty_index_round_trip(tmp_path):
+    P4KIndex({"p4k": "empty"}).save(tmp_path / "p4k.index")
+    loaded = P4KIndex.load(tmp_path / "p4k.index")
+    assert len(loaded) == 0 and loaded.filenames == []
+
+
+def test_ids_with_prefix_is_case_insensitive():
+    index = _index({
+        "Data/Objects/ship/x.xml": 1,
+        "Data/objects/Ship/y.xml": 2,
+        "Data/Objects/shipyard/z.xml": 3,
+        "Data/Objects2/w.xml": 4,
+        "Data/a.txt": 5,
+    })
+    assert _names(index, index.ids_with_prefix("data/objects/ship/")) == [
+        "Data/Objects/ship/x.xml", "Data/objects/Ship/y.xml"
+    ]
+    assert len(index.ids_with_prefix("DATA/OBJECTS")) == 4
+    assert len(index.ids_with_prefix("")) == 5
+    assert not index.ids_with_prefix("Data/Objects/ship/x.xml/")
+    assert _names(index, index.ids_under("Data/Objects")) == [
+        "Data/Objects/ship/x.xml", "Data/Objects/shipyard/z.xml", "Data/objects/Ship/y.xml"
+    ]
+
+    # entries added later are found as well
+    index.add("Data/Objects/ship/late.xml", 1, 1, DATE_TIME, 1)
+    assert len(index.ids_with_prefix("data/objects/ship/")) == 3
+
+
+def test_ids_for_extension_and_folder():
+    index = _index({
+        "Data/Objects/ship.socpak": 1,
+        "Data/Objects/ship/hull.DDS": 2,
+        "Data/Objects/ship/hull.dds.1": 3,
+        "Data/Textures/rock.dds": 4,
+        "Data/ObjectContainers/base.socpak": 5,
+        "Data/readme": 6,
+    })
+    assert _names(index, index.ids_for_extension(".DDS")) == ["Data/Objects/ship/hull.DDS", "Data/Textures/rock.dds"]
+    assert _names(index, index.ids_for_extension(".1")) == ["Data/Objects/ship/hull.dds.1"]
+    assert _names(index, index.ids_for_extension("")) == ["Data/readme"]
+    assert not index.ids_for_extension(".wem")
+
+    assert index.ids_for([".dds", ".socpak"]) == [0, 1, 3, 4]
+    assert index.ids_for([".socpak"], "data/objectcontainers") == [4]
+    assert index.ids_for(folder_path="Data/Objects") == [0, 1, 2]
+    assert index.ids_for() == list(range(6))
+
+    # the extension index is kept up to date once built
+    index.add("Data/ObjectContainers/late.socpak", 1, 1, DATE_TIME, 1)
+    assert index.ids_for([".socpak"], "Data/ObjectContainers") == [4, 6]
+
+
+def test_folder_aggregates():
+    index = P4KIndex()
+    for filename, size, date_time in (
+        ("Data/a.txt", 1, (2020, 1, 1, 0, 0, 0)),
+        ("Data/Objects/ship/hull.dds", 10, (2022, 1, 1, 0, 0, 0)),
+        ("Data/objects/ship/inner/x.xml", 100, (2021, 1, 1, 0, 0, 0)),
+        ("top.txt", 1000, (2019, 1, 1, 0, 0, 0)),
+    ):
+        index.add(filename, size, size, date_time, 0)
+    sizes, times = index.folder_aggregates()
+    assert sizes == {"": 1111, "data": 111, "data/objects": 110, "data/objects/ship": 110, "data/objects/ship/inner": 100}
+    assert times["data/objects/ship/inner"] == pack_date_time((2021, 1, 1, 0, 0, 0))
+    assert times["data/objects"] == times["data"] == times[""] == pack_date_time((2022, 1, 1, 0, 0, 0))
+
+    # only the given entries, still rolled up to the root
+    sizes, times = index.folder_aggregates([2])
+    assert sizes == {"": 100, "data": 100, "data/objects": 100, "data/objects/ship": 100, "data/objects/ship/inner": 100}
+    assert set(times.values()) == {pack_date_time((2021, 1, 1, 0, 0, 0))}
+    assert index.folder_aggregates([]) == ({}, {})
+
+
+def test_diff():
+    previous = _index({"Data/same.txt": 1, "Data/changed.txt": 2, "Data/removed.txt": 3})
+    index = _index({"Data/same.txt": 1, "Data/changed.txt": 20, "Data/added.txt": 4})
+    delta = index.diff(previous)
+    assert _names(index, delta.added) == ["Data/added.txt"]
+    assert _names(index, delta.changed) == ["Data/changed.txt"]
+    assert delta.removed == ["Data/removed.txt"]
+    assert len(delta) == 3
+
+
+def test_unchanged_subarchive_contents_are_reused_not_removed():
+    # the previous build had both sub-archives expanded, the new index only lists the sub-archives themselves
+    previous = _index({
+        "Data/same.socpak": 1,
+        "Data/same/x.xml": 2,
+        "Data/same/inner/y.xml": 3,
+        "Data/patched.socpak": 4,
+        "Data/patched/z.xml": 5,
+        "Data/gone.txt": 6,
+    })
+    index = _index({"Data/same.socpak": 1, "Data/patched.socpak": 40})
+    delta = index.diff(previous)
+    assert _names(index, delta.changed) == ["Data/patched.socpak"]
+    assert sorted(delta.removed) == ["Data/gone.txt", "Data/patched/z.xml"]
+
+    assert index.reuse_subarchive_contents(previous, delta) == ["Data/same.socpak"]
+    assert sorted(index.filenames) == [
+        "Data/patched.socpak", "Data/same.socpak", "Data/same/inner/y.xml", "Data/same/x.xml"
+    ]
+    assert index.crcs[index.id_for_name("Data/same/inner/y.xml")] == 3
+    assert _names(index, index.ids_under("data/same")) == ["Data/same/inner/y.xml", "Data/same/x.xml"]
+    assert index.unexpanded_subarchives() == {"Data/patched.socpak": "Data/patched"}
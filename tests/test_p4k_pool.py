@@ -0,0 +1,158 @@
+import gc
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from scdatatools.p4k import P4KFile
+
+from starfab.models import p4k
+from starfab.models.p4k import P4KItem
+from starfab.models.p4k_index import expand_subarchive
+from starfab.models.p4k_pool import P4KReaderHandle, P4KReaderPool
+
+FILES = {"Data/a.txt": b"top level", "Data/b.txt": b"b" * 4096}
+SHIP = {"ship/inner/x.txt": b"inside", "y.txt": b"y" * 4096}
+
+
+def _archive(make_p4k, subarchive):
+    archive = P4KFile(str(make_p4k({**FILES, "Data/Objects/ship.socpak": subarchive(SHIP)})))
+    expand_subarchive(archive, "Data/Objects/ship.socpak")
+    return archive
+
+
+def test_handles_read_subarchive_entries_through_their_own_file(make_p4k, subarchive):
+    archive = _archive(make_p4k, subarchive)
+    pool = P4KReaderPool(archive, size=2)
+    with pool.reader() as handle:
+        assert isinstance(handle, P4KReaderHandle) and handle.fp is not archive.fp
+
+        # the shared archive (and the sub-archive it expanded) can't be read from anymore, the handle isn't affected
+        archive.fp.close()
+        with handle.open("Data/Objects/ship/inner/x.txt") as f:
+            assert f.read() == b"inside"
+        with handle.open(archive.NameToInfo["Data/Objects/ship/y.txt"]) as f:
+            assert f.read() == SHIP["y.txt"]
+        with handle.open("Data/a.txt") as f:
+            assert f.read() == b"top level"
+    pool.close()
+
+
+def test_concurrent_readers(make_p4k, subarchive):
+    archive = _archive(make_p4k, subarchive)
+    pool = P4KReaderPool(archive, size=2)
+    expected = {
+        **FILES, "Data/Objects/ship/inner/x.txt": SHIP["ship/inner/x.txt"], "Data/Objects/ship/y.txt": SHIP["y.txt"]
+    }
+    errors = []
+
+    def _read():
+        try:
+            for _ in range(20):
+                for path, data in expected.items():
+                    with pool.open(path) as f:
+                        assert f.read() == data
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_read) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(pool._handles) <= 2
+    pool.close()
+
+
+def test_dedicated_readers_do_not_take_pool_handles(make_p4k, subarchive):
+    archive = _archive(make_p4k, subarchive)
+    pool = P4KReaderPool(archive, size=1)
+    with pool.dedicated_reader() as dedicated, pool.reader() as pooled:
+        assert dedicated is not pooled and dedicated is not archive
+        with dedicated.open("Data/Objects/ship/y.txt") as f:
+            assert f.read() == SHIP["y.txt"]
+    assert dedicated.fp.closed
+    assert len(pool._handles) == 1
+    pool.close()
+
+
+def test_falls_back_to_the_shared_archive(make_p4k, subarchive):
+    archive = _archive(make_p4k, subarchive)
+    pool = P4KReaderPool(archive)
+    archive.filename = f"{archive.filename}.missing"  # the handles can't be opened
+    with pool.reader() as handle:
+        assert handle is archive
+        with handle.open("Data/a.txt") as f:
+            assert f.read() == b"top level"
+    assert not pool._handles
+
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+def test_failed_handles_leave_the_shared_archive_open(make_p4k, subarchive):
+    archive = _archive(make_p4k, subarchive)
+    filename = archive.filename
+    archive.filename = f"{filename}.missing"
+    with pytest.raises(OSError):
+        P4KReaderHandle(archive)
+    gc.collect()
+    assert not archive.fp.closed
+
+    archive.filename = filename
+    handle = P4KReaderHandle(archive)
+    handle.close()
+    handle.close()
+    assert handle.fp.closed and not archive.fp.closed
+    with archive.open("Data/a.txt") as f:
+        assert f.read() == b"top level"
+
+
+def test_concurrent_items_read_the_same_as_the_archive(make_p4k, subarchive, monkeypatch):
+    # smaller chunks, so `content_view` reads the larger entries in several of them
+    monkeypatch.setattr(p4k, "CONTENT_CHUNK_SIZE", 1000)
+    archive = P4KFile(str(make_p4k({
+        **FILES,
+        "Data/large.bin": bytes(range(256)) * 40,
+        "Data/Objects/ship.socpak": subarchive({**SHIP, "large.bin": bytes(range(256))[::-1] * 40}),
+    })))
+    archive.expand_subarchives()
+    pool = P4KReaderPool(archive, size=2)
+
+    @contextmanager
+    def p4k_reader():
+        with pool.reader() as handle:
+            yield handle
+
+    # the parts of a `P4KModel` its items read through, with the `StarCitizenManager`'s pool
+    model = SimpleNamespace(archive=archive, prefetch_cache={}, _sc_manager=SimpleNamespace(p4k_reader=p4k_reader))
+    reference = P4KFile(archive.filename)
+    reference.expand_subarchives()
+    expected = {}
+    for info in archive.filelist:
+        if not info.filename.endswith(".socpak"):
+            with reference.open(info.filename) as f:
+                expected[info.filename] = f.read()
+    assert len(expected) == 6
+    errors = []
+
+    def _read():
+        try:
+            for _ in range(10):
+                for path, data in expected.items():
+                    item = P4KItem(path, model)
+                    with item.open() as f:
+                        assert f.read() == data, path
+                    assert bytes(item.content_view()) == data, path
+                    assert bytes(item.content_view(convert_cryxml=False)) == data, path
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_read) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(pool._handles) <= 2
+    pool.close()
@@ -0,0 +1,54 @@
+import io
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from starfab.models.p4k_prefetch import PREFETCH_CHUNK_SIZE, P4KPrefetchCache, P4KPrefetcher
+
+
+class _File(io.BytesIO):
+    def __init__(self, data, on_read=None):
+        super().__init__(data)
+        self.reads = 0
+        self.on_read = on_read
+
+    def read(self, *args):
+        self.reads += 1
+        if self.on_read is not None:
+            self.on_read()
+        return super().read(*args)
+
+
+def _item(f, path="Data/a.xml"):
+    @contextmanager
+    def _open():
+        f.opened = True
+        yield f
+
+    return SimpleNamespace(_path=path, path=path, open=_open)
+
+
+def test_prefetch(qapp):
+    data = bytes(range(256)) * (PREFETCH_CHUNK_SIZE // 256 * 3 + 1)
+    cache = P4KPrefetchCache(len(data))
+    f = _File(data)
+    P4KPrefetcher(_item(f), cache).run()
+    assert cache.get("Data/a.xml") == data
+    assert f.reads == 5  # 4 chunks and the empty read at the end
+
+
+def test_cancelled_prefetch_stops_reading(qapp):
+    cache = P4KPrefetchCache(1024 * 1024 * 1024)
+    f = _File(bytes(PREFETCH_CHUNK_SIZE * 10))
+    prefetcher = P4KPrefetcher(_item(f), cache)
+    f.on_read = prefetcher.signals.cancel.emit
+    prefetcher.run()
+    # the chunk being read is finished, but nothing after it is read and nothing is cached
+    assert f.reads == 1
+    assert "Data/a.xml" not in cache and cache.size == 0
+
+    # cancelled before it started, the entry isn't even opened
+    f = _File(b"data")
+    prefetcher = P4KPrefetcher(_item(f), cache)
+    prefetcher.signals.cancel.emit()
+    prefetcher.run()
+    assert not hasattr(f, "opened") and len(cache) == 0
@@ -0,0 +1,26 @@
+import gc
+import weakref
+
+from starfab.gui import qtc
+from starfab.models.common import PathArchiveTreeSortFilterProxyModel
+from starfab.settings import settings
+
+SETTINGS_UPDATED = qtc.SIGNAL("settings_updated()")
+
+
+def test_discarded_proxies_are_not_kept_alive_by_settings(qapp, eager_model):
+    gc.collect()  # proxies left over from other tests would disconnect in the middle of this one
+    receivers = settings.receivers(SETTINGS_UPDATED)
+    parent = qtc.QObject()
+    proxy = PathArchiveTreeSortFilterProxyModel(parent)
+    proxy.setSourceModel(eager_model([]))
+    ref = weakref.ref(proxy)
+    del proxy
+    assert settings.receivers(SETTINGS_UPDATED) == receivers + 1
+
+    parent.deleteLater()
+    del parent
+    qapp.sendPostedEvents(None, qtc.QEvent.DeferredDelete)
+    gc.collect()
+    assert ref() is None
+    assert settings.receivers(SETTINGS_UPDATED) == receivers
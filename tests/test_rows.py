@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+from conftest import tree_entries
+from scdatatools.forge.tags import Tag
+
+from starfab.gui import qtc
+from starfab.models.tag_database import TagDatabaseModel
+
+
+def _assert_round_trips(model, parent=None):
+    """Every index below `parent` leads back to its item, and its parent back to `parent`"""
+    parent = parent or qtc.QModelIndex()
+    for row in range(model.rowCount(parent)):
+        index = model.index(row, 0, parent)
+        item = index.internalPointer()
+        assert item.row() == row, item
+        assert model.parent(index) == parent
+        assert model.index(item.row(), 0, model.parent(index)).internalPointer() is item
+        _assert_round_trips(model, index)
+
+
+def test_rows_after_inserting_and_removing_siblings(qapp, eager_model):
+    model = eager_model(tree_entries())
+    _assert_round_trips(model)
+
+    objects = model.parentForPath("Data/Objects")
+    model.begin_staging()
+    for name in ("new_a.xml", "new_b.xml"):
+        model._item_cls(f"Data/Objects/{name}", model=model, parent=objects)
+    model.insertChildren(model.take_staged(finish=True))
+    _assert_round_trips(model)
+
+    removed = objects.children[1]
+    model.removeItem(removed)
+    assert removed not in objects.children and removed.name not in objects.children_by_name
+    _assert_round_trips(model)
+    model.removeItem(objects.children[0])
+    model.removeItem(objects.children[-1])
+    _assert_round_trips(model)
+
+    # removed folders are created again, rather than found in the cache
+    model.removeItem(model.parentForPath("Data/Libs"))
+    assert model.itemForPath("Data/Libs/config.ini") is None
+    libs = model.parentForPath("Data/Libs")
+    assert libs.row() == len(libs.parent.children) - 1 and not libs.children
+    _assert_round_trips(model)
+
+
+class _DataCoreModel(qtc.QObject):
+    unloading = qtc.Signal()
+
+
+def _tag_model(root_tag):
+    sc_manager = qtc.QObject()
+    sc_manager.datacore_model = _DataCoreModel()
+    model = TagDatabaseModel(sc_manager)
+    model.archive = root_tag.database
+    model._setup_root()
+    return model
+
+
+def _add_tag(model, name, parent, row=None):
+    tag = Tag(name, f"guid-{name}", None, parent.database, parent=parent)
+    parent.children.insert(len(parent.children) if row is None else row, tag)
+    parent.children_by_name[name] = tag
+    model._guid_cache[tag.guid] = model._item_cls(tag, model)
+    return tag
+
+
+def test_tag_rows_after_inserting_and_removing_siblings(qapp):
+    database = SimpleNamespace()
+    root = database.root_tag = Tag("TagDatabase", "guid-root", None, database)
+    model = _tag_model(root)
+    tags = [_add_tag(model, f"tag{_}", root) for _ in range(5)]
+    for tag in tags[:3]:
+        for i in range(3):
+            _add_tag(model, f"{tag.name}_{i}", tag)
+    _assert_round_trips(model)
+
+    # the cached rows are renumbered once the siblings change
+    _add_tag(model, "inserted", root, row=1)
+    _add_tag(model, "tag0_inserted", tags[0], row=0)
+    _assert_round_trips(model)
+    root.children.remove(tags[2])
+    tags[0].children.pop(1)
+    _assert_round_trips(model)
+    assert model.itemForTag(tags[4]).row() == len(root.children) - 1
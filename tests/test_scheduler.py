@@ -0,0 +1,71 @@
+from starfab.gui import qtc
+from starfab.models.sc import ModelLoadScheduler
+
+
+class _Stage(qtc.QObject):
+    done = qtc.Signal()
+    failed = qtc.Signal(str)
+
+
+def _scheduler(stages):
+    """`stages` is a list of (name, deps), returns the scheduler, the signals for each stage and the started order"""
+    scheduler = ModelLoadScheduler()
+    signals, started = {}, []
+    for name, deps in stages:
+        signals[name] = _Stage()
+        scheduler.add_stage(
+            name, deps, lambda name=name: started.append(name), signals[name].done, signals[name].failed
+        )
+    return scheduler, signals, started
+
+
+def test_stages_start_once_their_dependencies_finish(qapp):
+    scheduler, signals, started = _scheduler([("a", []), ("b", []), ("c", ["a"]), ("d", ["b", "c"])])
+    finished = []
+    scheduler.finished.connect(lambda: finished.append(True))
+    scheduler.start()
+    assert started == ["a", "b"]
+
+    signals["a"].done.emit()
+    assert started == ["a", "b", "c"]
+    signals["c"].done.emit()
+    assert started == ["a", "b", "c"]
+    signals["b"].done.emit()
+    assert started == ["a", "b", "c", "d"]
+    assert not finished
+
+    signals["d"].done.emit()
+    assert finished == [True]
+    assert [_.name for _ in scheduler.critical_path()] in (["a", "c", "d"], ["b", "d"])
+    assert "critical path" in scheduler.report()
+
+
+def test_failed_stage_skips_its_dependents_and_still_finishes(qapp):
+    scheduler, signals, started = _scheduler([("a", []), ("b", []), ("c", ["a"]), ("d", ["c"])])
+    finished = []
+    scheduler.finished.connect(lambda: finished.append(True))
+    scheduler.start()
+
+    signals["a"].failed.emit("no Game.dcb")
+    assert started == ["a", "b"]
+    assert not finished
+
+    signals["b"].done.emit()
+    assert finished == [True]
+    report = scheduler.report()
+    assert "(no Game.dcb)" in report
+    assert "(skipped, a failed)" in report
+    assert "(skipped, c failed)" in report
+
+
+def test_signals_after_cancel_are_ignored(qapp):
+    scheduler, signals, started = _scheduler([("a", []), ("b", ["a"])])
+    finished = []
+    scheduler.finished.connect(lambda: finished.append(True))
+    scheduler.start()
+    scheduler.cancel()
+
+    signals["a"].done.emit()
+    signals["a"].failed.emit("late")
+    assert started == ["a"]
+    assert not finished
@@ -0,0 +1,76 @@
+from conftest import TREE_PATHS, tree_entries
+
+from starfab.models.common import path_filter_columns
+from starfab.models.search import SearchIndex
+
+
+def _index(entries=None):
+    index = SearchIndex()
+    for parent_path, path, _ in entries or tree_entries():
+        index.add(parent_path, path, path, columns=path_filter_columns(path))
+    return index.finalize()
+
+
+def _ancestors(path):
+    parts = path.lower().split("/")[:-1]
+    return {"/".join(parts[: i + 1]) for i in range(len(parts))}
+
+
+def _shown(eager, result) -> set:
+    """The `_path` of every item the proxy would show for `result`"""
+    shown = set()
+    pending = list(eager.root_item.children)
+    while pending:
+        item = pending.pop()
+        if result.accepts(item):
+            shown.add(item._path)
+        pending.extend(item.children)
+    return shown
+
+
+def _shown_by_recursive_filtering(eager, query) -> set:
+    """What the proxy shows without an index: items whose path matches and every folder leading to one"""
+    shown = set()
+
+    def _visit(item):
+        accepted = query in item._path.lower()
+        for child in item.children:
+            accepted = _visit(child) or accepted
+        if accepted:
+            shown.add(item._path)
+        return accepted
+
+    for child in eager.root_item.children:
+        _visit(child)
+    return shown
+
+
+def test_select_matches_substring_search():
+    index = _index()
+    for query in ("obj", "SOCPAK", ".xml", "upper", "v1.2", "readme", "nothing-matches"):
+        result = index.select(query)
+        expected = {path for path in TREE_PATHS if query.lower() in path.lower()}
+        assert result.paths == expected, query
+
+
+def test_select_shows_the_same_rows_as_recursive_filtering(eager_model):
+    eager = eager_model(tree_entries())
+    index = _index()
+    for query in ("obj", "socpak", "ship", "c/d", "libs", "data", "upper/"):
+        assert _shown(eager, index.select(query)) == _shown_by_recursive_filtering(eager, query), query
+
+
+def test_select_terms_and_late_entries():
+    index = SearchIndex()
+    index.add("Sounds", "Sounds/trigger_a", "Sounds/trigger_a", terms=[1234])
+    index.add("Sounds", "Sounds/trigger_b", "Sounds/trigger_b", terms=[5678])
+    index.finalize()
+    assert index.select("1234").paths == {"Sounds/trigger_a"}
+    assert index.select("trigger").paths == {"Sounds/trigger_a", "Sounds/trigger_b"}
+
+    # entries added after finalize, e.g. an expanded sub-archive
+    index.add("Data/Late/Folder", "Data/Late/Folder/new.txt", "Data/Late/Folder/new.txt")
+    result = index.select("new.txt")
+    assert result.paths == {"Data/Late/Folder/new.txt"}
+    assert result.folders == _ancestors("Data/Late/Folder/new.txt")
+    assert index.select("late/folder").folders >= {"data/late/folder"}
@@ -0,0 +1,49 @@
+from starfab.gui import qtc
+from starfab.settings import StarFabSettings
+
+
+def _settings(tmp_path):
+    return StarFabSettings(str(tmp_path / "StarFab.ini"), qtc.QSettings.IniFormat)
+
+
+def test_values_are_typed(qapp, tmp_path):
+    settings = _settings(tmp_path)
+    # ini files store every value as a string
+    qtc.QSettings.setValue(settings, "p4k/prefetch", "false")
+    qtc.QSettings.setValue(settings, "p4k/reader_handles", "8")
+    qtc.QSettings.setValue(settings, "datacore/extract_workers", "lots")
+    settings.sync()
+    snapshot = _settings(tmp_path).snapshot
+
+    assert snapshot.value("p4k/prefetch") is False
+    assert snapshot.value("cache/p4k_index") is True
+    assert snapshot.value("p4k/reader_handles") == 8
+    assert snapshot.value("datacore/extract_workers") == 4  # not a number, the default
+    assert snapshot.value("theme") == "Monokai Dimmed"
+    assert snapshot.value("missing") is None and snapshot.value("missing", "fallback") == "fallback"
+
+    snapshot.set("p4k/prefetch_cache_size", "32")
+    assert snapshot.value("p4k/prefetch_cache_size") == 32
+
+
+def test_reads_are_counted_and_refreshed(qapp, tmp_path):
+    settings = _settings(tmp_path)
+    snapshot = settings.snapshot
+    snapshot.refresh()
+    reads, saved_reads = snapshot.reads, snapshot.saved_reads
+
+    for _ in range(5):
+        assert snapshot.value("p4k/prefetch") is True
+    assert (snapshot.reads, snapshot.saved_reads) == (reads + 1, saved_reads + 4)
+
+    # `setValue` updates the snapshot in place
+    settings.setValue("p4k/prefetch", "false")
+    assert snapshot.value("p4k/prefetch") is False
+    assert snapshot.reads == reads + 1
+
+    # values changed behind the snapshot's back are read again once the settings are updated
+    qtc.QSettings.setValue(settings, "p4k/prefetch", "true")
+    assert snapshot.value("p4k/prefetch") is False
+    settings.settings_updated.emit()
+    assert snapshot.value("p4k/prefetch") is True
+    assert snapshot.reads == reads + 2
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+from conftest import TREE_PATHS, tree_edges, tree_entries
+
+from starfab.models.common import PathArchiveTreeModelLoader, ThreadLoadedPathArchiveTreeModel
+
+
+class _Loader(PathArchiveTreeModelLoader):
+    stream_batch_size = 3
+
+    def items_to_load(self):
+        return tree_entries()
+
+    def entries_for_item(self, item):
+        yield item
+
+
+def _stream_load(model):
+    model.stream_loading = True
+    _thread_load(model)
+
+
+def _thread_load(model):
+    model._loader = _Loader(model, item_cls=None)
+    model._loader.signals.batch.connect(model._handle_batch)
+    model._loader.signals.finished.connect(model._handle_loader_finished)
+    thread = threading.Thread(target=model._loader.run)
+    thread.start()
+    thread.join()
+
+
+def test_streamed_items_are_only_visible_once_inserted(qapp, eager_model):
+    model = ThreadLoadedPathArchiveTreeModel()
+    _stream_load(model)
+
+    # the batches are waiting for the GUI thread, nothing can be looked up or created in the meantime
+    assert not model.root_item.children
+    assert model.itemForPath("Data/Objects/ship/y.txt") is None
+    assert model.parentForPath("Data/Objects") is None
+    assert not model.root_item.children
+
+    qapp.processEvents()
+    assert model.is_loaded
+    eager = eager_model(tree_entries())
+    assert tree_edges(model.root_item) == tree_edges(eager.root_item)
+    for path in TREE_PATHS:
+        item = model.itemForPath(path)
+        expected = eager.itemForPath(path)
+        assert (item._path if item is not None else None) == (expected._path if expected is not None else None)
+        if item is not None:
+            assert item.parent.children[item.row()] is item
+
+    # staging ended with the load, the GUI thread can create folders again
+    assert model.parentForPath("Data/New")._path == "Data/New"
+
+
+@pytest.mark.parametrize("mode", ["compact_storage", "lazy_loading"])
+def test_built_trees_are_swapped_in_on_the_gui_thread(qapp, eager_model, mode):
+    model = ThreadLoadedPathArchiveTreeModel()
+    setattr(model, mode, True)
+    model.use_search_index = True
+    root_item = model.root_item
+    resets = []
+    model.modelAboutToBeReset.connect(lambda: resets.append(("about", threading.get_ident(), model.root_item)))
+    model.modelReset.connect(lambda: resets.append(("reset", threading.get_ident(), model.root_item)))
+    _thread_load(model)
+
+    # the loader finished on its thread, the model is untouched until the GUI thread handles it
+    assert model.root_item is root_item and not model.is_compact and not model.is_lazy
+    assert model.search_index is None and not resets
+
+    qapp.processEvents()
+    assert model.is_loaded
+    gui_thread = threading.get_ident()
+    assert [(_[0], _[1], _[2] is root_item) for _ in resets] == [
+        ("about", gui_thread, True), ("reset", gui_thread, False)
+    ]
+    assert model.is_compact if mode == "compact_storage" else model.is_lazy
+    assert model.search_index is not None
+    eager = eager_model(tree_entries())
+    for path in TREE_PATHS:
+        item = model.itemForPath(path)
+        expected = eager.itemForPath(path)
+        assert (item._path if item is not None else None) == (expected._path if expected is not None else None)
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+from starfab.models.filters import record_tag_names
+from starfab.models.tag_index import RecordTagIndex
+
+TAGS = {"guid-a": "TagA", "guid-b": "TagB", "guid-c": "TagC", "guid-a2": "TagA"}
+
+
+def _record(guid, tags=()):
+    return SimpleNamespace(id=SimpleNamespace(value=guid), properties={"tags": [SimpleNamespace(name=_) for _ in tags]})
+
+
+RECORDS = [
+    _record("r0", ["guid-a"]),
+    _record("r1", ["guid-a2", "guid-b"]),
+    _record("r2", ["guid-b", "guid-c", "guid-unknown"]),
+    _record("r3"),
+    _record("r4", ["guid-unknown"]),
+    _record("r5", ["guid-a", "guid-b", "guid-c"]),
+]
+
+
+@pytest.fixture
+def tag_database():
+    return SimpleNamespace(tags_by_guid=TAGS)
+
+
+@pytest.fixture
+def tag_index(tag_database):
+    return RecordTagIndex.build(tag_database, RECORDS)
+
+
+def test_build(tag_index):
+    # tags sharing a name share an id
+    assert tag_index.tag_names == ["TagA", "TagB", "TagC"]
+    assert tag_index.ids_by_guid == {"guid-a": 0, "guid-b": 1, "guid-c": 2, "guid-a2": 0}
+    assert tag_index.ids_by_name == {"TagA": 0, "TagB": 1, "TagC": 2}
+    # records without (known) tags are left out
+    assert tag_index.record_bits == {"r0": 0b001, "r1": 0b011, "r2": 0b110, "r5": 0b111}
+
+
+def test_mask(tag_index):
+    assert tag_index.mask(["TagA", "TagC"]) == 0b101
+    assert tag_index.mask(["TagB", "Missing"]) == 0b010
+    assert tag_index.mask(["TagB", "Missing"], strict=True) == 0
+    assert tag_index.mask([]) == 0
+
+
+def test_has_any_and_has_all(tag_index):
+    mask = tag_index.mask(["TagA", "TagB"])
+    assert [_.id.value for _ in RECORDS if tag_index.has_any(_, mask)] == ["r0", "r1", "r2", "r5"]
+    assert [_.id.value for _ in RECORDS if tag_index.has_all(_, mask)] == ["r1", "r5"]
+    assert tag_index.bits(None) == 0
+    assert not tag_index.has_any(None, mask)
+    # an empty mask has nothing to match
+    assert not any(tag_index.has_all(_, 0) for _ in RECORDS)
+
+
+def test_record_tag_names_match_the_tag_database(tag_index, tag_database):
+    for record in RECORDS:
+        assert tag_index.record_tag_names(record) == record_tag_names(record, tag_database)
+
+
+def test_records_with_tags(tag_index):
+    assert sorted(tag_index.records_with_tags(["TagC", "Missing"])) == ["r2", "r5"]
+    assert sorted(tag_index.records_with_tags(["TagA", "TagB"], match=all)) == ["r1", "r5"]
+    assert tag_index.records_with_tags(["TagA", "Missing"], match=all) == []
+    assert tag_index.records_with_tags([]) == []
+
+
+def test_many_tags():
+    tags = {f"guid-{i}": f"Tag{i}" for i in range(200)}
+    records = [_record(f"r{i}", [f"guid-{i}", f"guid-{199 - i}"]) for i in range(200)]
+    tag_index = RecordTagIndex.build(SimpleNamespace(tags_by_guid=tags), records)
+    assert tag_index.record_tag_names(records[3]) == {"Tag3", "Tag196"}
+    assert sorted(tag_index.records_with_tags(["Tag150", "Tag199"])) == ["r0", "r150", "r199", "r49"]
+    assert tag_index.records_with_tags(["Tag150", "Tag49"], match=all) == ["r49", "r150"]
@@ -0,0 +1,76 @@
+import random
+
+from conftest import TREE_PATHS, tree_edges, tree_entries
+
+from starfab.models.common import PathArchiveTreeModel
+from starfab.models.tree_builder import PathTreeBuilder
+
+PARENT_PATHS = [
+    "Data/Objects/ship",
+    "Data/Objects/ship",
+    "Data/Objects/ship/interior",
+    "Data/Objects",
+    "data/objects/SHIP/interior",
+    "Data/Objects/b.socpak/c",
+    "Data/Objects/b.socpak",
+    "Data/Libs/v1.2",
+    "Data/Libs/v1.2/readme",
+    "Data",
+    "",
+    "/Data/Objects",
+    "Shaders/Cache",
+    "Data/Objects/ship/interior/seat",
+    "Data/UPPER",
+    "Data/upper/lower",
+]
+
+
+def _path(item):
+    return "" if item._path == "root" else item._path
+
+
+def test_parent_for_matches_parent_for_path():
+    for seed in range(5):
+        paths = list(PARENT_PATHS)
+        random.Random(seed).shuffle(paths)
+        builder_model, eager = PathArchiveTreeModel(None), PathArchiveTreeModel(None)
+        builder = PathTreeBuilder(builder_model)
+        for parent_path in paths:
+            assert _path(builder.parent_for(parent_path)) == _path(eager.parentForPath(parent_path)), parent_path
+        assert tree_edges(builder_model.root_item) == tree_edges(eager.root_item)
+
+
+def test_builder_and_parent_for_path_share_folders():
+    model = PathArchiveTreeModel(None)
+    builder = PathTreeBuilder(model)
+    for i, parent_path in enumerate(PARENT_PATHS):
+        if i % 2:
+            assert builder.parent_for(parent_path) is model.parentForPath(parent_path), parent_path
+        else:
+            assert model.parentForPath(parent_path) is builder.parent_for(parent_path), parent_path
+
+
+def test_builds_the_same_tree_as_parent_for_path(eager_model):
+    model = PathArchiveTreeModel(None)
+    builder = PathTreeBuilder(model)
+    for parent_path, path, kwargs in tree_entries(sorted(TREE_PATHS)):
+        model._item_cls(path, model=model, parent=builder.parent_for(parent_path), **kwargs)
+    assert tree_edges(model.root_item) == tree_edges(eager_model(tree_entries(sorted(TREE_PATHS))).root_item)
+
+
+def test_private_cache_hands_over_new_folders():
+    model = PathArchiveTreeModel(None)
+    initial_cache = dict(model._parent_cache)
+    builder = PathTreeBuilder(model, cache={})
+    builder.parent_for("Data/Objects/ship")
+    builder.parent_for("Data/Objects/b.socpak/c")
+
+    assert model._parent_cache == initial_cache
+    new_folders = builder.take_new_folders()
+    assert sorted(new_folders) == ["data", "data/objects", "data/objects/b.socpak/c", "data/objects/ship"]
+    assert new_folders["data/objects/b.socpak/c"].parent is new_folders["data/objects"]
+    assert builder.take_new_folders() == {}
+
+    # folders it already created are reused, not handed over again
+    builder.parent_for("Data/Objects/ship/interior")
+    assert sorted(builder.take_new_folders()) == ["data/objects/ship/interior"]